@@ -1,367 +1,183 @@
-from flask import Flask, request, jsonify
+import bootstrap  # noqa: F401  (must run before CrewAI/LiteLLM are imported)
+
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import os
-import sys
-from pathlib import Path
+import base64
 import logging
-import tempfile
 import json
-import traceback
 import re
+import traceback
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
-# Load .env file from parent directory (project root) BEFORE reading environment variables
-try:
-    from dotenv import load_dotenv
-    # Get the parent directory (project root) where .env file is located
-    current_file = Path(__file__).resolve()
-    project_root = current_file.parent.parent  # Go up from ai_service/ to project root
-    env_path = project_root / '.env'
-    if env_path.exists():
-        load_dotenv(dotenv_path=env_path)
-        print(f"✅ Loaded .env file from {env_path}")
-    else:
-        print(f"⚠️ .env file not found at {env_path}")
-except ImportError:
-    print("⚠️ python-dotenv not installed. Install with: pip install python-dotenv")
-except Exception as e:
-    print(f"⚠️ Error loading .env file: {e}")
-
-# CRITICAL: Set LiteLLM environment variables BEFORE importing CrewAI/LiteLLM
-# LiteLLM reads these at import time, so they must be set early
-if not os.getenv("LITELLM_MODEL"):
-    os.environ["LITELLM_MODEL"] = "gpt-4o"
-if not os.getenv("OPENAI_MODEL"):
-    os.environ["OPENAI_MODEL"] = "gpt-4o"
-
-from document_processor import DocumentProcessor
-from openai_service import OpenAIService
-from utils import setup_logging, save_temp_file
-from integration_layer import get_ai_integration, run_async
+from utils import FastJSONProvider, validate_json, extract_json_object
+from integration_layer import run_async, submit_async, RUN_ASYNC_TIMEOUT
 from telemetry import get_telemetry
 from content_safety import content_safety_checker
+import routes_core
+from routes_core import core_bp
 
-# Set up logging
-setup_logging()
 logger = logging.getLogger(__name__)
 
 # Initialize app
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)
 
-# Initialize services
-openai_service = OpenAIService(api_key=os.getenv("OPENAI_API_KEY"))
-document_processor = DocumentProcessor(openai_service)
-
-# Initialize hybrid AI integration
-ai_integration = get_ai_integration()
+# Requests above this size are rejected with 413 before the body is read (base64 photos dominate)
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv("MAX_CONTENT_LENGTH_BYTES", str(20 * 1024 * 1024)))
+
+# Upload content types accepted by /api/ai/analyze-image-multipart
+IMAGE_MIMETYPE_RE = re.compile(r'image/[a-z0-9][a-z0-9.+-]*')
+
+app.register_blueprint(core_bp)
+app.before_request(routes_core.ensure_services)
+
+# Static part of the /health payload, built once; only hybrid_ai_status changes per request
+_HEALTH_TEMPLATE = {
+    'status': 'ok',
+    'ai_service': 'OpenAI GPT-4o + Hybrid AI Architecture',
+    'hybrid_ai_status': None,
+    'available_features': (
+        'document_analysis',
+        'handwriting_ocr',
+        'panel_optimization',
+        'qc_data_extraction',
+        'hybrid_ai_workflows',
+        'cost_optimized_routing',
+        'multi_agent_orchestration'
+    )
+}
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    # Get hybrid AI status
-    hybrid_status = ai_integration.get_service_status()
+    payload = _HEALTH_TEMPLATE.copy()
+    # Report status without forcing the LLM stack to load on an idle worker
+    if routes_core.services_ready():
+        payload['hybrid_ai_status'] = routes_core.ai_integration.get_service_status()
+    else:
+        payload['hybrid_ai_status'] = {'service_health': 'not_initialized'}
+    return jsonify(payload), 200
+
+def _chat_request_params(data):
+    """Pull message, user and project context out of a chat request body"""
+    message = data.get('message', '')
+    user_id = data.get('user_id', 'default_user')
+    user_tier = data.get('user_tier', 'paid_user')
+    context = data.get('context', {})
     
-    return jsonify({
-        'status': 'ok',
-        'ai_service': 'OpenAI GPT-4o + Hybrid AI Architecture',
-        'hybrid_ai_status': hybrid_status,
-        'available_features': [
-            'document_analysis',
-            'handwriting_ocr',
-            'panel_optimization',
-            'qc_data_extraction',
-            'hybrid_ai_workflows',
-            'cost_optimized_routing',
-            'multi_agent_orchestration'
-        ]
-    }), 200
-
-@app.route('/analyze', methods=['POST'])
-def analyze_documents():
-    """Analyze documents with AI - now supports hybrid AI architecture"""
-    start_time = None
-    try:
-        start_time = __import__('time').time()
-        data = request.json
-        
-        if not data or 'documents' not in data:
-            return jsonify({'error': 'No documents provided'}), 400
-        
-        documents = data['documents']
-        question = data.get('question', 'Provide a comprehensive analysis of these documents')
-        user_id = data.get('user_id', 'default')
-        user_tier = data.get('user_tier', 'paid_user')
-        use_hybrid = data.get('use_hybrid', True)
-        
-        logger.info(f"Analyzing {len(documents)} documents with question: {question}")
-        logger.info(f"User: {user_id}, Tier: {user_tier}, Hybrid: {use_hybrid}")
-        
-        # Try hybrid AI first if available and requested
-        if use_hybrid and ai_integration.is_hybrid_ai_available():
-            try:
-                # Extract document paths
-                doc_paths = []
-                for doc in documents:
-                    if 'path' in doc and os.path.exists(doc['path']):
-                        doc_paths.append(doc['path'])
-                
-                if doc_paths:
-                    # Use hybrid AI architecture
-                    hybrid_result = run_async(ai_integration.analyze_documents_hybrid(
-                        documents=doc_paths,
-                        question=question,
-                        user_id=user_id,
-                        user_tier=user_tier
-                    ))
-                    
-                    if 'error' not in hybrid_result:
-                        return jsonify({
-                            'analysis_type': 'hybrid_ai',
-                            'result': hybrid_result,
-                            'user_tier': user_tier
-                        }), 200
-                    else:
-                        logger.warning(f"Hybrid AI failed, falling back to OpenAI: {hybrid_result['error']}")
-                
-            except Exception as e:
-                logger.warning(f"Hybrid AI analysis failed, falling back to OpenAI: {e}")
-        
-        # Fallback to OpenAI service
-        temp_files = []
-        for doc in documents:
-            if 'path' in doc and os.path.exists(doc['path']):
-                temp_files.append(doc['path'])
-        
-        # Process documents and generate analysis
-        analysis_result = document_processor.analyze_documents(
-            temp_files, 
-            question=question
-        )
-        
-        return jsonify({
-            'analysis_type': 'openai_fallback',
-            'result': analysis_result,
-            'user_tier': user_tier
-        }), 200
+    # Fix: Extract projectId from top-level data and add to context
+    project_id = data.get('projectId') or context.get('projectId') or context.get('project_id')
+    if project_id and 'projectId' not in context:
+        context['projectId'] = project_id
+    return message, user_id, user_tier, context, project_id
+
+def _chat_input_error(message, user_id):
+    """Validate a chat message before it reaches the model; returns an error response or None"""
+    if not message:
+        return jsonify({'error': 'No message provided', 'success': False}), 400
     
-    except Exception as e:
-        logger.error(f"Error analyzing documents: {str(e)}")
-        logger.error(traceback.format_exc())
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/extract', methods=['POST'])
-def extract_data():
-    """Extract structured data from documents"""
-    try:
-        data = request.json
-        
-        if not data or 'document_path' not in data:
-            return jsonify({'error': 'Document path required'}), 400
-        
-        document_path = data['document_path']
-        extraction_type = data.get('extraction_type', 'qc_data')
-        user_id = data.get('user_id', 'default')
-        user_tier = data.get('user_tier', 'paid_user')
-        use_hybrid = data.get('use_hybrid', True)
-        
-        logger.info(f"Extracting {extraction_type} from document: {document_path}")
-        logger.info(f"User: {user_id}, Tier: {user_tier}, Hybrid: {use_hybrid}")
-        
-        # Try hybrid AI first if available and requested
-        if use_hybrid and ai_integration.is_hybrid_ai_available():
-            try:
-                # Use hybrid AI architecture for document analysis
-                hybrid_result = run_async(ai_integration.analyze_documents_hybrid(
-                    documents=[document_path],
-                    question=f"Extract {extraction_type} data from this document",
-                    user_id=user_id,
-                    user_tier=user_tier
-                ))
-                
-                if 'error' not in hybrid_result:
-                    return jsonify({
-                        'extraction_type': 'hybrid_ai',
-                        'result': hybrid_result,
-                        'user_tier': user_tier
-                    }), 200
-                else:
-                    logger.warning(f"Hybrid AI failed, falling back to OpenAI: {hybrid_result['error']}")
-                    
-            except Exception as e:
-                logger.warning(f"Hybrid AI extraction failed, falling back to OpenAI: {e}")
-        
-        # Fallback to OpenAI service
-        extraction_result = document_processor.extract_data(
-            document_path, 
-            extraction_type=extraction_type
-        )
-        
+    # Content safety check for user input
+    input_safe, input_error, input_details = content_safety_checker.validate_input(message)
+    if not input_safe:
+        logger.warning('[Chat Endpoint] Content safety check failed for user input', {
+            'user_id': user_id,
+            'details': input_details
+        })
         return jsonify({
-            'extraction_type': 'openai_fallback',
-            'result': extraction_result,
-            'user_tier': user_tier
-        }), 200
+            'error': input_error or 'Invalid input detected',
+            'success': False,
+            'safety_check_failed': True
+        }), 400
     
-    except Exception as e:
-        logger.error(f"Error extracting data: {str(e)}")
-        logger.error(traceback.format_exc())
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/optimize-panels', methods=['POST'])
-def optimize_panels():
-    """Optimize panel layout using AI - now supports hybrid AI architecture"""
-    try:
-        data = request.json
-        
-        if not data or 'panels' not in data:
-            return jsonify({'error': 'Panel data required'}), 400
-        
-        panels = data['panels']
-        strategy = data.get('strategy', 'balanced')
-        site_config = data.get('site_config', {})
-        user_id = data.get('user_id', 'default')
-        user_tier = data.get('user_tier', 'paid_user')
-        use_hybrid = data.get('use_hybrid', True)
-        
-        logger.info(f"Optimizing {len(panels)} panels with {strategy} strategy")
-        logger.info(f"User: {user_id}, Tier: {user_tier}, Hybrid: {use_hybrid}")
-        
-        # Try hybrid AI first if available and requested
-        if use_hybrid and ai_integration.is_hybrid_ai_available():
-            try:
-                # Use hybrid AI architecture for panel optimization
-                hybrid_result = run_async(ai_integration.optimize_panels_hybrid(
-                    panels=panels,
-                    strategy=strategy,
-                    site_config=site_config,
-                    user_id=user_id,
-                    user_tier=user_tier
-                ))
-                
-                if 'error' not in hybrid_result:
-                    return jsonify({
-                        'optimization_type': 'hybrid_ai',
-                        'result': hybrid_result,
-                        'user_tier': user_tier
-                    }), 200
-                else:
-                    logger.warning(f"Hybrid AI failed, falling back to OpenAI: {hybrid_result['error']}")
-                    
-            except Exception as e:
-                logger.warning(f"Hybrid AI optimization failed, falling back to OpenAI: {e}")
-        
-        # Fallback to OpenAI service
-        optimization_result = openai_service.optimize_panel_layout(
-            panels, 
-            strategy=strategy, 
-            site_config=site_config
-        )
-        
+    if not routes_core.ai_integration.is_hybrid_ai_available():
+        logger.warning("[Chat Endpoint] Hybrid AI not available, returning error")
         return jsonify({
-            'optimization_type': 'openai_fallback',
-            'result': optimization_result,
-            'user_tier': user_tier
-        }), 200
+            'error': 'Hybrid AI architecture not available',
+            'success': False,
+            'details': 'The AI service is not fully initialized. Please check service logs.'
+        }), 503
+    return None
+
+def _checked_chat_reply(chat_result, user_id, project_id):
+    """Run output safety and quality checks on a successful chat result; returns (reply, output_safe)"""
+    ai_response = chat_result.get('response', 'No response generated')
     
-    except Exception as e:
-        logger.error(f"Error optimizing panels: {str(e)}")
-        logger.error(traceback.format_exc())
-        return jsonify({'error': str(e)}), 500
+    # Content safety check for AI output
+    output_safe, output_error, output_details = content_safety_checker.validate_output(
+        ai_response,
+        context={'user_id': user_id, 'project_id': project_id}
+    )
+    
+    if not output_safe:
+        logger.error('[Chat Endpoint] Content safety check failed for AI output', {
+            'user_id': user_id,
+            'details': output_details
+        })
+        # Use sanitized output if available
+        sanitized_response = output_details.get('sanitized_output', 'Response was filtered for safety reasons.')
+        ai_response = sanitized_response
+    
+    # Quality check
+    quality_valid, quality_error = content_safety_checker.check_response_quality(ai_response)
+    if not quality_valid:
+        logger.warning('[Chat Endpoint] Response quality check failed', {
+            'user_id': user_id,
+            'error': quality_error
+        })
+    return ai_response, output_safe
+
+def _chat_reply_metadata(chat_result, user_id):
+    """Identifiers returned alongside a chat reply"""
+    return {
+        'user_id': chat_result.get('user_id', user_id),
+        'timestamp': chat_result.get('timestamp', ''),
+        'conversation_id': chat_result.get('conversation_id') or chat_result.get('session_id') or chat_result.get('user_id'),
+        'session_id': chat_result.get('session_id') or chat_result.get('conversation_id') or chat_result.get('user_id'),
+    }
 
 @app.route('/api/ai/chat', methods=['POST'])
-def chat_message():
+@validate_json(types={'message': str, 'context': dict})
+def chat_message(data):
     """Handle chat messages using hybrid AI architecture - Backend API endpoint"""
     try:
-        data = request.json
-        message = data.get('message', '')
-        user_id = data.get('user_id', 'default_user')
-        user_tier = data.get('user_tier', 'paid_user')
-        context = data.get('context', {})
+        message, user_id, user_tier, context, project_id = _chat_request_params(data)
         
-        # Fix: Extract projectId from top-level data and add to context
-        project_id = data.get('projectId') or context.get('projectId') or context.get('project_id')
-        if project_id and 'projectId' not in context:
-            context['projectId'] = project_id
+        logger.info("[Chat Endpoint] Request received - user_id: %s, project_id: %s, message_length: %s", user_id, project_id, len(message))
+        logger.debug("[Chat Endpoint] Context keys: %s", list(context.keys()))
         
-        logger.info(f"[Chat Endpoint] Request received - user_id: {user_id}, project_id: {project_id}, message_length: {len(message)}")
-        logger.debug(f"[Chat Endpoint] Context keys: {list(context.keys())}")
-        
-        if not message:
-            return jsonify({'error': 'No message provided', 'success': False}), 400
-        
-        # Content safety check for user input
-        input_safe, input_error, input_details = content_safety_checker.validate_input(message)
-        if not input_safe:
-            logger.warning('[Chat Endpoint] Content safety check failed for user input', {
-                'user_id': user_id,
-                'details': input_details
-            })
-            return jsonify({
-                'error': input_error or 'Invalid input detected',
-                'success': False,
-                'safety_check_failed': True
-            }), 400
-        
-        if not ai_integration.is_hybrid_ai_available():
-            logger.warning("[Chat Endpoint] Hybrid AI not available, returning error")
-            return jsonify({
-                'error': 'Hybrid AI architecture not available',
-                'success': False,
-                'details': 'The AI service is not fully initialized. Please check service logs.'
-            }), 503
+        error_response = _chat_input_error(message, user_id)
+        if error_response:
+            return error_response
         
         # Use hybrid AI architecture for chat
-        chat_result = run_async(ai_integration.chat_message_hybrid(
+        chat_result = run_async(routes_core.ai_integration.chat_message_hybrid(
             message=message,
             context=context,
             user_id=user_id,
             user_tier=user_tier
         ))
         
-        logger.info(f"[Chat Endpoint] Result: success={chat_result.get('success')}, has_response={bool(chat_result.get('response'))}, error={chat_result.get('error')}")
+        logger.info("[Chat Endpoint] Result: success=%s, has_response=%s, error=%s", chat_result.get('success'), bool(chat_result.get('response')), chat_result.get('error'))
         
         if chat_result.get('success'):
-            ai_response = chat_result.get('response', 'No response generated')
-            
-            # Content safety check for AI output
-            output_safe, output_error, output_details = content_safety_checker.validate_output(
-                ai_response,
-                context={'user_id': user_id, 'project_id': project_id}
-            )
-            
-            if not output_safe:
-                logger.error('[Chat Endpoint] Content safety check failed for AI output', {
-                    'user_id': user_id,
-                    'details': output_details
-                })
-                # Use sanitized output if available
-                sanitized_response = output_details.get('sanitized_output', 'Response was filtered for safety reasons.')
-                ai_response = sanitized_response
-            
-            # Quality check
-            quality_valid, quality_error = content_safety_checker.check_response_quality(ai_response)
-            if not quality_valid:
-                logger.warning('[Chat Endpoint] Response quality check failed', {
-                    'user_id': user_id,
-                    'error': quality_error
-                })
+            ai_response, output_safe = _checked_chat_reply(chat_result, user_id, project_id)
             
             return jsonify({
                 'reply': ai_response,
                 'response': ai_response,
                 'success': True,
-                'user_id': chat_result.get('user_id', user_id),
-                'timestamp': chat_result.get('timestamp', ''),
-                'conversation_id': chat_result.get('conversation_id') or chat_result.get('session_id') or chat_result.get('user_id'),
-                'session_id': chat_result.get('session_id') or chat_result.get('conversation_id') or chat_result.get('user_id'),
+                **_chat_reply_metadata(chat_result, user_id),
                 'safety_checked': True,
                 'output_safe': output_safe
             }), 200
         else:
             # Log the error details before returning
             error_msg = chat_result.get('error', 'Chat failed')
-            logger.error(f"[Chat Endpoint] Chat failed: {error_msg}")
-            logger.error(f"[Chat Endpoint] Full result: {chat_result}")
+            logger.error("[Chat Endpoint] Chat failed: %s", error_msg)
+            logger.error("[Chat Endpoint] Full result: %s", chat_result)
             return jsonify({
                 'error': error_msg,
                 'success': False,
@@ -369,36 +185,103 @@ def chat_message():
             }), 500
     
     except Exception as e:
-        logger.error(f"Chat message failed: {e}", exc_info=True)
-        error_trace = traceback.format_exc()
-        logger.error(f"Full traceback: {error_trace}")
+        logger.exception("Chat message failed: %s", e)
         return jsonify({
             'error': str(e),
             'success': False,
-            'details': error_trace if os.getenv("FLASK_DEBUG") == "1" else None
+            # Only materialize the traceback string when it will actually be returned
+            'details': traceback.format_exc() if os.getenv("FLASK_DEBUG") == "1" else None
         }), 500
 
+# Server-sent events: keep-alive interval while the agent works, and reply chunk size
+CHAT_STREAM_HEARTBEAT = float(os.getenv("CHAT_STREAM_HEARTBEAT_SECONDS", "10"))
+CHAT_STREAM_CHUNK_CHARS = 256
+
+def _sse(event, payload):
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/api/ai/chat/stream', methods=['POST'])
+@validate_json(types={'message': str, 'context': dict})
+def chat_message_stream(data):
+    """
+    Streaming variant of /api/ai/chat using server-sent events.
+    
+    Emits a `status` event immediately, keep-alive comments while the agent
+    runs, the safety-checked reply as `delta` events, then `done` with the
+    same metadata /api/ai/chat returns (or a single `error` event).
+    """
+    message, user_id, user_tier, context, project_id = _chat_request_params(data)
+    logger.info("[Chat Stream] Request received - user_id: %s, project_id: %s, message_length: %s", user_id, project_id, len(message))
+    
+    error_response = _chat_input_error(message, user_id)
+    if error_response:
+        return error_response
+    
+    future = submit_async(routes_core.ai_integration.chat_message_hybrid(
+        message=message,
+        context=context,
+        user_id=user_id,
+        user_tier=user_tier
+    ))
+    
+    def generate():
+        deadline = time.monotonic() + RUN_ASYNC_TIMEOUT
+        try:
+            yield _sse('status', {'status': 'processing'})
+            while True:
+                try:
+                    chat_result = future.result(timeout=min(CHAT_STREAM_HEARTBEAT, max(0.0, deadline - time.monotonic())))
+                    break
+                except FutureTimeoutError:
+                    if time.monotonic() >= deadline:
+                        raise
+                    yield ': keep-alive\n\n'
+            
+            if not chat_result.get('success'):
+                logger.error("[Chat Stream] Chat failed: %s", chat_result.get('error'))
+                yield _sse('error', {'error': chat_result.get('error', 'Chat failed'), 'success': False})
+                return
+            
+            ai_response, output_safe = _checked_chat_reply(chat_result, user_id, project_id)
+            for start in range(0, len(ai_response), CHAT_STREAM_CHUNK_CHARS):
+                yield _sse('delta', {'delta': ai_response[start:start + CHAT_STREAM_CHUNK_CHARS]})
+            yield _sse('done', {
+                'success': True,
+                **_chat_reply_metadata(chat_result, user_id),
+                'safety_checked': True,
+                'output_safe': output_safe
+            })
+        except Exception as e:
+            logger.exception("[Chat Stream] Chat message failed: %s", e)
+            yield _sse('error', {'error': str(e) or 'Chat timed out', 'success': False})
+        finally:
+            # Client went away or we gave up: stop the agent instead of letting it run unobserved
+            if not future.done():
+                future.cancel()
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/hybrid/chat', methods=['POST'])
-def hybrid_chat():
+@validate_json(required_keys=('message',), error='Message required', types={'message': str, 'context': dict})
+def hybrid_chat(data):
     """Handle chat messages using hybrid AI architecture - Alternative endpoint"""
     try:
-        data = request.json
-        
-        if not data or 'message' not in data:
-            return jsonify({'error': 'Message required'}), 400
-        
         message = data['message']
         context = data.get('context', {})
         user_id = data.get('user_id', 'default')
         user_tier = data.get('user_tier', 'paid_user')
         
-        logger.info(f"Processing chat message from user {user_id} (tier: {user_tier})")
+        logger.info("Processing chat message from user %s (tier: %s)", user_id, user_tier)
         
-        if not ai_integration.is_hybrid_ai_available():
+        if not routes_core.ai_integration.is_hybrid_ai_available():
             return jsonify({'error': 'Hybrid AI architecture not available'}), 503
         
         # Use hybrid AI architecture for chat
-        chat_result = run_async(ai_integration.chat_message_hybrid(
+        chat_result = run_async(routes_core.ai_integration.chat_message_hybrid(
             message=message,
             context=context,
             user_id=user_id,
@@ -408,30 +291,25 @@ def hybrid_chat():
         return jsonify(chat_result), 200
     
     except Exception as e:
-        logger.error(f"Error processing chat message: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error processing chat message: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/hybrid/project-setup', methods=['POST'])
-def hybrid_project_setup():
+@validate_json(required_keys=('project_data',), error='Project data required', types={'project_data': dict})
+def hybrid_project_setup(data):
     """Setup new project using hybrid AI architecture"""
     try:
-        data = request.json
-        
-        if not data or 'project_data' not in data:
-            return jsonify({'error': 'Project data required'}), 400
-        
         project_data = data['project_data']
         user_id = data.get('user_id', 'default')
         user_tier = data.get('user_tier', 'paid_user')
         
-        logger.info(f"Setting up new project for user {user_id} (tier: {user_tier})")
+        logger.info("Setting up new project for user %s (tier: %s)", user_id, user_tier)
         
-        if not ai_integration.is_hybrid_ai_available():
+        if not routes_core.ai_integration.is_hybrid_ai_available():
             return jsonify({'error': 'Hybrid AI architecture not available'}), 503
         
         # Use hybrid AI architecture for project setup
-        setup_result = run_async(ai_integration.setup_new_project_hybrid(
+        setup_result = run_async(routes_core.ai_integration.setup_new_project_hybrid(
             project_data=project_data,
             user_id=user_id,
             user_tier=user_tier
@@ -440,38 +318,33 @@ def hybrid_project_setup():
         return jsonify(setup_result), 200
     
     except Exception as e:
-        logger.error(f"Error setting up project: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error setting up project: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/hybrid/status', methods=['GET'])
 def hybrid_status():
     """Get hybrid AI architecture status"""
     try:
-        status = ai_integration.get_service_status()
+        status = routes_core.ai_integration.get_service_status()
         return jsonify(status), 200
     except Exception as e:
-        logger.error(f"Error getting hybrid AI status: {str(e)}")
+        logger.exception("Error getting hybrid AI status: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/ai/detect-defects', methods=['POST'])
-def detect_defects():
+@validate_json(required_keys=('image_base64',), error='image_base64 is required', types={'image_base64': str})
+def detect_defects(data):
     """Detect defects in uploaded image using GPT-4o vision model"""
-    logger.info(f"[detect_defects] Endpoint called - Method: {request.method}, Path: {request.path}")
+    logger.info("[detect_defects] Endpoint called - Method: %s, Path: %s", request.method, request.path)
     try:
-        data = request.json
-        
-        if not data or 'image_base64' not in data:
-            return jsonify({'error': 'image_base64 is required'}), 400
-        
         image_base64 = data['image_base64']
         project_id = data.get('project_id')
         metadata = data.get('metadata', {})
         
-        logger.info(f"Detecting defects in image for project: {project_id}")
+        logger.info("Detecting defects in image for project: %s", project_id)
         
         # Call defect detection
-        defect_result = run_async(openai_service.detect_defects_in_image(
+        defect_result = run_async(routes_core.openai_service.detect_defects_in_image(
             image_base64=image_base64,
             project_id=project_id
         ))
@@ -479,26 +352,10 @@ def detect_defects():
         return jsonify(defect_result), 200
         
     except Exception as e:
-        logger.error(f"Error detecting defects: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error detecting defects: %s", e)
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/ai/analyze-image', methods=['POST'])
-def analyze_image():
-    """Analyze a destruct/repair photo and return panel candidates"""
-    try:
-        data = request.json or {}
-        
-        if 'image_base64' not in data:
-            return jsonify({'error': 'image_base64 is required'}), 400
-        
-        image_base64 = data['image_base64']
-        image_type = data.get('image_type', 'image/png')
-        project_id = data.get('project_id')
-        
-        logger.info(f"Analyzing image for project: {project_id}, type: {image_type}")
-        
-        analysis_prompt = """Analyze this image of geosynthetic destruct or repair work and extract panel information.
+IMAGE_ANALYSIS_PROMPT = """Analyze this image of geosynthetic destruct or repair work and extract panel information.
 
 Return JSON with:
 {
@@ -521,25 +378,19 @@ Return JSON with:
 }
 
 If you cannot determine exact dimensions, estimate based on the visible region. Always return valid JSON."""
-        
-        analysis_text = run_async(openai_service.analyze_image(
+
+def _analyze_image_panels(image_base64, image_type, project_id):
+    """Run vision analysis on an encoded photo and build the analyze-image response"""
+    logger.info("Analyzing image for project: %s, type: %s", project_id, image_type)
+    
+    try:
+        analysis_text = run_async(routes_core.openai_service.analyze_image(
             image_base64=image_base64,
-            prompt=analysis_prompt
+            prompt=IMAGE_ANALYSIS_PROMPT,
+            mime_type=image_type
         ))
         
-        def _parse_analysis(text: str) -> dict:
-            try:
-                return json.loads(text)
-            except json.JSONDecodeError:
-                match = re.search(r'\{[\s\S]*\}', text)
-                if match:
-                    try:
-                        return json.loads(match.group(0))
-                    except json.JSONDecodeError:
-                        pass
-            return {}
-        
-        parsed = _parse_analysis(analysis_text)
+        parsed = extract_json_object(analysis_text) or {}
         panels = parsed.get('panels') if isinstance(parsed, dict) else None
         detected_info = parsed.get('detectedInfo') if isinstance(parsed, dict) else None
         
@@ -564,32 +415,63 @@ If you cannot determine exact dimensions, estimate based on the visible region.
         return jsonify(response_payload), 200
     
     except Exception as e:
-        logger.error(f"Error analyzing image: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error analyzing image: %s", e)
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@app.route('/api/ai/analyze-image', methods=['POST'])
+@validate_json(required_keys=('image_base64',), error='image_base64 is required', types={'image_base64': str})
+def analyze_image(data):
+    """Analyze a destruct/repair photo and return panel candidates"""
+    return _analyze_image_panels(
+        data['image_base64'],
+        data.get('image_type', 'image/png'),
+        data.get('project_id')
+    )
+
+@app.route('/api/ai/analyze-image-multipart', methods=['POST'])
+def analyze_image_multipart():
+    """
+    Multipart variant of /api/ai/analyze-image.
+    
+    Takes the photo as an `image` file part (plus optional `project_id`), so
+    clients send raw bytes instead of a base64 string embedded in JSON and
+    the body is never held as a parsed JSON document.
+    """
+    image = request.files.get('image')
+    if image is None:
+        return jsonify({'success': False, 'error': 'image file is required'}), 400
+    
+    # The client-declared type ends up in a data: URL, so only plain image/<subtype> values pass
+    image_type = image.mimetype or 'image/png'
+    if not IMAGE_MIMETYPE_RE.fullmatch(image_type):
+        image.close()
+        return jsonify({'success': False, 'error': 'image must be an image/* file'}), 400
+    
+    image_bytes = image.read()
+    image.close()
+    if not image_bytes:
+        return jsonify({'success': False, 'error': 'image file is empty'}), 400
+    
+    image_base64 = base64.b64encode(image_bytes).decode('ascii')
+    return _analyze_image_panels(image_base64, image_type, request.form.get('project_id'))
+
 @app.route('/api/ai/extract-asbuilt-fields', methods=['POST'])
-def extract_asbuilt_fields():
+@validate_json(required_keys=('image_base64',), error='image_base64 is required', types={'image_base64': str})
+def extract_asbuilt_fields(data):
     """Extract as-built form fields from image using GPT-4o vision model"""
-    logger.info(f"[extract_asbuilt_fields] Endpoint called - Method: {request.method}, Path: {request.path}")
+    logger.info("[extract_asbuilt_fields] Endpoint called - Method: %s, Path: %s", request.method, request.path)
     try:
-        data = request.json or {}
-        
-        if 'image_base64' not in data:
-            return jsonify({'error': 'image_base64 is required'}), 400
-        
         image_base64 = data['image_base64']
         form_type = data.get('form_type', 'panel_placement')
         project_id = data.get('project_id')
         
-        logger.info(f"Extracting as-built form fields for form type: {form_type}, project: {project_id}")
-        logger.info(f"Image base64 length: {len(image_base64)} characters")
+        logger.info("Extracting as-built form fields for form type: %s, project: %s (%s request bytes)", form_type, project_id, request.content_length)
         
         # Call form field extraction
-        extracted_fields = run_async(openai_service.extract_asbuilt_form_fields(
+        extracted_fields = run_async(routes_core.openai_service.extract_asbuilt_form_fields(
             image_base64=image_base64,
             form_type=form_type,
             project_id=project_id
@@ -601,8 +483,10 @@ def extract_asbuilt_fields():
             extracted_fields = {}
         
         # Log extracted fields for debugging
-        logger.info(f"[extract_asbuilt_fields] Extracted fields: {json.dumps(extracted_fields, indent=2)}")
-        logger.info(f"[extract_asbuilt_fields] Number of non-null fields: {sum(1 for v in extracted_fields.values() if v is not None and v != '')}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[extract_asbuilt_fields] Extracted fields: %s", json.dumps(extracted_fields, indent=2))
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("[extract_asbuilt_fields] Number of non-null fields: %s", sum(1 for v in extracted_fields.values() if v is not None and v != ''))
         
         return jsonify({
             'success': True,
@@ -611,15 +495,14 @@ def extract_asbuilt_fields():
         }), 200
         
     except Exception as e:
-        logger.error(f"Error extracting as-built form fields: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error extracting as-built form fields: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/ai/analyze-placement', methods=['POST'])
-def analyze_placement():
+@validate_json()
+def analyze_placement(data):
     """Analyze optimal placement for form-based item creation"""
     try:
-        data = request.json or {}
         form_record = data.get('form_record')
         project_id = data.get('project_id')
         item_type = data.get('item_type')
@@ -630,7 +513,7 @@ def analyze_placement():
                 'error': 'form_record and project_id are required'
             }), 400
         
-        logger.info(f"Analyzing placement for form {form_record.get('id')}, item_type: {item_type}")
+        logger.info("Analyzing placement for form %s, item_type: %s", form_record.get('id'), item_type)
         
         # Import placement analyzer
         from services.placement_analyzer import PlacementAnalyzer
@@ -639,8 +522,7 @@ def analyze_placement():
         form_data = form_record.get('mapped_data', {}) or {}
         
         # Get existing layout (synchronous for now - could be async)
-        import asyncio
-        existing_layout = asyncio.run(analyzer.get_existing_layout(project_id))
+        existing_layout = run_async(analyzer.get_existing_layout(project_id))
         
         # Determine placement
         placement_result = analyzer.determine_placement(
@@ -656,18 +538,17 @@ def analyze_placement():
         }), 200
         
     except Exception as e:
-        logger.error(f"Error analyzing placement: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error analyzing placement: %s", e)
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
 @app.route('/api/automate-from-form', methods=['POST'])
-def automate_from_form():
+@validate_json()
+def automate_from_form(data):
     """Automate item creation from approved form using multi-agent workflow"""
     try:
-        data = request.json
         form_record = data.get('form_record')
         project_id = data.get('project_id')
         user_id = data.get('user_id')
@@ -680,14 +561,14 @@ def automate_from_form():
                 'error': 'form_record and project_id are required'
             }), 400
         
-        logger.info(f"Automating from form {form_record.get('id')} for project {project_id}")
+        logger.info("Automating from form %s for project %s", form_record.get('id'), project_id)
         
         # Check if multi-agent workflow should be used
         use_multi_agent = os.getenv('ENABLE_AI_FORM_REVIEW', 'true').lower() == 'true'
         
         if use_multi_agent:
             # Use multi-agent workflow
-            result = run_async(ai_integration.automate_from_approved_form_with_workflow(
+            result = run_async(routes_core.ai_integration.automate_from_approved_form_with_workflow(
                 form_record=form_record,
                 project_id=project_id,
                 user_id=user_id,
@@ -699,7 +580,7 @@ def automate_from_form():
             form_record['item_type'] = item_type
             form_record['positioning'] = positioning
             
-            result = run_async(ai_integration.automate_from_approved_form(
+            result = run_async(routes_core.ai_integration.automate_from_approved_form(
                 form_record=form_record,
                 project_id=project_id,
                 user_id=user_id
@@ -708,29 +589,25 @@ def automate_from_form():
         return jsonify(result), 200 if result.get('success') else 500
         
     except Exception as e:
-        logger.error(f"Error in automate_from_form: {e}", exc_info=True)
+        logger.exception("Error in automate_from_form: %s", e)
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
 @app.route('/api/ai/automate-panel-population', methods=['POST'])
-def automate_panel_population():
+@validate_json(required_keys=('project_id',), error='project_id is required')
+def automate_panel_population(data):
     """Automate panel layout population using browser tools based on defect data"""
     try:
-        data = request.json
-        
-        if not data or 'project_id' not in data:
-            return jsonify({'error': 'project_id is required'}), 400
-        
         project_id = data['project_id']
         defect_data = data.get('defect_data', {})
         user_id = data.get('user_id')
         upload_id = data.get('upload_id')
         
-        logger.info(f"Automating panel population for project: {project_id}, upload: {upload_id}")
+        logger.info("Automating panel population for project: %s, upload: %s", project_id, upload_id)
         
-        if not ai_integration.is_hybrid_ai_available():
+        if not routes_core.ai_integration.is_hybrid_ai_available():
             return jsonify({
                 'status': 'failed',
                 'error': 'Hybrid AI architecture not available'
@@ -738,7 +615,7 @@ def automate_panel_population():
         
         # Use hybrid AI with browser tools to automate panel population
         # This will navigate to the panel layout page and create panels based on defects
-        automation_result = run_async(ai_integration.automate_panel_population_from_defects(
+        automation_result = run_async(routes_core.ai_integration.automate_panel_population_from_defects(
             project_id=project_id,
             defect_data=defect_data,
             user_id=user_id,
@@ -760,30 +637,25 @@ def automate_panel_population():
             }), 500
         
     except Exception as e:
-        logger.error(f"Error automating panel population: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error automating panel population: %s", e)
         return jsonify({
             'status': 'failed',
             'error': str(e)
         }), 500
 
 @app.route('/api/ai/create-panels-from-forms', methods=['POST'])
-def create_panels_from_forms():
+@validate_json(required_keys=('forms_data',), error='forms_data is required', types={'forms_data': list})
+def create_panels_from_forms(data):
     """Create panels from form data using AI analysis"""
-    logger.info(f"[create_panels_from_forms] Endpoint called - Method: {request.method}, Path: {request.path}")
+    logger.info("[create_panels_from_forms] Endpoint called - Method: %s, Path: %s", request.method, request.path)
     try:
-        data = request.json
-
-        if not data or 'forms_data' not in data:
-            return jsonify({'error': 'forms_data is required'}), 400
-
         forms_data = data['forms_data']
         project_id = data.get('project_id')
 
-        logger.info(f"Creating panels from {len(forms_data)} forms for project: {project_id}")
+        logger.info("Creating panels from %s forms for project: %s", len(forms_data), project_id)
 
         # Call AI service to create panels from forms
-        panel_instructions = run_async(openai_service.create_panels_from_forms(
+        panel_instructions = run_async(routes_core.openai_service.create_panels_from_forms(
             forms_data=forms_data,
             project_id=project_id
         ))
@@ -795,15 +667,14 @@ def create_panels_from_forms():
         }), 200
 
     except Exception as e:
-        logger.error(f"Error creating panels from forms: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error creating panels from forms: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/ai/extract-plan-geometry', methods=['POST'])
-def extract_plan_geometry():
+@validate_json()
+def extract_plan_geometry(data):
     """Extract Plan Geometry Model from construction documents"""
     try:
-        data = request.json
         project_id = data.get('project_id')
         documents = data.get('documents', [])
 
@@ -813,7 +684,7 @@ def extract_plan_geometry():
                 'error': 'project_id and documents are required'
             }), 400
 
-        logger.info(f"Extracting plan geometry from {len(documents)} documents for project {project_id}")
+        logger.info("Extracting plan geometry from %s documents for project %s", len(documents), project_id)
 
         # Use OpenAI to extract geometry from document text
         # This is a basic implementation - can be enhanced with vision models for drawings
@@ -857,7 +728,7 @@ Extract:
 Return as JSON with keys: site_boundary, site_width, site_height, units, scale_factor, reference_points, no_go_zones, key_features, panel_map_requirements."""
 
                 # Call OpenAI for extraction
-                extraction_result = run_async(openai_service.chat_completion(
+                extraction_result = run_async(routes_core.openai_service.chat_completion(
                     messages=[{
                         'role': 'user',
                         'content': extraction_prompt
@@ -871,17 +742,15 @@ Return as JSON with keys: site_boundary, site_width, site_height, units, scale_f
                     content = extraction_result['choices'][0]['message']['content']
                     # Try to parse JSON from response
                     try:
-                        import re
-                        json_match = re.search(r'\{.*\}', content, re.DOTALL)
-                        if json_match:
-                            parsed = json.loads(json_match.group())
+                        parsed = extract_json_object(content)
+                        if parsed:
                             extracted_geometry.update(parsed)
                             extracted_geometry['confidence_score'] = 0.7  # Higher confidence with AI extraction
                             extracted_geometry['extraction_method'] = 'ai_text_parsing'
                     except json.JSONDecodeError:
-                        logger.warn("Could not parse JSON from AI extraction")
+                        logger.warning("Could not parse JSON from AI extraction")
             except Exception as ai_error:
-                logger.warn(f"AI extraction failed, using defaults: {ai_error}")
+                logger.warning("AI extraction failed, using defaults: %s", ai_error)
 
         return jsonify({
             'success': True,
@@ -890,8 +759,7 @@ Return as JSON with keys: site_boundary, site_width, site_height, units, scale_f
         }), 200
 
     except Exception as e:
-        logger.error(f"Error extracting plan geometry: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error extracting plan geometry: %s", e)
         return jsonify({
             'success': False,
             'error': str(e)
@@ -915,9 +783,10 @@ if __name__ == '__main__':
     logger.info("=" * 50)
     logger.info("Registered Flask routes:")
     for rule in app.url_map.iter_rules():
-        logger.info(f"  {list(rule.methods)} {rule}")
+        logger.info("  %s %s", list(rule.methods), rule)
     logger.info("=" * 50)
     
     port = int(os.environ.get('PORT', 5001))
-    logger.info(f"🚀 Starting Flask app on port {port}")
-    app.run(host='0.0.0.0', port=port, debug=True)
+    logger.warning("⚠️ Running the Flask development server - for production use: gunicorn -c gunicorn_conf.py wsgi:app")
+    logger.info("🚀 Starting Flask app on port %s", port)
+    app.run(host='0.0.0.0', port=port, debug=os.getenv("FLASK_DEBUG", "0") == "1", threaded=True)
@@ -0,0 +1,39 @@
+"""
+Process bootstrap for the AI service.
+
+Import this module before anything that pulls in CrewAI/LiteLLM: it loads the
+project .env file, pins the LiteLLM/OpenAI model variables (which LiteLLM
+reads at import time) and configures logging before services initialize.
+"""
+
+import os
+from pathlib import Path
+
+# Load .env file from parent directory (project root) BEFORE reading environment variables
+try:
+    from dotenv import load_dotenv
+    # Get the parent directory (project root) where .env file is located
+    current_file = Path(__file__).resolve()
+    project_root = current_file.parent.parent  # Go up from ai_service/ to project root
+    env_path = project_root / '.env'
+    if env_path.exists():
+        load_dotenv(dotenv_path=env_path)
+        print(f"✅ Loaded .env file from {env_path}")
+    else:
+        print(f"⚠️ .env file not found at {env_path}")
+except ImportError:
+    print("⚠️ python-dotenv not installed. Install with: pip install python-dotenv")
+except Exception as e:
+    print(f"⚠️ Error loading .env file: {e}")
+
+# CRITICAL: Set LiteLLM environment variables BEFORE importing CrewAI/LiteLLM
+# LiteLLM reads these at import time, so they must be set early
+if not os.getenv("LITELLM_MODEL"):
+    os.environ["LITELLM_MODEL"] = "gpt-4o"
+if not os.getenv("OPENAI_MODEL"):
+    os.environ["OPENAI_MODEL"] = "gpt-4o"
+
+from utils import setup_logging  # noqa: E402
+
+# Set up logging
+setup_logging()
@@ -1,23 +1,37 @@
-"""Browser automation tools for AI service."""
-
-from .browser_config import BrowserSecurityConfig
-from .browser_sessions import BrowserSessionManager
-from .navigation_tool import BrowserNavigationTool
-from .interaction_tool import BrowserInteractionTool
-from .extraction_tool import BrowserExtractionTool
-from .screenshot_tool import BrowserScreenshotTool
-from .vision_analysis_tool import BrowserVisionAnalysisTool
-from .realtime_tool import BrowserRealtimeTool
-from .performance_tool import BrowserPerformanceTool
-
-__all__ = [
-    "BrowserSecurityConfig",
-    "BrowserSessionManager",
-    "BrowserNavigationTool",
-    "BrowserInteractionTool",
-    "BrowserExtractionTool",
-    "BrowserScreenshotTool",
-    "BrowserVisionAnalysisTool",
-    "BrowserRealtimeTool",
-    "BrowserPerformanceTool",
-]
+"""Browser automation tools for AI service.
+
+Tool classes are imported on first attribute access (PEP 562) so that
+`from browser_tools.browser_config import ...` or importing a single tool
+does not pull in Playwright and every other tool module.
+"""
+
+import importlib
+
+# Public name -> submodule that defines it
+_LAZY_IMPORTS = {
+    "BrowserSecurityConfig": ".browser_config",
+    "BrowserSessionManager": ".browser_sessions",
+    "BrowserNavigationTool": ".navigation_tool",
+    "BrowserInteractionTool": ".interaction_tool",
+    "BrowserExtractionTool": ".extraction_tool",
+    "BrowserScreenshotTool": ".screenshot_tool",
+    "BrowserVisionAnalysisTool": ".vision_analysis_tool",
+    "BrowserRealtimeTool": ".realtime_tool",
+    "BrowserPerformanceTool": ".performance_tool",
+}
+
+__all__ = list(_LAZY_IMPORTS)
+
+
+def __getattr__(name):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    # Cache on the package so later lookups bypass __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -2,29 +2,104 @@
 
 from __future__ import annotations
 
+import os
 from dataclasses import dataclass, field
-from typing import Iterable, List, Optional
-from urllib.parse import urlparse
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
 
+# Upload root used when allowed_upload_dirs is empty
+DEFAULT_UPLOAD_DIR = "/tmp/uploads"
 
-@dataclass
+# Number of distinct URLs whose policy decision is memoized per config
+URL_DECISION_CACHE_SIZE = 1024
+
+# WHATWG "special" schemes: browsers also end their authority at a backslash
+SPECIAL_URL_SCHEMES = frozenset({"http", "https", "ws", "wss", "ftp", "file"})
+
+
+def _canonical_domain(domain: str) -> str:
+    """Lower-case a host[:port] and drop the DNS root dot ("Example.com.:443" -> "example.com:443")."""
+
+    return domain.lower().replace(".:", ":").rstrip(".")
+
+
+@lru_cache(maxsize=4096)
+def _cached_netloc(url: str) -> str:
+    """Canonical host[:port] of a URL with any userinfo removed; empty when the URL has no authority.
+
+    The authority ends where a browser would end it: for special schemes a backslash is a
+    path separator, so "http://evil.com\\@allowed.com/" resolves to evil.com, not allowed.com.
+    """
+
+    # Fast path for the common "scheme://host/..." shape; anything unusual
+    # (leading whitespace, control characters, odd schemes) goes through urlsplit.
+    scheme_end = url.find("://")
+    if scheme_end > 0 and url[:scheme_end].isalpha() and url.isprintable():
+        scheme = url[:scheme_end].lower()
+        start = scheme_end + 3
+        end = len(url)
+        for delimiter in "/?#":
+            found = url.find(delimiter, start)
+            if found != -1 and found < end:
+                end = found
+        netloc = url[start:end]
+    else:
+        parsed = urlsplit(url)
+        scheme, netloc = parsed.scheme, parsed.netloc
+    if "\\" in netloc:
+        if scheme not in SPECIAL_URL_SCHEMES:
+            return ""  # Not a valid authority; refuse rather than guess
+        netloc = netloc.split("\\", 1)[0]
+    return _canonical_domain(netloc.rpartition("@")[2])
+
+
+def _strip_port(domain: str) -> str:
+    """Host part of a host[:port], keeping bracketed IPv6 literals ("[::1]:3000" -> "[::1]") intact."""
+
+    if domain.startswith("["):
+        return domain[:domain.find("]") + 1] or domain
+    return domain.split(":", 1)[0]
+
+
+def _reversed_labels(host: str) -> Tuple[str, ...]:
+    """Dotted host labels from the TLD inwards, without any port."""
+
+    return tuple(reversed(_strip_port(host).split('.')))
+
+
+def _wildcard_index(domains: Iterable[str]) -> FrozenSet[Tuple[str, ...]]:
+    """Reversed-label keys for the "*.example.com" entries of a canonical domain list."""
+
+    return frozenset(_reversed_labels(d[2:]) for d in domains if d.startswith("*."))
+
+
+def _matches_wildcard(host: str, index: FrozenSet[Tuple[str, ...]]) -> bool:
+    """True when host is a strict subdomain of an entry in a _wildcard_index."""
+
+    labels = _reversed_labels(host)
+    return any(labels[:i] in index for i in range(len(labels) - 1, 0, -1))
+
+
+@dataclass(frozen=True, slots=True)
 class BrowserSecurityConfig:
     """Configuration that governs browser automation safeguards."""
 
-    allowed_domains: List[str] = field(default_factory=list)
-    blocked_domains: List[str] = field(default_factory=list)
+    allowed_domains: Tuple[str, ...] = ()
+    blocked_domains: Tuple[str, ...] = ()
     max_pages_per_session: int = 50
     max_session_duration_minutes: int = 30
     rate_limit_per_minute: int = 60
+    max_tracked_rate_limit_keys: int = 10000  # Least recently used session keys beyond this are forgotten
     require_authentication: bool = False
     enable_screenshots: bool = True
     log_actions: bool = True
     wait_timeout_ms: int = 60000  # Default wait timeout for selectors (60 seconds)
     optional_selector_timeout_ms: int = 5000  # Shorter timeout for optional selectors like canvas (5 seconds) - page can proceed without them
-    allowed_upload_dirs: List[str] = field(default_factory=lambda: ["/tmp/uploads"])  # Allowed directories for file uploads
+    allowed_upload_dirs: Tuple[str, ...] = (DEFAULT_UPLOAD_DIR,)  # Allowed directories for file uploads
 
     # Memory management limits
-    max_event_queue_size: int = 1000  # Maximum events in async queue before blocking
     max_recent_events: int = 200  # Maximum events stored in deque
     max_screenshot_size_mb: float = 10.0  # Maximum screenshot size in MB
     max_screenshots_stored: int = 5  # Maximum number of screenshots to keep in memory
@@ -32,6 +107,8 @@ class BrowserSecurityConfig:
     max_console_messages: int = 200  # Maximum console messages to store
     max_dom_mutations: int = 200  # Maximum DOM mutations to store
     max_websocket_messages: int = 200  # Maximum WebSocket messages to store
+    max_websocket_frame_bytes: int = 64 * 1024  # Frames longer than this are truncated before storage
+    max_websocket_total_mb: float = 4.0  # Maximum combined size of stored WebSocket frames in MB
 
     # Operation timeouts
     navigation_timeout_ms: int = 60000  # Page navigation timeout (increased for slow-loading pages with WebSockets)
@@ -39,36 +116,122 @@ class BrowserSecurityConfig:
     screenshot_timeout_ms: int = 15000  # Screenshot capture timeout
     vision_analysis_timeout_ms: int = 60000  # Vision API timeout
 
+    # Lookup sets derived from the domain lists in __post_init__
+    _has_allowed: bool = field(init=False, repr=False, compare=False)
+    _has_blocked: bool = field(init=False, repr=False, compare=False)
+    _allowed: FrozenSet[str] = field(init=False, repr=False, compare=False)
+    _allowed_hosts: FrozenSet[str] = field(init=False, repr=False, compare=False)
+    _allowed_suffixes: FrozenSet[Tuple[str, ...]] = field(init=False, repr=False, compare=False)
+    _blocked: FrozenSet[str] = field(init=False, repr=False, compare=False)
+    _blocked_suffixes: FrozenSet[Tuple[str, ...]] = field(init=False, repr=False, compare=False)
+    _upload_roots: FrozenSet[Path] = field(init=False, repr=False, compare=False)
+    _url_decisions: Dict[str, bool] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # Accept any iterable (e.g. lists from callers) but store immutable tuples
+        for name in ("allowed_domains", "blocked_domains", "allowed_upload_dirs"):
+            value = getattr(self, name)
+            if not isinstance(value, tuple):
+                object.__setattr__(self, name, tuple(value))
+        self.refresh_domain_policy()
+
+    def refresh_domain_policy(self) -> None:
+        """Rebuild the lookup sets derived from the domain and upload directory fields."""
+
+        # The dataclass is frozen, so derived state is set with object.__setattr__
+        set_derived = object.__setattr__
+        allowed = [_canonical_domain(d) for d in self.allowed_domains]
+        blocked = [_canonical_domain(d) for d in self.blocked_domains]
+        set_derived(self, "_has_allowed", bool(allowed))
+        set_derived(self, "_has_blocked", bool(blocked))
+        set_derived(self, "_allowed_hosts", frozenset(_strip_port(d) for d in allowed))
+        set_derived(self, "_allowed_suffixes", _wildcard_index(allowed))
+        set_derived(self, "_blocked", frozenset(blocked))
+        set_derived(self, "_blocked_suffixes", _wildcard_index(blocked))
+        # Exact allowlist entries that no blocklist entry covers; a hit here is final
+        set_derived(self, "_allowed", frozenset(
+            d for d in allowed
+            if d not in self._blocked and not _matches_wildcard(_strip_port(d), self._blocked_suffixes)
+        ))
+        set_derived(self, "_url_decisions", {})
+        set_derived(self, "_upload_roots", frozenset(
+            Path(d).resolve() for d in (self.allowed_upload_dirs or [DEFAULT_UPLOAD_DIR])
+        ))
+
+    def is_upload_path_allowed(self, path: Path) -> bool:
+        """Return True when a resolved path lies inside one of the allowed upload directories."""
+
+        return path in self._upload_roots or not self._upload_roots.isdisjoint(path.parents)
+
     def is_url_allowed(self, url: str) -> bool:
         """Return True when the supplied URL is permitted by the policy."""
 
-        parsed = urlparse(url)
-        domain = parsed.netloc  # This includes port, e.g., "localhost:3000"
+        decision = self._url_decisions.get(url)
+        if decision is None:
+            decision = self._check_url(url)
+            if len(self._url_decisions) >= URL_DECISION_CACHE_SIZE:
+                self._url_decisions.clear()
+            self._url_decisions[url] = decision
+        return decision
+
+    def are_urls_allowed(self, urls: Iterable[str]) -> List[bool]:
+        """Batch form of is_url_allowed for link filtering; each distinct URL is checked once."""
+
+        urls = list(urls)
+        is_allowed = self.is_url_allowed
+        decisions = {url: is_allowed(url) for url in dict.fromkeys(urls)}
+        return [decisions[url] for url in urls]
+
+    def _check_url(self, url: str) -> bool:
+        domain = _cached_netloc(url)  # Lower-cased and includes port, e.g., "localhost:3000"
         if not domain:
             return False
 
-        if self.blocked_domains and domain in self.blocked_domains:
+        # Exact allowlist match (includes port) is the common case in production
+        if domain in self._allowed:
+            return True
+
+        host = _strip_port(domain)
+        return not self._is_blocked(domain, host) and self._is_allowed(host)
+
+    def _is_blocked(self, domain: str, host: str) -> bool:
+        if not self._has_blocked:
             return False
 
-        # If no allowed domains specified, allow all (for development)
-        if not self.allowed_domains:
+        # A frozenset lookup is one hash and probe at any blocklist size, so no probabilistic
+        # pre-filter is placed in front of it
+        if domain in self._blocked:
             return True
+        return bool(self._blocked_suffixes) and _matches_wildcard(host, self._blocked_suffixes)
 
-        # Check exact match first (includes port)
-        if domain in self.allowed_domains:
+    def _is_allowed(self, host: str) -> bool:
+        # If no allowed domains specified, allow all (for development)
+        if not self._has_allowed:
             return True
-        
+
         # Also check without port for flexibility
-        domain_without_port = domain.split(':')[0]
-        allowed_without_ports = [d.split(':')[0] for d in self.allowed_domains]
-        if domain_without_port in allowed_without_ports:
+        if host in self._allowed_hosts:
             return True
 
-        return False
+        # "*.example.com" entries allow any subdomain of example.com (not example.com itself)
+        return bool(self._allowed_suffixes) and _matches_wildcard(host, self._allowed_suffixes)
 
     @classmethod
     def from_env(cls, allowed: Optional[Iterable[str]] = None) -> "BrowserSecurityConfig":
-        """Construct a config using environment-derived defaults."""
+        """
+        Construct a config using environment-derived defaults.
+
+        When `allowed` is None the allowlist is read from BROWSER_ALLOWED_DOMAINS
+        (comma separated). Configs are shared between callers with the same
+        allowlist.
+        """
+
+        if allowed is None:
+            allowed = os.getenv("BROWSER_ALLOWED_DOMAINS", "").split(",")
+        domains = {domain.strip() for domain in allowed if domain and domain.strip()}
+        return _from_env_cached(cls, tuple(sorted(domains)))
+
 
-        allowed_domains = list(allowed or [])
-        return cls(allowed_domains=allowed_domains)
+@lru_cache(maxsize=8)
+def _from_env_cached(cls: type, allowed_domains: Tuple[str, ...]) -> BrowserSecurityConfig:
+    return cls(allowed_domains=allowed_domains)
@@ -3,30 +3,411 @@
 from __future__ import annotations
 
 import asyncio
+import base64
+import hashlib
 import json
 import logging
 import os
 import tempfile
 import time
-from collections import defaultdict, deque
+import uuid
+from collections import OrderedDict, deque
 from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
-from typing import Any, Deque, Dict, List, Optional, Tuple
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple, Union
+from urllib.parse import urlsplit
 
-from playwright.async_api import Browser, BrowserContext, Page, WebSocket, async_playwright
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+import requests
+from playwright.async_api import Browser, BrowserContext, Page, Route, WebSocket, async_playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 
 from .browser_config import BrowserSecurityConfig
 
 logger = logging.getLogger(__name__)
 
 
+def _serialize_event(event: Dict[str, Any]) -> bytes:
+    """UTF-8 JSON of an event for substring pattern matching (orjson when installed)."""
+
+    if orjson is not None:
+        try:
+            return orjson.dumps(event, default=str, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    return json.dumps(event, default=str, ensure_ascii=False).encode("utf-8")
+
+# DOM mutations are buffered in the page and sent to Python at most once per
+# flush interval, with at most MUTATION_BATCH_LIMIT records per flush
+MUTATION_FLUSH_MS = 100
+MUTATION_BATCH_LIMIT = 50
+
+# Binding the in-page MutationObserver reports through; registered once per context
+MUTATION_BINDING_NAME = "__dsmMutationCallback"
+
+# Installed with BrowserContext.add_init_script so every page and navigation gets it
+MUTATION_OBSERVER_JS = """
+({ callbackName, flushMs, batchLimit }) => {
+    // Main frame only, once per document
+    if (window !== window.top || window.__dsmMutationObserver) {
+        return;
+    }
+    let pending = [];
+    let dropped = 0;
+    let flushTimer = null;
+    const notify = (payload) => {
+        try {
+            window[callbackName](payload);
+        } catch (err) {
+            console.warn('Failed to notify mutation observer', err);
+        }
+    };
+    const observer = new MutationObserver((mutations) => {
+        // Only serialize what fits in the current batch; count the rest
+        const room = Math.max(0, batchLimit - pending.length);
+        dropped += Math.max(0, mutations.length - room);
+        const serialized = mutations.slice(0, room).map((mutation) => ({
+            type: mutation.type,
+            target: mutation.target && mutation.target.outerHTML
+                ? mutation.target.outerHTML.slice(0, 500)
+                : null,
+            addedNodes: Array.from(mutation.addedNodes || []).map((node) => {
+                if (node.outerHTML) {
+                    return node.outerHTML.slice(0, 500);
+                }
+                return node.textContent ? node.textContent.slice(0, 200) : node.nodeName;
+            }),
+            removedNodes: Array.from(mutation.removedNodes || []).map((node) => {
+                if (node.outerHTML) {
+                    return node.outerHTML.slice(0, 500);
+                }
+                return node.textContent ? node.textContent.slice(0, 200) : node.nodeName;
+            }),
+            attributeName: mutation.attributeName || null,
+        }));
+        pending.push(...serialized);
+        if (flushTimer === null) {
+            flushTimer = setTimeout(flush, flushMs);
+        }
+    });
+    const flush = () => {
+        flushTimer = null;
+        if (pending.length) {
+            notify({ mutations: pending, dropped });
+        }
+        pending = [];
+        dropped = 0;
+    };
+    const start = () => {
+        observer.observe(document.body, {
+            childList: true,
+            subtree: true,
+            attributes: true,
+        });
+    };
+    window.__dsmMutationObserver = observer;
+    if (document.body) {
+        start();
+    } else {
+        document.addEventListener('DOMContentLoaded', start, { once: true });
+    }
+}
+"""
+
+# Readiness probes for auth state pages, each bounded by AUTH_STATE_READY_TIMEOUT_MS:
+# the frontend has loaded (its Supabase client or Next.js runtime is present), and
+# supabase-js has persisted the session to localStorage
+AUTH_STATE_READY_TIMEOUT_MS = 2000
+# Overall deadline for building auth state in the browser
+AUTH_STATE_TIMEOUT_SECONDS = 60
+HYDRATION_READY_JS = """
+() => document.readyState === 'complete' && !!(window.__SUPABASE_CLIENT__ || window.next)
+"""
+SESSION_PERSISTED_JS = """
+() => Object.keys(window.localStorage).some((key) => key.startsWith('sb-') && key.endsWith('-auth-token'))
+"""
+
+# Passed to page.evaluate with the Supabase URL, anon key and access token as
+# arguments, so nothing user-supplied is spliced into the source
+SET_SESSION_JS = """
+async ({ supabaseUrl, supabaseAnonKey, accessToken }) => {
+    try {
+        // Wait for Next.js to load and Supabase client to be available
+        // The frontend should have Supabase client initialized via getSupabaseClient()
+        let supabase = null;
+
+        // Try to access Supabase client from window (if exposed)
+        if (window.__SUPABASE_CLIENT__) {
+            supabase = window.__SUPABASE_CLIENT__;
+        } else {
+            // Try to get it from the module system (Next.js)
+            // We'll create our own client using the same config as frontend.
+            // Prefer the bundle injected as an init script; fall back to the CDN
+            const supabaseModule = window.__SUPABASE_FACTORY__
+                || await import('https://cdn.jsdelivr.net/npm/@supabase/supabase-js@2/dist/esm/index.js');
+            supabase = supabaseModule.createClient(supabaseUrl, supabaseAnonKey, {
+                // The context is saved and closed right away, so no refresh timers;
+                // persistSession writes the localStorage entry storage_state captures
+                auth: {
+                    autoRefreshToken: false,
+                    persistSession: true,
+                    detectSessionInUrl: false,
+                    storage: window.localStorage
+                }
+            });
+        }
+
+        if (!supabase) {
+            return { success: false, error: 'Could not access Supabase client' };
+        }
+
+        // Set session using Supabase's setSession method
+        // This properly initializes the session and triggers auth state changes
+        const { data, error } = await supabase.auth.setSession({
+            access_token: accessToken,
+            refresh_token: '' // Empty refresh token - access token should work for short-term
+        });
+
+        if (error) {
+            console.error('[AUTH] Failed to set Supabase session:', error);
+            return { success: false, error: error.message };
+        }
+
+        // Verify session was set correctly
+        const { data: { session }, error: getError } = await supabase.auth.getSession();
+        if (getError) {
+            console.error('[AUTH] Error getting session after setSession:', getError);
+            return { success: false, error: getError.message };
+        }
+
+        if (session && session.user) {
+            console.log('[AUTH] ✅ Supabase session set successfully:', {
+                userId: session.user.id,
+                email: session.user.email
+            });
+            return {
+                success: true,
+                userId: session.user.id, 
+                email: session.user.email,
+                hasAccessToken: !!session.access_token
+            };
+        } else {
+            console.error('[AUTH] Session was set but getSession returned null or no user');
+            return { success: false, error: 'Session not found after setSession' };
+        }
+    } catch (error) {
+        console.error('[AUTH] Error setting Supabase session:', error);
+        return { success: false, error: error.message || String(error) };
+    }
+}
+"""
+
+# When enabled, auth state files are written directly from the access token
+# instead of driving a browser through Supabase's setSession
+AUTH_STATE_FAST_PATH = os.getenv("AUTH_STATE_FAST_PATH", "0").lower() in ("1", "true", "yes", "on")
+
+
+def _decode_jwt_claims(token: str) -> Dict[str, Any]:
+    """Return the unverified payload of a JWT (the token is validated server-side)."""
+
+    payload = token.split(".")[1]
+    payload += "=" * (-len(payload) % 4)
+    return json.loads(base64.urlsafe_b64decode(payload))
+
+
+def _synthesize_storage_state(
+    frontend_url: str,
+    supabase_url: str,
+    access_token: str,
+    user_id: str,
+    user: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Build a Playwright storage state holding the Supabase session supabase-js would persist.
+
+    ``user`` is the Supabase Auth user object; without it one is assembled from the token claims.
+    """
+
+    project_ref = (urlsplit(supabase_url).hostname or "").split(".")[0]
+    if not project_ref:
+        raise ValueError(f"Cannot derive Supabase project ref from {supabase_url!r}")
+    frontend = urlsplit(frontend_url)
+    origin = f"{frontend.scheme}://{frontend.netloc}"
+
+    claims = _decode_jwt_claims(access_token)
+    expires_at = int(claims["exp"])
+    session = {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": max(0, expires_at - int(time.time())),
+        "expires_at": expires_at,
+        "refresh_token": "",
+        "user": user or {
+            "id": claims.get("sub") or user_id,
+            "aud": claims.get("aud"),
+            "role": claims.get("role"),
+            "email": claims.get("email"),
+            "app_metadata": claims.get("app_metadata", {}),
+            "user_metadata": claims.get("user_metadata", {}),
+        },
+    }
+    return {
+        "cookies": [],
+        "origins": [
+            {
+                "origin": origin,
+                "localStorage": [
+                    {"name": f"sb-{project_ref}-auth-token", "value": json.dumps(session)},
+                ],
+            }
+        ],
+    }
+
+
+@dataclass(frozen=True)
+class SupabaseConfig:
+    """Supabase project settings used to build browser auth state."""
+
+    url: Optional[str]
+    anon_key: Optional[str]
+
+
+@lru_cache(maxsize=1)
+def _supabase_config() -> SupabaseConfig:
+    """Read the Supabase URL and anon key once, preferring the server-side variable names."""
+
+    return SupabaseConfig(
+        url=os.getenv("SUPABASE_URL") or os.getenv("NEXT_PUBLIC_SUPABASE_URL"),
+        anon_key=os.getenv("SUPABASE_ANON_KEY") or os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY"),
+    )
+
+
+# Shared so Supabase Auth REST calls reuse pooled keep-alive connections
+SUPABASE_HTTP_TIMEOUT_SECONDS = 10
+_supabase_http = requests.Session()
+
+
+def _fetch_supabase_user(supabase_url: str, anon_key: str, access_token: str) -> Dict[str, Any]:
+    """Validate an access token against Supabase Auth and return its user (blocking; run in a thread)."""
+
+    response = _supabase_http.get(
+        f"{supabase_url.rstrip('/')}/auth/v1/user",
+        headers={"apikey": anon_key, "Authorization": f"Bearer {access_token}"},
+        timeout=SUPABASE_HTTP_TIMEOUT_SECONDS,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+# UMD build of supabase-js, fetched once per process and injected into auth state
+# pages so the setSession script does not import it from the CDN on every build
+SUPABASE_JS_BUNDLE_URL = os.getenv(
+    "SUPABASE_JS_BUNDLE_URL",
+    "https://cdn.jsdelivr.net/npm/@supabase/supabase-js@2/dist/umd/supabase.js",
+)
+SUPABASE_JS_FETCH_TIMEOUT_SECONDS = 15
+_supabase_js_bundle: Optional[str] = None  # "" once a fetch has failed
+
+
+def _fetch_supabase_js_bundle() -> str:
+    """Download the supabase-js UMD bundle (blocking; run in a thread)."""
+
+    response = _supabase_http.get(SUPABASE_JS_BUNDLE_URL, timeout=SUPABASE_JS_FETCH_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    return response.text
+
+
+async def _get_supabase_js_bundle() -> str:
+    """Return the cached supabase-js init script, or "" if it could not be fetched."""
+
+    global _supabase_js_bundle
+    if _supabase_js_bundle is None:
+        try:
+            source = await asyncio.to_thread(_fetch_supabase_js_bundle)
+            # The UMD build defines a global `supabase` namespace exposing createClient
+            _supabase_js_bundle = source + "\nwindow.__SUPABASE_FACTORY__ = supabase;"
+            logger.info("Cached supabase-js bundle (%d bytes) for auth state pages", len(source))
+        except Exception as exc:
+            logger.warning("Could not fetch supabase-js bundle, falling back to CDN import: %s", exc)
+            _supabase_js_bundle = ""
+    return _supabase_js_bundle
+
+
+# Chromium flags for headless automation in containers (the sandbox stays enabled)
+CHROMIUM_LAUNCH_ARGS = ["--disable-dev-shm-usage", "--disable-gpu", "--disable-extensions"]
+# Resource types auth state pages never need; only the document, scripts and API calls matter
+AUTH_STATE_BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media", "stylesheet"})
+
+
+async def _block_auth_state_assets(route: Route) -> None:
+    if route.request.resource_type in AUTH_STATE_BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+def _cancel_task(task: asyncio.Task) -> None:
+    """Cancel a task from any thread, on the loop that owns it."""
+
+    loop = task.get_loop()
+    if task.done() or loop.is_closed():
+        return
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if loop is running:
+        task.cancel()
+    else:
+        loop.call_soon_threadsafe(task.cancel)
+
+
+def run_browser_task(coro: Any) -> Any:
+    """
+    Run a browser tool coroutine from synchronous code (CrewAI worker threads).
+    Runs on the service's persistent event loop rather than a loop per call, so
+    the shared browser and the sessions' pages are reused between tool calls.
+    """
+
+    # Imported here: integration_layer loads the hybrid architecture, which imports these tools
+    from integration_layer import get_background_loop, run_async
+
+    loop = get_background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        # Called synchronously from a coroutine on that loop; nest_asyncio lets it re-enter
+        return loop.run_until_complete(coro)
+    return run_async(coro)
+
+
+# Saved Playwright storage states for authenticated sessions, swept periodically
+AUTH_STATE_DIR = Path(tempfile.gettempdir()) / "browser_auth_states"
+AUTH_STATE_MAX_AGE_MINUTES = 60
+AUTH_STATE_GC_INTERVAL_SECONDS = 300
+# Auth state files younger than this are reused (Supabase tokens last about an hour)
+AUTH_STATE_REUSE_SECONDS = 50 * 60
+# Auth state paths remembered per (user, token), reused until shortly before the token expires
+AUTH_STATE_PATH_CACHE_SIZE = 512
+AUTH_STATE_EXPIRY_MARGIN_SECONDS = 60
+
+
 @dataclass
 class BrowserSession:
     """Container for an automated browser session with bounded memory usage."""
 
     security: BrowserSecurityConfig
     created_at: float = field(default_factory=time.time)
+    expires_at_monotonic: float = field(default=0.0, init=False, repr=False)  # Lifetime deadline, set in __post_init__
     pages_opened: int = 0
+    manager: Optional["BrowserSessionManager"] = field(default=None, repr=False)  # Supplies contexts from the shared browser
     playwright: Optional[object] = None
     browser: Optional[Browser] = None
     context: Optional[BrowserContext] = None
@@ -34,7 +415,6 @@ class BrowserSession:
     pages: Dict[str, Page] = field(default_factory=dict)
     active_page_id: str = "default"
     storage_state_path: Optional[str] = None  # Path to authentication state file
-    event_queue: Optional[asyncio.Queue] = None  # Will be initialized in __post_init__
     recent_events: Optional[Deque[Dict[str, Any]]] = None
     websocket_messages: Optional[Deque[Dict[str, Any]]] = None
     network_requests: Optional[Deque[Dict[str, Any]]] = None
@@ -42,13 +422,26 @@ class BrowserSession:
     console_messages: Optional[Deque[Dict[str, Any]]] = None
     dom_mutations: Optional[Deque[Dict[str, Any]]] = None
     performance_metrics: Dict[str, Any] = field(default_factory=dict)
-    screenshots: Deque[Dict[str, str]] = field(default_factory=lambda: deque(maxlen=5))  # Stores multiple screenshots with metadata
+    screenshots: Deque[Dict[str, Any]] = field(default_factory=lambda: deque(maxlen=5))  # Stores raw PNG bytes with metadata
     total_screenshot_bytes: int = 0  # Track total screenshot memory usage
+    _ws_bytes: int = field(default=0, init=False, repr=False)  # Combined size of frames in websocket_messages
+    # Event fan-out: sequence number of the next recorded event, the first event not yet
+    # handed to a waiter, and a signal that is set (and replaced) whenever an event arrives
+    _event_seq: int = field(default=0, init=False, repr=False)
+    _delivered_seq: int = field(default=0, init=False, repr=False)
+    _event_signal: Optional[asyncio.Event] = field(default=None, init=False, repr=False)
+    _waiter_count: int = field(default=0, init=False, repr=False)  # Coroutines inside wait_for_event
+    # JSON of events already serialized for pattern matching, by sequence number
+    _serialized_events: Dict[int, bytes] = field(default_factory=dict, init=False, repr=False)
+    # Per-type buffer each recorded event is also appended to, keyed by event "type"
+    _type_deques: Dict[str, Deque[Dict[str, Any]]] = field(default_factory=dict, init=False, repr=False)
+    # The last max_recent_events events of each type, for filtered get_recent_events lookups
+    _events_by_type: Dict[str, Deque[Dict[str, Any]]] = field(default_factory=dict, init=False, repr=False)
 
     def __post_init__(self):
         """Initialize bounded queues based on security configuration."""
-        # Initialize bounded event queue
-        self.event_queue = asyncio.Queue(maxsize=self.security.max_event_queue_size)
+        self.expires_at_monotonic = time.monotonic() + self.security.max_session_duration_minutes * 60
+        self._event_signal = asyncio.Event()
 
         # Initialize bounded deques with configurable sizes
         self.recent_events = deque(maxlen=self.security.max_recent_events)
@@ -57,6 +450,14 @@ class BrowserSession:
         self.network_responses = deque(maxlen=self.security.max_network_events)
         self.console_messages = deque(maxlen=self.security.max_console_messages)
         self.dom_mutations = deque(maxlen=self.security.max_dom_mutations)
+        self._type_deques = {
+            "console": self.console_messages,
+            "dom_mutation": self.dom_mutations,
+            "network_request": self.network_requests,
+            "network_response": self.network_responses,
+            "websocket": self.websocket_messages,
+            "websocket_message": self.websocket_messages,
+        }
 
         # Initialize screenshots deque with configured max
         self.screenshots = deque(maxlen=self.security.max_screenshots_stored)
@@ -69,23 +470,26 @@ class BrowserSession:
             storage_state_path: Optional path to browser storage state file for authentication
         """
 
-        if not self.playwright:
-            self.playwright = await async_playwright().start()
-            self.browser = await self.playwright.chromium.launch(headless=True)
-            
+        if not self.context:
             # Use storage_state if provided (for authentication)
             context_options = {"viewport": {"width": 1920, "height": 1080}}
             if storage_state_path and os.path.exists(storage_state_path):
                 context_options["storage_state"] = storage_state_path
                 self.storage_state_path = storage_state_path
-                logger.info(f"Browser session initialized with auth state: {storage_state_path}")
+                logger.info("Browser session initialized with auth state: %s", storage_state_path)
             elif self.storage_state_path and os.path.exists(self.storage_state_path):
                 context_options["storage_state"] = self.storage_state_path
-                logger.info(f"Browser session using existing auth state: {self.storage_state_path}")
+                logger.info("Browser session using existing auth state: %s", self.storage_state_path)
             else:
                 logger.debug("Browser session initialized without authentication")
-            
-            self.context = await self.browser.new_context(**context_options)
+
+            if self.manager is not None:
+                self.context = await self.manager.acquire_context(**context_options)
+            else:
+                self.playwright = await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch(headless=True, args=CHROMIUM_LAUNCH_ARGS)
+                self.context = await self.browser.new_context(**context_options)
+            await self._install_mutation_observer(self.context)
             default_page = await self.context.new_page()
             self.pages_opened = 1
             self.active_page_id = "default"
@@ -156,15 +560,21 @@ class BrowserSession:
 
         return list(self.pages.keys())
 
+    @staticmethod
+    async def _safe_close(page: Page, page_id: str) -> None:
+        """Close a page, logging rather than raising on failure."""
+
+        try:
+            await page.close()
+        except Exception:
+            logger.debug("Failed to close page %s", page_id)
+
     async def close(self) -> None:
-        """Close the session and dispose resources."""
+        """Close the session and dispose resources (a shared browser is left running)."""
 
         try:
-            for page_id, page in list(self.pages.items()):
-                try:
-                    await page.close()
-                except Exception:
-                    logger.debug("Failed to close page %s", page_id)
+            # Each close is a CDP round-trip, so issue them together rather than one by one
+            await asyncio.gather(*(self._safe_close(page, page_id) for page_id, page in list(self.pages.items())))
             self.pages.clear()
             self.page = None
         finally:
@@ -190,20 +600,25 @@ class BrowserSession:
     def expired(self) -> bool:
         """Return True if the session exceeds lifetime or navigation limits."""
 
-        lifetime_minutes = (time.time() - self.created_at) / 60
-        if lifetime_minutes > self.security.max_session_duration_minutes:
-            return True
-        if self.pages_opened >= self.security.max_pages_per_session:
-            return True
-        return False
+        return (
+            time.monotonic() > self.expires_at_monotonic
+            or self.pages_opened >= self.security.max_pages_per_session
+        )
 
     async def record_screenshot(
-        self, screenshot_base64: str, metadata: Optional[Dict[str, Any]] = None
+        self, screenshot: Union[bytes, str], metadata: Optional[Dict[str, Any]] = None
     ) -> None:
-        """Store screenshot with size validation and automatic cleanup."""
+        """Store screenshot with size validation and automatic cleanup.
+
+        Accepts raw image bytes or a base64 string; screenshots are kept as raw
+        bytes and only base64-encoded when read back.
+        """
         try:
+            if isinstance(screenshot, str):
+                screenshot = base64.b64decode(screenshot)
+
             # Calculate screenshot size in MB
-            screenshot_bytes = len(screenshot_base64)
+            screenshot_bytes = len(screenshot)
             screenshot_mb = screenshot_bytes / (1024 * 1024)
 
             # Validate screenshot size
@@ -219,7 +634,7 @@ class BrowserSession:
 
             # Store screenshot with metadata
             screenshot_entry = {
-                "data": screenshot_base64,
+                "data": screenshot,
                 "timestamp": time.time(),
                 "size_bytes": screenshot_bytes,
                 "metadata": metadata or {},
@@ -257,14 +672,14 @@ class BrowserSession:
             raise
 
     def get_latest_screenshot(self) -> Optional[str]:
-        """Retrieve the most recent screenshot data."""
+        """Retrieve the most recent screenshot as a base64 string."""
         if self.screenshots:
-            return self.screenshots[-1]["data"]
+            return base64.b64encode(self.screenshots[-1]["data"]).decode("ascii")
         return None
 
     def get_screenshot_history(self, limit: int = 5) -> List[Dict[str, Any]]:
         """Retrieve recent screenshots with metadata (excluding base64 data)."""
-        screenshots = list(self.screenshots)[-limit:]
+        screenshots = reversed(list(islice(reversed(self.screenshots), max(limit, 0))))
         return [
             {
                 "timestamp": s["timestamp"],
@@ -311,51 +726,126 @@ class BrowserSession:
 
     async def wait_for_event(
         self,
-        event_type: Optional[str],
+        event_type: Optional[Union[str, Iterable[str]]],
         pattern: Optional[str],
         timeout: float,
     ) -> Dict[str, Any]:
-        """Wait for an event of a given type that optionally matches a pattern."""
+        """Wait for an event of a given type (or any of several types) that optionally matches a pattern.
+
+        Events are read from recent_events without being removed, so concurrent
+        waiters all see them. Each wait starts after the last event returned to a waiter.
+        """
+
+        types = {event_type} if isinstance(event_type, str) else set(event_type or ())
+        pattern_bytes = pattern.encode("utf-8") if pattern else None
+        deadline = time.monotonic() + timeout
+        self._waiter_count += 1
+        try:
+            return await self._wait_for_matching_event(types, pattern_bytes, deadline)
+        finally:
+            self._waiter_count -= 1
 
-        deadline = time.time() + timeout
+    async def _wait_for_matching_event(
+        self, types: Set[str], pattern_bytes: Optional[bytes], deadline: float
+    ) -> Dict[str, Any]:
+        next_seq = self._delivered_seq
         while True:
-            remaining = deadline - time.time()
+            first_seq = self._event_seq - len(self.recent_events)
+            start = max(next_seq, first_seq)
+            for seq, event in enumerate(islice(self.recent_events, start - first_seq, None), start):
+                if types and event.get("type") not in types:
+                    continue
+                if pattern_bytes:
+                    serialized = self._serialized_events.get(seq)
+                    if serialized is None:
+                        serialized = self._serialized_events[seq] = _serialize_event(event)
+                    if pattern_bytes not in serialized:
+                        continue
+                self._delivered_seq = max(self._delivered_seq, seq + 1)
+                return event
+            next_seq = self._event_seq
+
+            remaining = deadline - time.monotonic()
             if remaining <= 0:
                 raise TimeoutError("Timed out waiting for browser event")
-
             try:
-                event = await asyncio.wait_for(self.event_queue.get(), timeout=remaining)
-            except asyncio.TimeoutError as exc:  # pragma: no cover - defensive
+                await asyncio.wait_for(self._event_signal.wait(), timeout=remaining)
+            except asyncio.TimeoutError as exc:
                 raise TimeoutError("Timed out waiting for browser event") from exc
 
-            if event_type and event.get("type") != event_type:
-                continue
-
-            if pattern:
-                serialized = json.dumps(event, default=str)
-                if pattern not in serialized:
-                    continue
-
-            return event
-
     def get_recent_events(
         self, event_type: Optional[str] = None, limit: int = 20
     ) -> List[Dict[str, Any]]:
         """Return a snapshot of recent events, filtered by type if provided."""
 
-        events = list(self.recent_events)
+        # Walk back from the newest event so only the last `limit` entries are touched
         if event_type:
-            events = [event for event in events if event.get("type") == event_type]
-        return events[-limit:]
+            events = reversed(self._events_by_type.get(event_type, ()))
+        else:
+            events = reversed(self.recent_events)
+        recent = list(islice(events, max(limit, 0)))
+        recent.reverse()
+        return recent
+
+    def _record_websocket_frame(self, entry: Dict[str, Any]) -> None:
+        """Record a WebSocket frame, keeping stored frames within the configured byte budget."""
+
+        messages = self.websocket_messages
+        self._record_event(entry)
+        self._ws_bytes += entry["size_bytes"]
+
+        budget = int(self.security.max_websocket_total_mb * 1024 * 1024)
+        while self._ws_bytes > budget and len(messages) > 1:
+            self._ws_bytes -= messages.popleft().get("size_bytes", 0)
 
     def _record_event(self, event: Dict[str, Any]) -> None:
-        """Record an event in buffers and enqueue it for waiters."""
+        """Record an event in recent_events and its per-type buffers, and wake any waiters."""
 
+        if len(self.recent_events) == self.recent_events.maxlen:
+            # The oldest event is about to be evicted; drop its cached JSON too
+            self._serialized_events.pop(self._event_seq - len(self.recent_events), None)
         self.recent_events.append(event)
-        try:
-            self.event_queue.put_nowait(event)
-        except asyncio.QueueFull:  # pragma: no cover - defensive
-            logger.debug("Event queue full; dropping event")
+        event_type = event.get("type")
+        type_deque = self._type_deques.get(event_type)
+        if type_deque is not None:
+            if type_deque is self.websocket_messages and len(type_deque) == type_deque.maxlen:
+                # Connection events share this deque with frames; whichever entry is
+                # about to be evicted, release its share of the byte budget
+                self._ws_bytes -= type_deque[0].get("size_bytes", 0)
+            type_deque.append(event)
+        by_type = self._events_by_type.get(event_type)
+        if by_type is None:
+            by_type = self._events_by_type[event_type] = deque(maxlen=self.security.max_recent_events)
+        by_type.append(event)
+        self._event_seq += 1
+        if self._waiter_count:
+            signal, self._event_signal = self._event_signal, asyncio.Event()
+            signal.set()
+
+    async def _install_mutation_observer(self, context: BrowserContext) -> None:
+        """Register the mutation binding and observer script once for all pages in a context."""
+
+        await context.expose_binding(MUTATION_BINDING_NAME, self._handle_mutation_batch)
+        config = {
+            "callbackName": MUTATION_BINDING_NAME,
+            "flushMs": MUTATION_FLUSH_MS,
+            "batchLimit": MUTATION_BATCH_LIMIT,
+        }
+        await context.add_init_script(script=f"({MUTATION_OBSERVER_JS.strip()})({json.dumps(config)});")
+
+    def _handle_mutation_batch(self, source: Dict[str, Any], batch: Dict[str, Any]) -> None:
+        """Record a flushed batch of DOM mutations reported by a page's observer."""
+
+        source_page = source.get("page")
+        page_id = next((pid for pid, page in self.pages.items() if page is source_page), None)
+        entry = {
+            "type": "dom_mutation",
+            "timestamp": time.time(),
+            "page_id": page_id,
+            "mutations": batch.get("mutations", []),
+            "dropped": batch.get("dropped", 0),
+        }
+        self._record_event(entry)
 
     async def _register_page(self, page: Page, page_id: str) -> None:
         """Register a page with event listeners and bookkeeping."""
@@ -374,17 +864,6 @@ class BrowserSession:
                 "timestamp": time.time(),
                 "page_id": page_id,
             }
-            self.console_messages.append(entry)
-            self._record_event(entry)
-
-        async def handle_mutation(mutations: List[Dict[str, Any]]) -> None:
-            entry = {
-                "type": "dom_mutation",
-                "timestamp": time.time(),
-                "page_id": page_id,
-                "mutations": mutations,
-            }
-            self.dom_mutations.append(entry)
             self._record_event(entry)
 
         def handle_request(request) -> None:
@@ -396,7 +875,6 @@ class BrowserSession:
                 "method": request.method,
                 "resource_type": request.resource_type,
             }
-            self.network_requests.append(entry)
             self._record_event(entry)
 
         def handle_response(response) -> None:
@@ -407,7 +885,6 @@ class BrowserSession:
                 "url": response.url,
                 "status": response.status,
             }
-            self.network_responses.append(entry)
             self._record_event(entry)
 
         def handle_websocket(ws: WebSocket) -> None:
@@ -417,10 +894,23 @@ class BrowserSession:
                 "page_id": page_id,
                 "url": ws.url,
             }
-            self.websocket_messages.append(meta)
             self._record_event(meta)
 
-            def record_frame(data: str, direction: str) -> None:
+            def record_frame(data: Union[str, bytes], direction: str) -> None:
+                # Text frames are measured by their UTF-8 length, as sent on the wire
+                raw = data.encode("utf-8", "replace") if isinstance(data, str) else data
+                size = len(raw)
+                cap = self.security.max_websocket_frame_bytes
+                if size > cap:
+                    marker = f"...[truncated {size - cap} bytes]".encode()
+                    raw = raw[:cap] + marker
+                    size = len(raw)
+                    if isinstance(data, str):
+                        # Drop any character split by the cut
+                        data = raw.decode("utf-8", "ignore")
+                        size = len(data.encode("utf-8"))
+                    else:
+                        data = raw
                 entry = {
                     "type": "websocket_message",
                     "timestamp": time.time(),
@@ -428,9 +918,9 @@ class BrowserSession:
                     "url": ws.url,
                     "direction": direction,
                     "data": data,
+                    "size_bytes": size,
                 }
-                self.websocket_messages.append(entry)
-                self._record_event(entry)
+                self._record_websocket_frame(entry)
 
             ws.on("framereceived", lambda frame: record_frame(frame, "received"))
             ws.on("framesent", lambda frame: record_frame(frame, "sent"))
@@ -446,52 +936,6 @@ class BrowserSession:
         page.on("response", handle_response)
         page.on("websocket", handle_websocket)
 
-        callback_name = f"__dsmMutationCallback_{page_id}"
-
-        await page.expose_function(callback_name, handle_mutation)
-        await page.evaluate(
-            """
-            (callbackName) => {
-                const notify = (payload) => {
-                    try {
-                        window[callbackName](payload);
-                    } catch (err) {
-                        console.warn('Failed to notify mutation observer', err);
-                    }
-                };
-                const observer = new MutationObserver((mutations) => {
-                    const serialized = mutations.map((mutation) => ({
-                        type: mutation.type,
-                        target: mutation.target && mutation.target.outerHTML
-                            ? mutation.target.outerHTML.slice(0, 500)
-                            : null,
-                        addedNodes: Array.from(mutation.addedNodes || []).map((node) => {
-                            if (node.outerHTML) {
-                                return node.outerHTML.slice(0, 500);
-                            }
-                            return node.textContent ? node.textContent.slice(0, 200) : node.nodeName;
-                        }),
-                        removedNodes: Array.from(mutation.removedNodes || []).map((node) => {
-                            if (node.outerHTML) {
-                                return node.outerHTML.slice(0, 500);
-                            }
-                            return node.textContent ? node.textContent.slice(0, 200) : node.nodeName;
-                        }),
-                        attributeName: mutation.attributeName || null,
-                    }));
-                    notify(serialized);
-                });
-                observer.observe(document.body, {
-                    childList: true,
-                    subtree: true,
-                    attributes: true,
-                });
-                window.__dsmMutationObserver = observer;
-            }
-            """,
-            callback_name,
-        )
-
 
 class BrowserSessionManager:
     """Manage browser sessions identified by a session key with user isolation and rate limiting."""
@@ -500,22 +944,135 @@ class BrowserSessionManager:
         self.security = security_config or BrowserSecurityConfig()
         self._sessions: Dict[str, BrowserSession] = {}
         self._lock = asyncio.Lock()
-        # Rate limiting: track request times per session
-        self._request_times: Dict[str, list] = defaultdict(list)
-        self._rate_limit_lock = asyncio.Lock()
-        # Lock for auth state creation to prevent concurrent attempts
-        self._auth_state_lock = asyncio.Lock()
-        # Track ongoing auth state creation to avoid duplicates
-        self._auth_state_creation: Dict[str, asyncio.Task] = {}
+        # Rate limiting: track request times (time.monotonic) per session in a sliding window,
+        # least recently used keys first so transient session ids can be evicted
+        self._request_times: "OrderedDict[str, Deque[float]]" = OrderedDict()
+        # Per-user locks so concurrent requests for one user build its auth state once
+        # while different users build in parallel; idle locks are pruned by the sweep
+        self._auth_state_locks: Dict[str, asyncio.Lock] = {}
+        # Shared Playwright/Chromium process per event loop, since Playwright objects are bound to
+        # the loop that created them; sessions only get their own BrowserContext
+        self._browsers: Dict[asyncio.AbstractEventLoop, Tuple[object, Optional[Browser]]] = {}
+        self._browser_locks: Dict[asyncio.AbstractEventLoop, asyncio.Lock] = {}
+        self._warned_missing_user = False
+        # Parsed storage state files by path: (mtime, loaded_at monotonic, state)
+        self._storage_state_cache: Dict[str, Tuple[float, float, Dict[str, Any]]] = {}
+        # Auth state file per (user_id, token digest) with the token's expiry, least recently used first
+        self._auth_state_paths: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+        # Periodic sweep of expired auth state files, started on first get_session
+        self._auth_state_gc_task: Optional[asyncio.Task] = None
+
+    def _ensure_auth_state_gc(self) -> None:
+        """Start the auth state sweep on the running loop if it is not already running there."""
+
+        task = self._auth_state_gc_task
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            if task is not None:
+                # One sweep is enough; stop the one left on the previous loop
+                _cancel_task(task)
+            self._auth_state_gc_task = asyncio.create_task(self._auth_state_gc_loop())
+
+    async def _auth_state_gc_loop(self) -> None:
+        while True:
+            await asyncio.sleep(AUTH_STATE_GC_INTERVAL_SECONDS)
+            await self._cleanup_old_auth_states(AUTH_STATE_DIR, AUTH_STATE_MAX_AGE_MINUTES)
+            for user_id, lock in list(self._auth_state_locks.items()):
+                if not lock.locked():
+                    del self._auth_state_locks[user_id]
+
+    async def _get_browser(self) -> Browser:
+        """Return the shared browser, launching it on first use or after a disconnect."""
+
+        loop = asyncio.get_running_loop()
+        for stale_loop in [other for other in self._browsers if other.is_closed()]:
+            # Nothing can run on a closed loop any more, so its browser cannot be closed cleanly
+            logger.warning("Dropping shared browser of an event loop that closed without shutdown()")
+            del self._browsers[stale_loop]
+            self._browser_locks.pop(stale_loop, None)
+
+        lock = self._browser_locks.get(loop)
+        if lock is None:
+            lock = self._browser_locks[loop] = asyncio.Lock()
+        async with lock:
+            playwright, browser = self._browsers.get(loop, (None, None))
+            if browser is None or not browser.is_connected():
+                if playwright is None:
+                    playwright = await async_playwright().start()
+                    self._browsers[loop] = (playwright, None)
+                browser = await playwright.chromium.launch(headless=True, args=CHROMIUM_LAUNCH_ARGS)
+                self._browsers[loop] = (playwright, browser)
+                logger.info("Launched shared Chromium browser for browser sessions")
+            return browser
+
+    async def acquire_context(self, **context_options: Any) -> BrowserContext:
+        """Create a new isolated BrowserContext on the shared browser."""
+
+        storage_state = context_options.get("storage_state")
+        if isinstance(storage_state, str):
+            cached_state = self._load_storage_state(storage_state)
+            if cached_state is not None:
+                context_options["storage_state"] = cached_state
+
+        browser = await self._get_browser()
+        return await browser.new_context(**context_options)
+
+    def _load_storage_state(self, path: str) -> Optional[Dict[str, Any]]:
+        """Return a parsed storage state file, re-reading it only when its mtime changes."""
+
+        now = time.monotonic()
+        for cached_path, (_, loaded_at, _) in list(self._storage_state_cache.items()):
+            if now - loaded_at > AUTH_STATE_REUSE_SECONDS:
+                del self._storage_state_cache[cached_path]
+
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            self._storage_state_cache.pop(path, None)
+            return None
+
+        cached = self._storage_state_cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[2]
+
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            state = orjson.loads(data) if orjson is not None else json.loads(data)
+        except (OSError, ValueError) as exc:
+            logger.warning("Could not read storage state %s: %s", path, exc)
+            return None
+        self._storage_state_cache[path] = (mtime, now, state)
+        return state
+
+    def _save_storage_state(self, path: Path, state: Dict[str, Any]) -> None:
+        """Write a storage state file (owner-only) and seed the parsed-state cache with it.
+
+        The file is written under a temporary name and renamed into place, so readers never
+        see a partially written state.
+        """
+
+        data = orjson.dumps(state) if orjson is not None else json.dumps(state).encode("utf-8")
+        tmp_path = path.with_name(f"{path.name}.tmp.{os.getpid()}.{uuid.uuid4().hex}")
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        self._storage_state_cache[str(path)] = (path.stat().st_mtime, time.monotonic(), state)
 
     def _get_session_key(self, session_id: str, user_id: Optional[str] = None) -> str:
         """Generate a user-scoped session key to prevent conflicts."""
         if user_id:
             return f"{user_id}:{session_id}"
-        # If no user_id provided, use session_id but log warning
-        logger.warning(
-            "Session created without user_id. Consider providing user_id for proper isolation."
-        )
+        # If no user_id provided, use session_id but log warning (once per manager)
+        if not self._warned_missing_user:
+            self._warned_missing_user = True
+            logger.warning(
+                "Session created without user_id. Consider providing user_id for proper isolation."
+            )
         return session_id
 
     async def _check_rate_limit(self, session_key: str) -> Tuple[bool, str]:
@@ -523,23 +1080,32 @@ class BrowserSessionManager:
         if self.security.rate_limit_per_minute <= 0:
             return True, ""  # Rate limiting disabled
 
-        async with self._rate_limit_lock:
-            now = time.time()
-            cutoff = now - 60  # last minute
-            times = self._request_times[session_key]
-            # Remove old requests outside the time window
-            times[:] = [t for t in times if t > cutoff]
-
-            if len(times) >= self.security.rate_limit_per_minute:
-                remaining = int(60 - (now - times[0])) if times else 0
-                return False, (
-                    f"Rate limit exceeded: {len(times)}/{self.security.rate_limit_per_minute} "
-                    f"requests per minute. Retry after {remaining} seconds."
-                )
+        # No await below, so the check-and-record runs atomically on the event loop
+        now = time.monotonic()
+        cutoff = now - 60  # last minute
+        times = self._request_times.get(session_key)
+        if times is None:
+            times = self._request_times[session_key] = deque(
+                maxlen=max(self.security.rate_limit_per_minute, 1)
+            )
+            while len(self._request_times) > self.security.max_tracked_rate_limit_keys:
+                self._request_times.popitem(last=False)
+        else:
+            self._request_times.move_to_end(session_key)
+        # Remove old requests outside the time window (times are in arrival order)
+        while times and times[0] <= cutoff:
+            times.popleft()
+
+        if len(times) >= self.security.rate_limit_per_minute:
+            remaining = int(60 - (now - times[0])) if times else 0
+            return False, (
+                f"Rate limit exceeded: {len(times)}/{self.security.rate_limit_per_minute} "
+                f"requests per minute. Retry after {remaining} seconds."
+            )
 
-            # Record this request
-            times.append(now)
-            return True, ""
+        # Record this request
+        times.append(now)
+        return True, ""
 
     async def get_session(
         self, 
@@ -558,6 +1124,7 @@ class BrowserSessionManager:
         """
 
         session_key = self._get_session_key(session_id, user_id)
+        self._ensure_auth_state_gc()
 
         # Check rate limit
         allowed, error_msg = await self._check_rate_limit(session_key)
@@ -565,38 +1132,18 @@ class BrowserSessionManager:
             raise ValueError(error_msg)
 
         # Create or get auth state if auth_token provided
-        # Use lock to prevent concurrent auth state creation for same user
+        # Use a per-user lock so concurrent callers wait for one build and then reuse it
         storage_state_path = None
         if auth_token and user_id:
-            async with self._auth_state_lock:
-                # Check if auth state creation is already in progress for this user
-                auth_key = f"{user_id}:{auth_token[:20]}"
-                if auth_key in self._auth_state_creation:
-                    # Wait for existing creation to complete
-                    logger.info(f"Auth state creation already in progress for user {user_id}, waiting...")
-                    try:
-                        storage_state_path = await self._auth_state_creation[auth_key]
-                    except Exception as e:
-                        logger.warning(f"Existing auth state creation failed: {e}")
-                        # Fall through to create new one
-                    finally:
-                        self._auth_state_creation.pop(auth_key, None)
-                
-                # Create new auth state if not already created/waiting
-                if not storage_state_path:
-                    logger.info(f"Starting auth state creation for user {user_id}")
-                    creation_task = asyncio.create_task(
-                        self._get_or_create_auth_state(
-                            user_id=user_id,
-                            auth_token=auth_token,
-                            frontend_url=frontend_url or "http://localhost:3000"
-                        )
-                    )
-                    self._auth_state_creation[auth_key] = creation_task
-                    try:
-                        storage_state_path = await creation_task
-                    finally:
-                        self._auth_state_creation.pop(auth_key, None)
+            lock = self._auth_state_locks.setdefault(user_id, asyncio.Lock())
+            if lock.locked():
+                logger.info("Auth state creation already in progress for user %s, waiting...", user_id)
+            async with lock:
+                storage_state_path = await self._get_or_create_auth_state(
+                    user_id=user_id,
+                    auth_token=auth_token,
+                    frontend_url=frontend_url or "http://localhost:3000"
+                )
 
         async with self._lock:
             session = self._sessions.get(session_key)
@@ -607,14 +1154,14 @@ class BrowserSessionManager:
                 self._request_times.pop(session_key, None)
 
             if not session:
-                session = BrowserSession(self.security)
+                session = BrowserSession(self.security, manager=self)
                 if storage_state_path:
                     session.storage_state_path = storage_state_path
                 self._sessions[session_key] = session
             elif storage_state_path and not session.storage_state_path:
                 # Update existing session with auth state if it doesn't have one
                 session.storage_state_path = storage_state_path
-                logger.info(f"Updated existing session {session_key} with auth state")
+                logger.info("Updated existing session %s with auth state", session_key)
 
         # Use storage_state_path if provided, otherwise use session's stored path
         effective_storage_state = storage_state_path or session.storage_state_path
@@ -635,20 +1182,51 @@ class BrowserSessionManager:
             await session.close()
 
     async def shutdown(self) -> None:
-        """Close all managed sessions."""
+        """Close all managed sessions and the shared browser of every event loop."""
+
+        if self._auth_state_gc_task is not None:
+            _cancel_task(self._auth_state_gc_task)
+            self._auth_state_gc_task = None
 
         async with self._lock:
             sessions = list(self._sessions.items())
             self._sessions.clear()
             self._request_times.clear()
 
-        for _, session in sessions:
-            try:
-                await session.close()
-            except Exception as exc:  # pragma: no cover - defensive
-                logger.warning("Error closing browser session: %s", exc)
+        results = await asyncio.gather(*(session.close() for _, session in sessions), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):  # pragma: no cover - defensive
+                logger.warning("Error closing browser session: %s", result)
+
+        current_loop = asyncio.get_running_loop()
+        browsers = list(self._browsers.items())
+        self._browsers.clear()
+        self._browser_locks.clear()
+        for loop, (playwright, browser) in browsers:
+            closing = self._close_browser(playwright, browser)
+            if loop is current_loop:
+                await closing
+            elif loop.is_closed():
+                closing.close()
+                logger.warning("Shared browser of a closed event loop could not be closed")
+            else:
+                # Playwright objects must be closed on the loop that created them
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(closing, loop))
+
+    @staticmethod
+    async def _close_browser(playwright: Optional[object], browser: Optional[Browser]) -> None:
+        """Close a shared browser and stop its Playwright driver."""
+
+        try:
+            if browser:
+                await browser.close()
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.warning("Error closing shared browser: %s", exc)
+        finally:
+            if playwright:
+                await playwright.stop()
 
-    async def _cleanup_old_auth_states(self, state_dir: Path, max_age_minutes: int = 60) -> None:
+    async def _cleanup_old_auth_states(self, state_dir: Path, max_age_minutes: int = AUTH_STATE_MAX_AGE_MINUTES) -> None:
         """Clean up old authentication state files.
         
         Args:
@@ -656,22 +1234,61 @@ class BrowserSessionManager:
             max_age_minutes: Maximum age in minutes before cleanup (default: 60)
         """
         try:
-            if not state_dir.exists():
-                return
-            
-            current_time = time.time()
-            max_age_seconds = max_age_minutes * 60
-            
-            for state_file in state_dir.glob("auth_state_*.json"):
+            await asyncio.to_thread(self._remove_old_auth_states, state_dir, max_age_minutes * 60)
+        except Exception as e:
+            logger.warning("Failed to cleanup old auth states: %s", e)
+
+    @staticmethod
+    def _remove_old_auth_states(state_dir: Path, max_age_seconds: float) -> None:
+        """Delete auth_state_*.json files older than max_age_seconds (blocking; run in a thread)."""
+
+        current_time = time.time()
+        try:
+            entries = os.scandir(state_dir)
+        except FileNotFoundError:
+            return
+        with entries:
+            for entry in entries:
+                if not (entry.name.startswith("auth_state_") and entry.name.endswith(".json")):
+                    continue
                 try:
-                    file_age = current_time - state_file.stat().st_mtime
+                    file_age = current_time - entry.stat().st_mtime
                     if file_age > max_age_seconds:
-                        logger.info(f"Cleaning up old auth state file: {state_file} (age: {file_age/60:.1f} minutes)")
-                        state_file.unlink()
-                except Exception as e:
-                    logger.warning(f"Failed to cleanup auth state file {state_file}: {e}")
-        except Exception as e:
-            logger.warning(f"Failed to cleanup old auth states: {e}")
+                        logger.info("Cleaning up old auth state file: %s (age: %.1f minutes)", entry.path, file_age / 60)
+                        os.unlink(entry.path)
+                except OSError as e:
+                    logger.warning("Failed to cleanup auth state file %s: %s", entry.path, e)
+
+    @staticmethod
+    def _auth_state_key(user_id: str, auth_token: str) -> Tuple[str, str]:
+        return user_id, hashlib.sha256(auth_token.encode("utf-8")).hexdigest()[:16]
+
+    def _cached_auth_state(self, user_id: str, auth_token: str) -> Optional[str]:
+        """Return the remembered auth state file for this token if it is still usable."""
+
+        key = self._auth_state_key(user_id, auth_token)
+        cached = self._auth_state_paths.get(key)
+        if cached is None:
+            return None
+        path, expires_at = cached
+        if time.time() < expires_at - AUTH_STATE_EXPIRY_MARGIN_SECONDS and os.path.exists(path):
+            self._auth_state_paths.move_to_end(key)
+            return path
+        del self._auth_state_paths[key]
+        return None
+
+    def _remember_auth_state(
+        self, user_id: str, auth_token: str, path: str, expires_at: Optional[float]
+    ) -> None:
+        """Remember an auth state file until the token expires (or for the reuse window)."""
+
+        if expires_at is None:
+            expires_at = time.time() + AUTH_STATE_REUSE_SECONDS
+        key = self._auth_state_key(user_id, auth_token)
+        self._auth_state_paths[key] = (path, expires_at)
+        self._auth_state_paths.move_to_end(key)
+        while len(self._auth_state_paths) > AUTH_STATE_PATH_CACHE_SIZE:
+            self._auth_state_paths.popitem(last=False)
 
     async def _get_or_create_auth_state(
         self,
@@ -694,196 +1311,181 @@ class BrowserSessionManager:
         Returns:
             Path to storage state file, or None if creation failed
         """
+        cached_path = self._cached_auth_state(user_id, auth_token)
+        if cached_path is not None:
+            logger.info("Using cached auth state file: %s", cached_path)
+            return cached_path
+
+        # An expired token would only fail inside setSession after the whole browser flow
+        try:
+            token_expires_at: Optional[float] = float(_decode_jwt_claims(auth_token)["exp"])
+        except Exception:
+            token_expires_at = None  # Not a decodable JWT; let Supabase judge it
+        if token_expires_at is not None and token_expires_at <= time.time() + AUTH_STATE_EXPIRY_MARGIN_SECONDS:
+            logger.warning("[AUTH STATE] Access token for user %s is expired or about to expire, skipping auth state", user_id)
+            return None
+
         try:
             # Create temp directory for auth state files
-            state_dir = Path(tempfile.gettempdir()) / "browser_auth_states"
+            state_dir = AUTH_STATE_DIR
             state_dir.mkdir(exist_ok=True, mode=0o700)  # Secure directory
             
-            # Cleanup old state files periodically (every 10th call)
-            import random
-            if random.randint(1, 10) == 1:
-                await self._cleanup_old_auth_states(state_dir, max_age_minutes=60)
-            
             state_file = state_dir / f"auth_state_{user_id}.json"
             
             # Check if state file exists and is recent (less than 50 minutes old)
             # Supabase tokens typically expire after 1 hour
             if state_file.exists():
                 file_age = time.time() - state_file.stat().st_mtime
-                if file_age < 50 * 60:  # 50 minutes
-                    logger.info(f"Using existing auth state file: {state_file} (age: {file_age/60:.1f} minutes)")
+                if file_age < AUTH_STATE_REUSE_SECONDS:
+                    logger.info("Using existing auth state file: %s (age: %.1f minutes)", state_file, file_age / 60)
                     return str(state_file)
                 else:
-                    logger.info(f"Auth state file expired, recreating: {state_file} (age: {file_age/60:.1f} minutes)")
+                    logger.info("Auth state file expired, recreating: %s (age: %.1f minutes)", state_file, file_age / 60)
                     state_file.unlink()
             
-            logger.info(f"Creating new auth state for user {user_id}")
-            
-            # Create browser context and authenticate
-            async with async_playwright() as p:
-                browser = None
+            logger.info("Creating new auth state for user %s", user_id)
+
+            supabase = _supabase_config()
+            supabase_url, supabase_anon_key = supabase.url, supabase.anon_key
+
+            if AUTH_STATE_FAST_PATH:
                 try:
-                    logger.info(f"[AUTH STATE] Launching browser for user {user_id}")
-                    browser = await p.chromium.launch(headless=True)
-                    context = await browser.new_context(
-                        viewport={"width": 1920, "height": 1080}
+                    if not supabase_url:
+                        raise ValueError("SUPABASE_URL is not set")
+                    user = None
+                    if supabase_anon_key:
+                        # Confirms the token is live and yields the same user object setSession would store
+                        user = await asyncio.to_thread(
+                            _fetch_supabase_user, supabase_url, supabase_anon_key, auth_token
+                        )
+                    else:
+                        logger.warning(
+                            "[AUTH STATE] SUPABASE_ANON_KEY is not set; writing auth state for user %s "
+                            "from unverified token claims",
+                            user_id,
+                        )
+                    state = _synthesize_storage_state(frontend_url, supabase_url, auth_token, user_id, user)
+                    self._save_storage_state(state_file, state)
+                    logger.info("[AUTH STATE] ✅ Auth state written without a browser: %s", state_file)
+                    self._remember_auth_state(user_id, auth_token, str(state_file), token_expires_at)
+                    return str(state_file)
+                except Exception as e:
+                    logger.warning("[AUTH STATE] Fast path failed, falling back to browser flow: %s", e)
+            
+            # The browser flow needs both values; check before launching anything
+            if not supabase_url or not supabase_anon_key:
+                logger.warning("[AUTH STATE] SUPABASE_URL or SUPABASE_ANON_KEY not found, cannot create auth state")
+                return None
+            
+            logger.info("[AUTH STATE] Supabase config found: URL=%s..., Key=********************", supabase_url[:30])
+            
+            # Create browser context and authenticate, fetching the supabase-js bundle
+            # (first call only) while the browser launches and the context opens
+            context = None
+            bundle_task = asyncio.create_task(_get_supabase_js_bundle())
+            try:
+                # One deadline for the whole browser flow: navigation, setSession and saving
+                async with asyncio.timeout(AUTH_STATE_TIMEOUT_SECONDS):
+                    logger.info("[AUTH STATE] Opening browser context for user %s", user_id)
+                    # Never rendered or screenshotted, so keep the framebuffer minimal; bypass the
+                    # frontend's CSP so the CDN import fallback for supabase-js can still run
+                    context = await self.acquire_context(
+                        viewport={"width": 1, "height": 1},
+                        device_scale_factor=1,
+                        bypass_csp=True,
                     )
+                    await context.route("**/*", _block_auth_state_assets)
                     page = await context.new_page()
-                    
-                    # Navigate to frontend and verify accessibility
-                    logger.info(f"[AUTH STATE] Navigating to frontend: {frontend_url}")
+                    supabase_js = await bundle_task
+                    if supabase_js:
+                        await page.add_init_script(script=supabase_js)
+                
+                    # Navigate to frontend and verify accessibility. Only the origin is needed
+                    # for localStorage, so stop once the response commits; the hydration
+                    # probe below gives the frontend's own Supabase client a bounded chance to load
+                    logger.info("[AUTH STATE] Navigating to frontend: %s", frontend_url)
                     try:
-                        response = await asyncio.wait_for(
-                            page.goto(frontend_url, wait_until="domcontentloaded", timeout=30000),
-                            timeout=35.0  # Slightly longer than page.goto timeout
-                        )
+                        response = await page.goto(frontend_url, wait_until="commit", timeout=10000)
                         if response and response.status >= 400:
-                            logger.error(f"[AUTH STATE] Frontend returned error status: {response.status}")
+                            logger.error("[AUTH STATE] Frontend returned error status: %s", response.status)
                             return None
-                        logger.info(f"[AUTH STATE] Frontend loaded successfully (status: {response.status if response else 'N/A'})")
-                    except asyncio.TimeoutError:
-                        logger.error(f"[AUTH STATE] Timeout navigating to frontend after 35 seconds")
-                        return None
+                        logger.info("[AUTH STATE] Frontend loaded successfully (status: %s)", response.status if response else "N/A")
                     except Exception as e:
-                        logger.error(f"[AUTH STATE] Failed to navigate to frontend: {e}")
+                        logger.error("[AUTH STATE] Failed to navigate to frontend: %s", e)
                         return None
-                    
+                
                     # Wait for Next.js to hydrate and Supabase client to be available
-                    logger.info(f"[AUTH STATE] Waiting for Next.js hydration...")
-                    await asyncio.sleep(2.0)
+                    logger.info("[AUTH STATE] Waiting for Next.js hydration...")
+                    try:
+                        await page.wait_for_function(HYDRATION_READY_JS, timeout=AUTH_STATE_READY_TIMEOUT_MS)
+                    except PlaywrightTimeoutError:
+                        logger.info("[AUTH STATE] Hydration probe timed out, continuing")
                 
-                    # Get Supabase configuration from environment
-                    supabase_url = os.getenv("SUPABASE_URL") or os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-                    supabase_anon_key = os.getenv("SUPABASE_ANON_KEY") or os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-                    
-                    if not supabase_url or not supabase_anon_key:
-                        logger.warning("[AUTH STATE] SUPABASE_URL or SUPABASE_ANON_KEY not found, cannot create auth state")
-                        return None
-                    
-                    logger.info(f"[AUTH STATE] Supabase config found: URL={supabase_url[:30]}..., Key={'*' * 20}")
-                    
                     # Use Supabase client's setSession() method via the frontend's Supabase client
                     # This properly initializes Supabase's internal state and triggers React auth hooks
-                    set_session_script = f"""
-                    (async () => {{
-                        try {{
-                            // Wait for Next.js to load and Supabase client to be available
-                            // The frontend should have Supabase client initialized via getSupabaseClient()
-                            let supabase = null;
-                            
-                            // Try to access Supabase client from window (if exposed)
-                            if (window.__SUPABASE_CLIENT__) {{
-                                supabase = window.__SUPABASE_CLIENT__;
-                            }} else {{
-                                // Try to get it from the module system (Next.js)
-                                // We'll create our own client using the same config as frontend
-                                const supabaseUrl = '{supabase_url}';
-                                const supabaseAnonKey = '{supabase_anon_key}';
-                                
-                                // Use dynamic import to load Supabase client
-                                const supabaseModule = await import('https://cdn.jsdelivr.net/npm/@supabase/supabase-js@2/dist/esm/index.js');
-                                supabase = supabaseModule.createClient(supabaseUrl, supabaseAnonKey, {{
-                                    auth: {{
-                                        autoRefreshToken: true,
-                                        persistSession: true,
-                                        detectSessionInUrl: false
-                                    }}
-                                }});
-                            }}
-                            
-                            if (!supabase) {{
-                                return {{ success: false, error: 'Could not access Supabase client' }};
-                            }}
-                            
-                            // Set session using Supabase's setSession method
-                            // This properly initializes the session and triggers auth state changes
-                            const {{ data, error }} = await supabase.auth.setSession({{
-                                access_token: '{auth_token}',
-                                refresh_token: '' // Empty refresh token - access token should work for short-term
-                            }});
-                            
-                            if (error) {{
-                                console.error('[AUTH] Failed to set Supabase session:', error);
-                                return {{ success: false, error: error.message }};
-                            }}
-                            
-                            // Verify session was set correctly
-                            const {{ data: {{ session }}, error: getError }} = await supabase.auth.getSession();
-                            if (getError) {{
-                                console.error('[AUTH] Error getting session after setSession:', getError);
-                                return {{ success: false, error: getError.message }};
-                            }}
-                            
-                            if (session && session.user) {{
-                                console.log('[AUTH] ✅ Supabase session set successfully:', {{
-                                    userId: session.user.id,
-                                    email: session.user.email
-                                }});
-                                return {{ 
-                                    success: true, 
-                                    userId: session.user.id, 
-                                    email: session.user.email,
-                                    hasAccessToken: !!session.access_token
-                                }};
-                            }} else {{
-                                console.error('[AUTH] Session was set but getSession returned null or no user');
-                                return {{ success: false, error: 'Session not found after setSession' }};
-                            }}
-                        }} catch (error) {{
-                            console.error('[AUTH] Error setting Supabase session:', error);
-                            return {{ success: false, error: error.message || String(error) }};
-                        }}
-                    }})()
-                    """
-                    
-                    # Execute the script to set session with timeout
-                    logger.info(f"[AUTH STATE] Executing Supabase setSession script...")
+                
+                    # Execute the script to set session (page.evaluate has no timeout of its own;
+                    # the overall auth state timeout bounds it)
+                    logger.info("[AUTH STATE] Executing Supabase setSession script...")
                     try:
-                        # Wrap page.evaluate() with timeout - it doesn't have a timeout parameter
-                        result = await asyncio.wait_for(
-                            page.evaluate(set_session_script),
-                            timeout=35.0  # 35 second timeout for CDN import + Supabase API calls
+                        result = await page.evaluate(
+                            SET_SESSION_JS,
+                            {
+                                "supabaseUrl": supabase_url,
+                                "supabaseAnonKey": supabase_anon_key,
+                                "accessToken": auth_token,
+                            },
                         )
-                    except asyncio.TimeoutError:
-                        logger.error("[AUTH STATE] page.evaluate() timed out after 35 seconds - CDN or Supabase API may be unreachable")
-                        return None
                     except Exception as e:
-                        logger.error(f"[AUTH STATE] page.evaluate() failed: {e}", exc_info=True)
+                        logger.error("[AUTH STATE] page.evaluate() failed: %s", e, exc_info=True)
                         return None
-                    
+                
                     if not result or not result.get("success"):
                         error_msg = result.get("error", "Unknown error") if result else "No result returned"
-                        logger.error(f"[AUTH STATE] Failed to set Supabase session in browser: {error_msg}")
+                        logger.error("[AUTH STATE] Failed to set Supabase session in browser: %s", error_msg)
                         return None
-                    
-                    logger.info(f"[AUTH STATE] ✅ Supabase session set successfully: userId={result.get('userId')}, email={result.get('email')}")
-                    
+                
+                    logger.info("[AUTH STATE] ✅ Supabase session set successfully: userId=%s, email=%s", result.get("userId"), result.get("email"))
+                
                     # Wait for React components to detect the auth state change
-                    logger.info(f"[AUTH STATE] Waiting for React components to detect auth state...")
-                    await asyncio.sleep(2.0)
-                    
+                    logger.info("[AUTH STATE] Waiting for React components to detect auth state...")
+                    try:
+                        await page.wait_for_function(SESSION_PERSISTED_JS, timeout=AUTH_STATE_READY_TIMEOUT_MS)
+                    except PlaywrightTimeoutError:
+                        logger.info("[AUTH STATE] Persisted session probe timed out, continuing")
+                
                     # Save browser state (includes cookies + localStorage + sessionStorage)
-                    logger.info(f"[AUTH STATE] Saving browser storage state to: {state_file}")
+                    logger.info("[AUTH STATE] Saving browser storage state to: %s", state_file)
                     try:
-                        await context.storage_state(path=str(state_file))
-                        logger.info(f"[AUTH STATE] ✅ Auth state saved successfully: {state_file}")
+                        state = await context.storage_state()
+                        self._save_storage_state(state_file, state)
+                        logger.info("[AUTH STATE] ✅ Auth state saved successfully: %s", state_file)
                     except Exception as e:
-                        logger.error(f"[AUTH STATE] Failed to save storage state: {e}")
+                        logger.error("[AUTH STATE] Failed to save storage state: %s", e)
                         return None
-                    
-                except Exception as e:
-                    logger.error(f"[AUTH STATE] Error during auth state creation: {e}", exc_info=True)
-                    return None
-                finally:
-                    if browser:
-                        try:
-                            await browser.close()
-                            logger.info(f"[AUTH STATE] Browser closed successfully")
-                        except Exception as e:
-                            logger.warning(f"[AUTH STATE] Error closing browser: {e}")
                 
+            except TimeoutError:
+                logger.error(
+                    "[AUTH STATE] Auth state creation timed out after %s seconds "
+                    "- frontend, CDN or Supabase API may be unreachable",
+                    AUTH_STATE_TIMEOUT_SECONDS,
+                )
+                return None
+            except Exception as e:
+                logger.error("[AUTH STATE] Error during auth state creation: %s", e, exc_info=True)
+                return None
+            finally:
+                bundle_task.cancel()
+                if context:
+                    try:
+                        await context.close()
+                        logger.info("[AUTH STATE] Browser context closed successfully")
+                    except Exception as e:
+                        logger.warning("[AUTH STATE] Error closing browser context: %s", e)
+            
+            self._remember_auth_state(user_id, auth_token, str(state_file), token_expires_at)
             return str(state_file)
             
         except Exception as e:
-            logger.error(f"Failed to create auth state for user {user_id}: {e}", exc_info=True)
+            logger.error("Failed to create auth state for user %s: %s", user_id, e, exc_info=True)
             return None
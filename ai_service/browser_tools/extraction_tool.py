@@ -2,7 +2,6 @@
 
 from __future__ import annotations
 
-import asyncio
 import logging
 from typing import Any, List, Optional, Union
 
@@ -10,7 +9,7 @@ import nest_asyncio
 from compat.crewai_tools import BaseTool
 from pydantic import BaseModel, Field
 
-from .browser_sessions import BrowserSessionManager
+from .browser_sessions import BrowserSessionManager, run_browser_task
 
 # Apply nest_asyncio to allow nested event loops (fixes CrewAI threading conflicts)
 nest_asyncio.apply()
@@ -51,32 +50,16 @@ class BrowserExtractionTool(BaseTool):
         tab_id: Optional[str] = None,
         output_format: str = "text",
     ) -> Any:
-        try:
-            return asyncio.run(
-                self._arun(
-                    action=action,
-                    selector=selector,
-                    session_id=session_id,
-                    user_id=user_id,
-                    tab_id=tab_id,
-                    output_format=output_format,
-                )
+        return run_browser_task(
+            self._arun(
+                action=action,
+                selector=selector,
+                session_id=session_id,
+                user_id=user_id,
+                tab_id=tab_id,
+                output_format=output_format,
             )
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            try:
-                return loop.run_until_complete(
-                    self._arun(
-                        action=action,
-                        selector=selector,
-                        session_id=session_id,
-                        user_id=user_id,
-                        tab_id=tab_id,
-                        output_format=output_format,
-                    )
-                )
-            finally:
-                loop.close()
+        )
 
     async def _arun(
         self,
@@ -3,7 +3,6 @@
 from __future__ import annotations
 
 import asyncio
-import base64
 import json
 import logging
 from pathlib import Path
@@ -13,7 +12,8 @@ import nest_asyncio
 from compat.crewai_tools import BaseTool
 from pydantic import BaseModel, Field
 
-from .browser_sessions import BrowserSessionManager
+from .browser_sessions import BrowserSessionManager, run_browser_task
+from .browser_config import DEFAULT_UPLOAD_DIR
 
 # Apply nest_asyncio to allow nested event loops (fixes CrewAI threading conflicts)
 nest_asyncio.apply()
@@ -52,34 +52,17 @@ class BrowserInteractionTool(BaseTool):
         user_id: Optional[str] = None,
         tab_id: Optional[str] = None,
     ) -> str:
-        try:
-            return asyncio.run(
-                self._arun(
-                    action=action,
-                    selector=selector,
-                    value=value,
-                    session_id=session_id,
-                    file_path=file_path,
-                    user_id=user_id,
-                    tab_id=tab_id,
-                )
+        return run_browser_task(
+            self._arun(
+                action=action,
+                selector=selector,
+                value=value,
+                session_id=session_id,
+                file_path=file_path,
+                user_id=user_id,
+                tab_id=tab_id,
             )
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            try:
-                return loop.run_until_complete(
-                    self._arun(
-                        action=action,
-                        selector=selector,
-                        value=value,
-                        session_id=session_id,
-                        file_path=file_path,
-                        user_id=user_id,
-                        tab_id=tab_id,
-                    )
-                )
-            finally:
-                loop.close()
+        )
 
     async def _arun(
         self,
@@ -179,19 +162,9 @@ class BrowserInteractionTool(BaseTool):
 
                 try:
                     resolved_path = Path(file_path).resolve()
-                    allowed_dirs = session.security.allowed_upload_dirs or ["/tmp/uploads"]
-
-                    path_allowed = False
-                    for allowed_dir in allowed_dirs:
-                        allowed_path = Path(allowed_dir).resolve()
-                        try:
-                            resolved_path.relative_to(allowed_path)
-                            path_allowed = True
-                            break
-                        except ValueError:
-                            continue
+                    allowed_dirs = session.security.allowed_upload_dirs or [DEFAULT_UPLOAD_DIR]
 
-                    if not path_allowed:
+                    if not session.security.is_upload_path_allowed(resolved_path):
                         return (
                             f"Error: File path '{file_path}' is outside allowed directories: {allowed_dirs}"
                         )
@@ -474,10 +447,9 @@ class BrowserInteractionTool(BaseTool):
 
         try:
             buffer = await page.screenshot(full_page=True)
-            encoded = base64.b64encode(buffer).decode("utf-8")
             details = {"action": action, "selector": selector}
             if metadata:
                 details.update(metadata)
-            await session.record_screenshot(encoded, details)
+            await session.record_screenshot(buffer, details)
         except Exception as exc:  # pragma: no cover - defensive
             logger.debug("Failed to record post-action screenshot: %s", exc)
@@ -3,7 +3,6 @@
 from __future__ import annotations
 
 import asyncio
-import base64
 import logging
 import time
 from typing import Any, Optional
@@ -12,7 +11,7 @@ import nest_asyncio
 from compat.crewai_tools import BaseTool
 from pydantic import BaseModel, Field
 
-from .browser_sessions import BrowserSessionManager
+from .browser_sessions import BrowserSessionManager, run_browser_task
 
 # Apply nest_asyncio to allow nested event loops (fixes CrewAI threading conflicts)
 nest_asyncio.apply()
@@ -53,34 +52,17 @@ class BrowserNavigationTool(BaseTool):
         tab_id: Optional[str] = None,
         selector: Optional[str] = None,
     ) -> str:
-        try:
-            return asyncio.run(
-                self._arun(
-                    action=action,
-                    url=url,
-                    wait_for=wait_for,
-                    session_id=session_id,
-                    user_id=user_id,
-                    tab_id=tab_id,
-                    selector=selector,
-                )
+        return run_browser_task(
+            self._arun(
+                action=action,
+                url=url,
+                wait_for=wait_for,
+                session_id=session_id,
+                user_id=user_id,
+                tab_id=tab_id,
+                selector=selector,
             )
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            try:
-                return loop.run_until_complete(
-                    self._arun(
-                        action=action,
-                        url=url,
-                        wait_for=wait_for,
-                        session_id=session_id,
-                        user_id=user_id,
-                        tab_id=tab_id,
-                        selector=selector,
-                    )
-                )
-            finally:
-                loop.close()
+        )
 
     async def _arun(
         self,
@@ -199,13 +181,13 @@ class BrowserNavigationTool(BaseTool):
                     logger.info("[%s] Current page URL before navigation: %s", session_id, page.url)
                     
                     try:
-                        navigation_start = time.time()
+                        navigation_start = time.monotonic()
                         logger.info("[%s] Calling page.goto()...", session_id)
                         await asyncio.wait_for(
                             page.goto(url, timeout=nav_timeout, wait_until="load"),
                             timeout=nav_timeout / 1000.0 + 5  # Add 5 second buffer for Playwright
                         )
-                        navigation_duration = time.time() - navigation_start
+                        navigation_duration = time.monotonic() - navigation_start
                         logger.info("[%s] ✅ Page navigation completed in %.2fs", session_id, navigation_duration)
                         logger.info("[%s] Final page URL: %s", session_id, page.url)
                         page_title = await page.title()
@@ -281,12 +263,12 @@ class BrowserNavigationTool(BaseTool):
                                 logger.debug("[%s] Could not check page content: %s", session_id, content_check_error)
                             
                             try:
-                                selector_wait_start = time.time()
+                                selector_wait_start = time.monotonic()
                                 await asyncio.wait_for(
                                     page.wait_for_selector(wait_for, timeout=timeout, state="attached"),
                                     timeout=timeout / 1000.0 + 2
                                 )
-                                selector_wait_duration = time.time() - selector_wait_start
+                                selector_wait_duration = time.monotonic() - selector_wait_start
                                 logger.info("[%s] ✅ Selector '%s' found (attached) in %.2fs", session_id, wait_for, selector_wait_duration)
                                 
                                 # Check if element is actually visible (not just attached)
@@ -442,11 +424,10 @@ class BrowserNavigationTool(BaseTool):
 
         try:
             buffer = await page.screenshot(full_page=True)
-            encoded = base64.b64encode(buffer).decode("utf-8")
             metadata = {"action": action}
             if target:
                 metadata["target"] = target
-            await session.record_screenshot(encoded, metadata)
+            await session.record_screenshot(buffer, metadata)
         except Exception as exc:  # pragma: no cover - defensive
             logger.debug("Failed to capture navigation state: %s", exc)
 
@@ -2,7 +2,6 @@
 
 from __future__ import annotations
 
-import asyncio
 import json
 import logging
 from typing import Any, Optional
@@ -11,7 +10,7 @@ import nest_asyncio
 from compat.crewai_tools import BaseTool
 from pydantic import BaseModel, Field
 
-from .browser_sessions import BrowserSessionManager
+from .browser_sessions import BrowserSessionManager, run_browser_task
 
 # Apply nest_asyncio to allow nested event loops (fixes CrewAI threading conflicts)
 nest_asyncio.apply()
@@ -50,30 +49,15 @@ class BrowserPerformanceTool(BaseTool):
         tab_id: Optional[str] = None,
         limit: int = 50,
     ) -> str:
-        try:
-            return asyncio.run(
-                self._arun(
-                    action=action,
-                    session_id=session_id,
-                    user_id=user_id,
-                    tab_id=tab_id,
-                    limit=limit,
-                )
+        return run_browser_task(
+            self._arun(
+                action=action,
+                session_id=session_id,
+                user_id=user_id,
+                tab_id=tab_id,
+                limit=limit,
             )
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            try:
-                return loop.run_until_complete(
-                    self._arun(
-                        action=action,
-                        session_id=session_id,
-                        user_id=user_id,
-                        tab_id=tab_id,
-                        limit=limit,
-                    )
-                )
-            finally:
-                loop.close()
+        )
 
     async def _arun(
         self,
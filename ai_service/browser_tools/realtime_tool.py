@@ -5,14 +5,13 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
-import time
 from typing import Any, Optional
 
 import nest_asyncio
 from compat.crewai_tools import BaseTool
 from pydantic import BaseModel, Field
 
-from .browser_sessions import BrowserSessionManager
+from .browser_sessions import BrowserSessionManager, run_browser_task
 
 # Apply nest_asyncio to allow nested event loops (fixes CrewAI threading conflicts)
 nest_asyncio.apply()
@@ -58,36 +57,18 @@ class BrowserRealtimeTool(BaseTool):
         tab_id: Optional[str] = None,
         limit: int = 20,
     ) -> str:
-        try:
-            return asyncio.run(
-                self._arun(
-                    action=action,
-                    event_type=event_type,
-                    pattern=pattern,
-                    timeout=timeout,
-                    session_id=session_id,
-                    user_id=user_id,
-                    tab_id=tab_id,
-                    limit=limit,
-                )
+        return run_browser_task(
+            self._arun(
+                action=action,
+                event_type=event_type,
+                pattern=pattern,
+                timeout=timeout,
+                session_id=session_id,
+                user_id=user_id,
+                tab_id=tab_id,
+                limit=limit,
             )
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            try:
-                return loop.run_until_complete(
-                    self._arun(
-                        action=action,
-                        event_type=event_type,
-                        pattern=pattern,
-                        timeout=timeout,
-                        session_id=session_id,
-                        user_id=user_id,
-                        tab_id=tab_id,
-                        limit=limit,
-                    )
-                )
-            finally:
-                loop.close()
+        )
 
     async def _arun(
         self,
@@ -172,11 +153,4 @@ class BrowserRealtimeTool(BaseTool):
     async def _wait_for_types(self, session, types, pattern, timeout):
         """Wait for one of the allowed event types."""
 
-        deadline = time.time() + timeout
-        while True:
-            remaining = deadline - time.time()
-            if remaining <= 0:
-                raise asyncio.TimeoutError
-            event = await session.wait_for_event(None, pattern, remaining)
-            if event.get("type") in types:
-                return event
+        return await session.wait_for_event(types, pattern, timeout)
@@ -11,7 +11,7 @@ import nest_asyncio
 from compat.crewai_tools import BaseTool
 from pydantic import BaseModel, Field
 
-from .browser_sessions import BrowserSessionManager
+from .browser_sessions import BrowserSessionManager, run_browser_task
 
 # Apply nest_asyncio to allow nested event loops (fixes CrewAI threading conflicts)
 nest_asyncio.apply()
@@ -46,30 +46,15 @@ class BrowserScreenshotTool(BaseTool):
         user_id: Optional[str] = None,
         tab_id: Optional[str] = None,
     ) -> str:
-        try:
-            return asyncio.run(
-                self._arun(
-                    selector=selector,
-                    session_id=session_id,
-                    full_page=full_page,
-                    user_id=user_id,
-                    tab_id=tab_id,
-                )
+        return run_browser_task(
+            self._arun(
+                selector=selector,
+                session_id=session_id,
+                full_page=full_page,
+                user_id=user_id,
+                tab_id=tab_id,
             )
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            try:
-                return loop.run_until_complete(
-                    self._arun(
-                        selector=selector,
-                        session_id=session_id,
-                        full_page=full_page,
-                        user_id=user_id,
-                        tab_id=tab_id,
-                    )
-                )
-            finally:
-                loop.close()
+        )
 
     async def _arun(
         self,
@@ -117,7 +102,7 @@ class BrowserScreenshotTool(BaseTool):
                 # Try to record screenshot, but don't fail if it exceeds size limit
                 try:
                     await session.record_screenshot(
-                        encoded,
+                        buffer,
                         {"target": target, "full_page": full_page, "selector": selector},
                     )
                     if session.security.log_actions:
@@ -11,7 +11,7 @@ import nest_asyncio
 from compat.crewai_tools import BaseTool
 from pydantic import BaseModel, Field
 
-from .browser_sessions import BrowserSessionManager
+from .browser_sessions import BrowserSessionManager, run_browser_task
 
 # Apply nest_asyncio to allow nested event loops (fixes CrewAI threading conflicts)
 nest_asyncio.apply()
@@ -64,34 +64,17 @@ class BrowserVisionAnalysisTool(BaseTool):
         selector: Optional[str] = None,
         full_page: bool = True,
     ) -> str:
-        try:
-            return asyncio.run(
-                self._arun(
-                    question=question,
-                    screenshot_base64=screenshot_base64,
-                    session_id=session_id,
-                    user_id=user_id,
-                    tab_id=tab_id,
-                    selector=selector,
-                    full_page=full_page,
-                )
+        return run_browser_task(
+            self._arun(
+                question=question,
+                screenshot_base64=screenshot_base64,
+                session_id=session_id,
+                user_id=user_id,
+                tab_id=tab_id,
+                selector=selector,
+                full_page=full_page,
             )
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            try:
-                return loop.run_until_complete(
-                    self._arun(
-                        question=question,
-                        screenshot_base64=screenshot_base64,
-                        session_id=session_id,
-                        user_id=user_id,
-                        tab_id=tab_id,
-                        selector=selector,
-                        full_page=full_page,
-                    )
-                )
-            finally:
-                loop.close()
+        )
 
     async def _arun(
         self,
@@ -144,7 +127,7 @@ class BrowserVisionAnalysisTool(BaseTool):
                     # Try to record screenshot, continue even if size limit exceeded
                     try:
                         await session.record_screenshot(
-                            image_data,
+                            buffer,
                             {
                                 "action": "vision_capture",
                                 "selector": selector,
@@ -1,15 +1,89 @@
 import logging
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import fitz  # PyMuPDF for PDF processing
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import openpyxl  # for Excel processing
 
 logger = logging.getLogger(__name__)
 
+# Text extraction (PDF parsing, workbook walking) is CPU-bound and holds the GIL,
+# so multi-document requests fan it out to a process pool shared across requests
+DOCUMENT_WORKERS = int(os.getenv("DOCUMENT_WORKERS", str(os.cpu_count() or 1)))
+
+_extraction_pool = None
+
+def get_extraction_pool() -> Optional[ProcessPoolExecutor]:
+    """Get the shared text-extraction process pool, or None when disabled"""
+    global _extraction_pool
+    if _extraction_pool is None and DOCUMENT_WORKERS > 1:
+        # spawn keeps children independent of thread state in the web worker
+        _extraction_pool = ProcessPoolExecutor(
+            max_workers=DOCUMENT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _extraction_pool
+
+def extract_text_from_pdf(file_path: str) -> str:
+    """Extract text content from a PDF file"""
+    try:
+        doc = fitz.open(file_path)
+        text = ""
+        for page_num in range(len(doc)):
+            page = doc.load_page(page_num)
+            text += page.get_text()
+        return text
+    except Exception as e:
+        logger.error("Error extracting text from PDF: %s", e)
+        return ""
+
+def extract_text_from_excel(file_path: str) -> str:
+    """Extract text content from an Excel file"""
+    try:
+        wb = openpyxl.load_workbook(file_path, data_only=True)
+        text = ""
+        
+        for sheet in wb.worksheets:
+            text += f"\n--- SHEET: {sheet.title} ---\n"
+            
+            for row in sheet.iter_rows():
+                row_text = ""
+                for cell in row:
+                    if cell.value is not None:
+                        row_text += f"{cell.value}\t"
+                if row_text:
+                    text += row_text.strip() + "\n"
+        
+        return text
+    except Exception as e:
+        logger.error("Error extracting text from Excel: %s", e)
+        return ""
+
+def extract_document_text(file_path: str) -> Optional[str]:
+    """Extract text from a supported document, or None if the file type is unsupported"""
+    file_ext = os.path.splitext(file_path)[1].lower()
+    if file_ext == '.pdf':
+        return extract_text_from_pdf(file_path)
+    if file_ext in ['.xlsx', '.xls']:
+        return extract_text_from_excel(file_path)
+    return None
+
 class DocumentProcessor:
     def __init__(self, openai_service):
         self.openai_service = openai_service
     
+    def _extract_texts(self, file_paths: List[str]) -> List[Optional[str]]:
+        """Extract text from each file, in parallel across processes when there is more than one"""
+        pool = get_extraction_pool() if len(file_paths) > 1 else None
+        if pool is not None:
+            try:
+                return list(pool.map(extract_document_text, file_paths))
+            except BrokenProcessPool as e:
+                logger.warning("Extraction process pool unavailable, extracting serially: %s", e)
+        return [extract_document_text(file_path) for file_path in file_paths]
+    
     def analyze_documents(self, file_paths: List[str], question: str = None) -> Dict[str, Any]:
         """
         Analyze multiple documents and generate insights based on their content
@@ -24,14 +98,9 @@ class DocumentProcessor:
         try:
             combined_text = ""
             
-            for file_path in file_paths:
-                file_ext = os.path.splitext(file_path)[1].lower()
-                if file_ext == '.pdf':
-                    text = self._extract_text_from_pdf(file_path)
-                elif file_ext in ['.xlsx', '.xls']:
-                    text = self._extract_text_from_excel(file_path)
-                else:
-                    logger.warning(f"Unsupported file type: {file_ext}")
+            for file_path, text in zip(file_paths, self._extract_texts(file_paths)):
+                if text is None:
+                    logger.warning("Unsupported file type: %s", os.path.splitext(file_path)[1].lower())
                     continue
                 
                 # Add document content to combined text with separator
@@ -58,7 +127,7 @@ class DocumentProcessor:
             }
             
         except Exception as e:
-            logger.error(f"Error in analyze_documents: {str(e)}")
+            logger.error("Error in analyze_documents: %s", e)
             return {"error": str(e)}
     
     def extract_data(self, file_path: str, extraction_type: str = 'auto') -> Dict[str, Any]:
@@ -100,43 +169,16 @@ class DocumentProcessor:
             }
             
         except Exception as e:
-            logger.error(f"Error in extract_data: {str(e)}")
+            logger.error("Error in extract_data: %s", e)
             return {"error": str(e)}
     
     def _extract_text_from_pdf(self, file_path: str) -> str:
         """Extract text content from a PDF file"""
-        try:
-            doc = fitz.open(file_path)
-            text = ""
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                text += page.get_text()
-            return text
-        except Exception as e:
-            logger.error(f"Error extracting text from PDF: {str(e)}")
-            return ""
+        return extract_text_from_pdf(file_path)
     
     def _extract_text_from_excel(self, file_path: str) -> str:
         """Extract text content from an Excel file"""
-        try:
-            wb = openpyxl.load_workbook(file_path, data_only=True)
-            text = ""
-            
-            for sheet in wb.worksheets:
-                text += f"\n--- SHEET: {sheet.title} ---\n"
-                
-                for row in sheet.iter_rows():
-                    row_text = ""
-                    for cell in row:
-                        if cell.value is not None:
-                            row_text += f"{cell.value}\t"
-                    if row_text:
-                        text += row_text.strip() + "\n"
-            
-            return text
-        except Exception as e:
-            logger.error(f"Error extracting text from Excel: {str(e)}")
-            return ""
+        return extract_text_from_excel(file_path)
     
     def _extract_qc_data_from_excel(self, file_path: str) -> Dict[str, Any]:
         """
@@ -230,7 +272,7 @@ class DocumentProcessor:
             }
             
         except Exception as e:
-            logger.error(f"Error extracting QC data from Excel: {str(e)}")
+            logger.error("Error extracting QC data from Excel: %s", e)
             return {"error": str(e)}
     
     def _get_extraction_prompt(self, extraction_type: str) -> str:
@@ -0,0 +1,34 @@
+"""
+Gunicorn configuration for the AI service.
+
+Handlers stay synchronous and run on gthread worker threads. Coroutines are
+handed to the persistent background event loop (integration_layer.run_async),
+so a worker thread only blocks while waiting for its own request.
+
+To serve the same app from uvicorn, use its WSGI interface, which also runs
+each request on a pool thread:
+
+    uvicorn --interface wsgi wsgi:app --host 0.0.0.0 --port 5001
+"""
+
+import multiprocessing
+import os
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5001')}"
+
+worker_class = "gthread"
+workers = int(os.getenv("GUNICORN_WORKERS", max(2, multiprocessing.cpu_count())))
+# Concurrent requests per worker; most of their time is spent waiting on model calls
+threads = int(os.getenv("GUNICORN_THREADS", "16"))
+
+# Each worker starts its own background event loop after the fork
+preload_app = False
+
+# Model calls can legitimately take minutes (vision, multi-agent workflows)
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+accesslog = "-"
+errorlog = "-"
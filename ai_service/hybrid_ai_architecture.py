@@ -16,7 +16,7 @@ from typing import Any, Dict, List, Optional, Tuple, Literal
 
 import redis
 import requests
-from crewai import Agent, Crew, Process, Task
+from crewai import Agent, Crew, LLM, Process, Task
 from compat.crewai_tools import BaseTool
 from langchain_openai import ChatOpenAI
 from pydantic import BaseModel, Field, PrivateAttr, ValidationError
@@ -176,6 +176,8 @@ class CrewAgentExecutor:
         self.process = process
         self.tools = tools or []
         self.requires_browser_tools = requires_browser_tools
+        # Tool invocations (successful or failed) made by the last execute()
+        self.tool_calls = 0
 
     def _detect_fake_answer(self, response: str) -> bool:
         """Detect if agent is describing actions instead of executing them"""
@@ -233,13 +235,25 @@ You MUST use the available browser tools to complete this task."""
             share_crew=True,
         )
 
-        result = await asyncio.to_thread(
-            crew.kickoff,
-            {"user_context": context or {}, "query": query},
-        )
+        try:
+            result = await asyncio.to_thread(
+                crew.kickoff,
+                {"user_context": context or {}, "query": query},
+            )
+        finally:
+            self.tool_calls = len(getattr(self.agent, "tools_results", None) or []) + task.tools_errors
 
         response = result["output"] if isinstance(result, dict) and "output" in result else str(result)
         
+        token_usage = getattr(result, "token_usage", None)
+        if token_usage is not None:
+            logger.info(
+                "[CrewAgentExecutor] Token usage: prompt=%s cached_prompt=%s completion=%s",
+                getattr(token_usage, "prompt_tokens", None),
+                getattr(token_usage, "cached_prompt_tokens", None),
+                getattr(token_usage, "completion_tokens", None),
+            )
+        
         # Validate response for browser tool tasks
         if self.requires_browser_tools:
             if self._detect_fake_answer(response):
@@ -281,6 +295,13 @@ class CostOptimizer:
                 max_tokens=128000,
                 capabilities=["text", "vision", "reasoning", "analysis"]
             ),
+            "gpt-4o-mini": ModelConfig(
+                name="gpt-4o-mini",
+                provider=ModelProvider.OPENAI,
+                cost_per_1k_tokens=0.0006,
+                max_tokens=128000,
+                capabilities=["text", "vision", "analysis"]
+            ),
             "claude-3-sonnet": ModelConfig(
                 name="claude-3-sonnet",
                 provider=ModelProvider.ANTHROPIC,
@@ -289,6 +310,12 @@ class CostOptimizer:
                 capabilities=["text", "reasoning", "analysis"]
             )
         }
+        # Cheap-first cascade for plain chat; off unless MODEL_CASCADE_ENABLED=true
+        self.cascade = ("gpt-4o-mini", "gpt-4o")
+        self.cascade_enabled = os.getenv("MODEL_CASCADE_ENABLED", "false").lower() == "true"
+        self.cascade_tiers = frozenset(
+            tier.strip() for tier in os.getenv("MODEL_CASCADE_TIERS", "free_user,paid_user").split(",") if tier.strip()
+        )
     
     def analyze_task_complexity(self, query: str, context: Dict = None) -> TaskComplexity:
         """Analyze task complexity based on query and context"""
@@ -328,18 +355,59 @@ class CostOptimizer:
         # Default to moderate
         return TaskComplexity.MODERATE
     
-    def select_optimal_model(self, complexity: TaskComplexity, user_tier: str, requires_browser_tools: bool = False) -> str:
+    def select_optimal_model(self, complexity: TaskComplexity, user_tier: str, requires_browser_tools: bool = False,
+                             preferred_model: Optional[str] = None) -> str:
         """Select optimal model based on complexity and user tier
         
         Args:
             complexity: Task complexity level
             user_tier: User subscription tier
             requires_browser_tools: Whether browser tools are required (forces GPT-4o)
+            preferred_model: Model the conversation is currently on, if its sticky hint is still
+                live; the cascade does not route below it so the provider's prompt cache stays warm
         """
-        # Always use GPT-4o for all tasks
+        # Browser automation and harder tasks always use GPT-4o; simple chat may start lower in the cascade
+        if (
+            self.cascade_enabled
+            and not requires_browser_tools
+            and user_tier in self.cascade_tiers
+            and complexity in (TaskComplexity.SIMPLE, TaskComplexity.MODERATE)
+        ):
+            model = self.cascade[0]
+            if preferred_model in self.cascade and self.cascade.index(preferred_model) > self.cascade.index(model):
+                model = preferred_model
+            logger.info(f"[CostOptimizer] Selecting {model} (cascade, complexity={complexity.value}, user_tier={user_tier}, sticky={preferred_model})")
+            return model
+        
         logger.info(f"[CostOptimizer] Selecting GPT-4o (browser_tools={requires_browser_tools}, complexity={complexity.value}, user_tier={user_tier})")
         return "gpt-4o"
     
+    def escalation_model(self, model: str) -> Optional[str]:
+        """Next model up the cascade, or None when model is already the strongest"""
+        if model in self.cascade:
+            index = self.cascade.index(model)
+            if index + 1 < len(self.cascade):
+                return self.cascade[index + 1]
+        return None
+    
+    # Only checked at the start of a reply; words like "unclear" are common inside valid answers
+    _LOW_CONFIDENCE_OPENINGS = (
+        "i'm not sure", "i am not sure", "i don't know", "i do not know",
+        "i cannot determine", "i can't determine", "i'm unable", "i am unable",
+        "i cannot answer", "i can't answer", "there is not enough information",
+        "i don't have enough information", "i do not have enough information",
+        "sorry, i", "unfortunately, i",
+    )
+    
+    def needs_escalation(self, response: str) -> bool:
+        """Cheap verifier for cascade answers: empty, error or replies that open with a hedge escalate"""
+        if not response or len(response.strip()) < 20:
+            return True
+        response_lower = response.lstrip().lower()
+        if response_lower.startswith("error"):
+            return True
+        return response_lower.startswith(self._LOW_CONFIDENCE_OPENINGS)
+    
     async def track_usage(self, user_id: str, model: str, tokens: int, cost: float):
         """Track usage for cost optimization"""
         # Track via telemetry service
@@ -1014,11 +1082,7 @@ class DellSystemAIService:
     def __init__(self, redis_client: redis.Redis):
         self.redis = redis_client
         self.cost_optimizer = CostOptimizer(redis_client)
-        allowed_domains_env = os.getenv("BROWSER_ALLOWED_DOMAINS", "")
-        allowed_domains = [
-            domain.strip() for domain in allowed_domains_env.split(",") if domain.strip()
-        ]
-        self.browser_security = BrowserSecurityConfig.from_env(allowed_domains)
+        self.browser_security = BrowserSecurityConfig.from_env()
         self.browser_sessions = BrowserSessionManager(self.browser_security)
         api_key = os.getenv("OPENAI_API_KEY")
         if api_key:
@@ -1102,7 +1166,8 @@ class DellSystemAIService:
             logger.error(f"Error handling query: {e}")
             return {"error": str(e), "fallback": True}
 
-    def _create_agent_for_task(self, model_name: str, complexity: TaskComplexity, requires_browser_tools: bool = False):
+    def _create_agent_for_task(self, model_name: str, complexity: TaskComplexity, requires_browser_tools: bool = False,
+                               user_id: Optional[str] = None):
         """Create an appropriate agent for the given task complexity"""
         tools = list(self.tools.values())
 
@@ -1112,23 +1177,29 @@ class DellSystemAIService:
                 logger.warning(f"[_create_agent_for_task] Forcing GPT-4o for browser tools (was: {model_name})")
                 model_name = "gpt-4o"
             
-            # CRITICAL: Always force GPT-4o - never use GPT-3.5
-            if model_name != "gpt-4o":
+            # CRITICAL: Never use GPT-3.5 - only GPT-4o or a cascade model is allowed
+            if model_name != "gpt-4o" and model_name not in self.cost_optimizer.cascade:
                 logger.warning(f"[_create_agent_for_task] ⚠️ Model override: {model_name} -> gpt-4o")
                 model_name = "gpt-4o"
             
             logger.info(f"[_create_agent_for_task] Creating LLM with model: {model_name} (requires_browser_tools={requires_browser_tools})")
             
-            # CRITICAL: Set LiteLLM environment variables before creating ChatOpenAI (CrewAI uses LiteLLM internally)
+            # CRITICAL: Set LiteLLM environment variables before creating the LLM (CrewAI uses LiteLLM internally)
             os.environ["LITELLM_MODEL"] = model_name
             os.environ["OPENAI_MODEL"] = model_name
             logger.info(f"[_create_agent_for_task] LiteLLM environment variables set: LITELLM_MODEL={model_name}, OPENAI_MODEL={model_name}")
             
             # Explicitly set model parameter to prevent any override
-            llm = ChatOpenAI(
+            # Built as a crewai LLM because Agent rebuilds any other LLM object from model,
+            # temperature, max_tokens and api_key only; extra kwargs such as `user` go
+            # straight to the completion call and let OpenAI keep a user's turns on the
+            # same prompt-cache shard
+            llm_kwargs = {"user": str(user_id)} if user_id else {}
+            llm = LLM(
                 model=model_name,
                 temperature=0,
-                openai_api_key=os.getenv("OPENAI_API_KEY")  # Explicit API key to prevent fallback
+                api_key=os.getenv("OPENAI_API_KEY"),  # Explicit API key to prevent fallback
+                **llm_kwargs
             )
             
             # CRITICAL: Verify the LLM model after creation
@@ -1158,7 +1229,9 @@ CRITICAL RULES:
 If you describe actions instead of executing tools, you are failing your task.
 You MUST execute browser_navigate, browser_screenshot, and browser_extract tools when visual analysis is needed."""
             else:
-                role = f"{complexity.value.title()} Task Specialist"
+                # Role text is kept identical across complexity levels so the system-prompt
+                # prefix is byte-stable between turns and hits the provider's prompt cache
+                role = "GeoSynth QC Task Specialist"
                 goal = "Deliver precise, context-aware assistance"
                 backstory = "Veteran GeoSynth QC assistant trained on Dell System playbooks."
             
@@ -1299,7 +1372,28 @@ You MUST execute browser_navigate, browser_screenshot, and browser_extract tools
         except Exception as error:
             logger.warning("Unable to persist orchestrator manifest: %s", error)
 
-    async def handle_chat_message(self, user_id: str, user_tier: str, message: str, context: Dict = None) -> Dict:
+    async def _escalate_if_unreliable(self, agent, response: str, model: str, complexity: TaskComplexity,
+                                      requires_browser_tools: bool, user_id: str, query: str,
+                                      context: Dict) -> Tuple[str, str, Optional[str]]:
+        """
+        Cascade step: re-run the task on the next model up when the cheap answer looks unreliable.
+        A run that called any tool is never repeated, since tools such as panel moves are not idempotent.
+        Returns (response, model used, model escalated from or None).
+        """
+        next_model = self.cost_optimizer.escalation_model(model)
+        if requires_browser_tools or not next_model or not self.cost_optimizer.needs_escalation(response):
+            return response, model, None
+        tool_calls = getattr(agent, "tool_calls", 0)
+        if tool_calls:
+            logger.info("[handle_chat_message] Not escalating from %s: first run made %s tool call(s)", model, tool_calls)
+            return response, model, None
+        logger.info("[handle_chat_message] Escalating from %s to %s", model, next_model)
+        agent = self._create_agent_for_task(next_model, complexity, requires_browser_tools, user_id=user_id)
+        response = await agent.execute(query, context)
+        return response, next_model, model
+
+    async def handle_chat_message(self, user_id: str, user_tier: str, message: str, context: Dict = None,
+                                  preferred_model: Optional[str] = None) -> Dict:
         """Handle chat messages with pre-flight automation and intelligent model routing"""
         context = context or {}
         logger.info(f"[handle_chat_message] Processing chat message from user {user_id} (tier: {user_tier})")
@@ -1332,7 +1426,9 @@ You MUST execute browser_navigate, browser_screenshot, and browser_extract tools
             logger.info(f"[handle_chat_message] Browser tools required: {requires_browser_tools}, Complexity: {complexity.value}")
             
             # Select optimal model (CRITICAL: Force GPT-4o for browser tools)
-            optimal_model = self.cost_optimizer.select_optimal_model(complexity, user_tier, requires_browser_tools)
+            optimal_model = self.cost_optimizer.select_optimal_model(
+                complexity, user_tier, requires_browser_tools, preferred_model=preferred_model
+            )
             logger.info(f"[handle_chat_message] Selected model: {optimal_model}")
             
             # Pre-flight automation for browser tool tasks
@@ -1564,7 +1660,7 @@ You MUST execute browser_navigate, browser_screenshot, and browser_extract tools
             
             # Non-browser tasks OR fallback: use single agent
             logger.info(f"[handle_chat_message] Creating single agent with model: {optimal_model}, requires_browser_tools: {requires_browser_tools}")
-            agent = self._create_agent_for_task(optimal_model, complexity, requires_browser_tools)
+            agent = self._create_agent_for_task(optimal_model, complexity, requires_browser_tools, user_id=user_id)
             logger.info(f"[handle_chat_message] Agent created with {len(agent.tools)} tools")
             logger.info(f"[handle_chat_message] Agent tools: {[tool.name if hasattr(tool, 'name') else str(tool) for tool in agent.tools]}")
             
@@ -1577,7 +1673,7 @@ You MUST execute browser_navigate, browser_screenshot, and browser_extract tools
                 cleaned_context = {k: v for k, v in enhanced_context.items() if v is not None}
                 
                 enhanced_query = f"""User request: {message}
-Context: {json.dumps(cleaned_context, default=str)}
+Context: {json.dumps(cleaned_context, default=str, sort_keys=True)}
 
 🚨 CRITICAL: THIS IS A VISUAL LAYOUT QUESTION - YOU MUST USE BROWSER AUTOMATION TOOLS ONLY.
 
@@ -1648,6 +1744,11 @@ IMPORTANT TOOL USAGE RULES:
             response = await agent.execute(enhanced_query, enhanced_context)
             logger.info(f"[handle_chat_message] ===== CREW EXECUTION COMPLETE =====")
             
+            response, optimal_model, escalated_from = await self._escalate_if_unreliable(
+                agent, response, optimal_model, complexity, requires_browser_tools, user_id,
+                enhanced_query, enhanced_context
+            )
+            
             # Validate response for browser tool tasks
             if requires_browser_tools:
                 response_lower = response.lower()
@@ -1670,6 +1771,8 @@ IMPORTANT TOOL USAGE RULES:
             # Track usage
             estimated_tokens = len(message.split()) * 1.3
             estimated_cost = self._calculate_cost(optimal_model, estimated_tokens)
+            if escalated_from:
+                estimated_cost += self._calculate_cost(escalated_from, estimated_tokens)
             await self.cost_optimizer.track_usage(user_id, optimal_model, estimated_tokens, estimated_cost)
             
             logger.info(f"[handle_chat_message] Extracted response length: {len(response)} characters")
@@ -1683,6 +1786,7 @@ IMPORTANT TOOL USAGE RULES:
                 "session_id": session_id,
                 "conversation_id": session_id,
                 "model_used": optimal_model,
+                "escalated_from": escalated_from,
                 "complexity_level": complexity.value,
                 "estimated_cost": estimated_cost,
                 "browser_tools_required": requires_browser_tools,
@@ -2,28 +2,52 @@
 # Connects the hybrid AI architecture with the Flask app
 
 import os
+import hashlib
 import logging
 import asyncio
+import time
+import threading
 import uuid
-from typing import Dict, List, Optional, Any
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Hashable, List, Optional, Any
 from flask import current_app
 import json
 from datetime import datetime
 
+from panel_preprocessing import find_nearby_items
+from result_cache import SemanticCache
+
 logger = logging.getLogger(__name__)
 
-# Import the hybrid AI architecture
-try:
-    from hybrid_ai_architecture import DellSystemAIService
-    logger.debug(f"DellSystemAIService imported: {DellSystemAIService}")
-except ImportError as e:
-    # Fallback if hybrid architecture is not available
-    logger.warning(f"⚠️ Failed to import hybrid AI architecture (ImportError): {e}")
-    DellSystemAIService = None
-except Exception as e:
-    # Catch any other errors during import (e.g., initialization errors)
-    logger.error(f"❌ Error importing hybrid AI architecture: {e}", exc_info=True)
-    DellSystemAIService = None
+# Conversations remembered for sticky chat model routing
+CHAT_MODEL_HINTS_MAX = 10000
+# Seconds a conversation stays on the model it moved to; roughly how long the provider keeps a prompt prefix cached
+CHAT_MODEL_HINT_TTL = float(os.getenv("CHAT_MODEL_HINT_TTL", "300"))
+
+# Per-turn fields of a chat reply; never stored in the semantic cache
+CHAT_TURN_FIELDS = ("timestamp", "session_id", "conversation_id")
+
+# Seconds a get_service_status() result (including the Redis ping) is reused
+SERVICE_STATUS_TTL = float(os.getenv("SERVICE_STATUS_TTL", "5"))
+
+def _load_hybrid_architecture():
+    """
+    Import the hybrid AI architecture on first use.
+    The CrewAI/LangChain import chain is heavy, so it is deferred until an
+    integration instance is actually created.
+    """
+    try:
+        from hybrid_ai_architecture import DellSystemAIService
+        logger.debug("DellSystemAIService imported: %s", DellSystemAIService)
+        return DellSystemAIService
+    except ImportError as e:
+        # Fallback if hybrid architecture is not available
+        logger.warning("⚠️ Failed to import hybrid AI architecture (ImportError): %s", e)
+    except Exception as e:
+        # Catch any other errors during import (e.g., initialization errors)
+        logger.error("❌ Error importing hybrid AI architecture: %s", e, exc_info=True)
+    return None
 
 class AIServiceIntegration:
     """Integration layer between Flask app and hybrid AI architecture"""
@@ -32,11 +56,19 @@ class AIServiceIntegration:
         self.redis_host = redis_host or os.getenv('REDIS_HOST', 'localhost')
         self.redis_port = redis_port
         self.ai_service = None
+        self.chat_cache = None
+        # Last model used per conversation and when that hint expires, passed back as a sticky routing hint (bounded LRU)
+        self._chat_models: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._chat_models_lock = threading.Lock()
         self._initialize_ai_service()
+        self._status_cache = None
+        self._status_expires = 0.0
+        self._initialize_chat_cache()
     
     def _initialize_ai_service(self):
         """Initialize the AI service with fallback handling"""
         try:
+            DellSystemAIService = _load_hybrid_architecture()
             if DellSystemAIService:
                 # Create Redis client first
                 import redis
@@ -50,9 +82,9 @@ class AIServiceIntegration:
                     )
                     # Test connection
                     redis_client.ping()
-                    logger.info(f"✅ Redis connected to {self.redis_host}:{self.redis_port}")
+                    logger.info("✅ Redis connected to %s:%s", self.redis_host, self.redis_port)
                 except Exception as redis_error:
-                    logger.warning(f"⚠️ Redis connection failed ({redis_error})")
+                    logger.warning("⚠️ Redis connection failed (%s)", redis_error)
                     logger.warning("⚠️ Attempting to initialize AI service without Redis (some features may be limited)")
                     # Try to create a minimal Redis client that will fail gracefully
                     # For now, we'll still try to initialize but Redis-dependent features won't work
@@ -74,7 +106,7 @@ class AIServiceIntegration:
                         self.ai_service = DellSystemAIService(redis_client=redis_client)
                         logger.info("✅ Hybrid AI Architecture initialized successfully")
                     except Exception as init_error:
-                        logger.error(f"❌ Failed to initialize DellSystemAIService: {init_error}", exc_info=True)
+                        logger.error("❌ Failed to initialize DellSystemAIService: %s", init_error, exc_info=True)
                         self.ai_service = None
                 else:
                     logger.error("❌ Cannot initialize AI service - Redis connection required")
@@ -83,9 +115,40 @@ class AIServiceIntegration:
                 logger.warning("⚠️ Hybrid AI Architecture not available, using fallback")
                 self.ai_service = None
         except Exception as e:
-            logger.error(f"❌ Failed to initialize AI service: {e}", exc_info=True)
+            logger.error("❌ Failed to initialize AI service: %s", e, exc_info=True)
             self.ai_service = None
     
+    def _initialize_chat_cache(self):
+        """Create the semantic chat cache when enabled and an embedding client is available"""
+        if os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() != "true":
+            return
+        openai_service = getattr(self.ai_service, "openai_service", None)
+        if openai_service is None:
+            logger.warning("⚠️ SEMANTIC_CACHE_ENABLED is set but no OpenAI client is available - chat cache disabled")
+            return
+        self.chat_cache = SemanticCache(
+            openai_service.embed_text,
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+            max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "256")),
+            ttl=float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "300"))
+        )
+        logger.info("✅ Semantic chat cache enabled")
+    
+    def invalidate_chat_cache(self, project_id: str = None):
+        """Drop cached chat answers for a project (or all projects) after its data changes"""
+        if self.chat_cache is not None:
+            self.chat_cache.invalidate(project_id)
+    
+    @staticmethod
+    def _is_cacheable_chat_result(result: Dict) -> bool:
+        """Only plain successful answers are reused; anything that drove automation is not"""
+        return (
+            isinstance(result, dict)
+            and result.get("success") is True
+            and not result.get("workflow_used")
+            and not result.get("browser_tools_required")
+        )
+    
     def is_hybrid_ai_available(self) -> bool:
         """Check if hybrid AI architecture is available"""
         return self.ai_service is not None
@@ -117,7 +180,7 @@ class AIServiceIntegration:
             return result
             
         except Exception as e:
-            logger.error(f"Document analysis failed: {e}")
+            logger.error("Document analysis failed: %s", e)
             return {"error": str(e)}
     
     async def optimize_panels_hybrid(self, panels: List[Dict], strategy: str, 
@@ -143,7 +206,7 @@ class AIServiceIntegration:
             return result
             
         except Exception as e:
-            logger.error(f"Panel optimization failed: {e}")
+            logger.error("Panel optimization failed: %s", e)
             return {"error": str(e)}
     
     async def setup_new_project_hybrid(self, project_data: Dict, user_id: str = "default", 
@@ -162,7 +225,7 @@ class AIServiceIntegration:
             return result
             
         except Exception as e:
-            logger.error(f"Project setup failed: {e}")
+            logger.error("Project setup failed: %s", e)
             return {"error": str(e)}
     
     async def chat_message_hybrid(self, message: str, context: Dict = None, 
@@ -173,19 +236,111 @@ class AIServiceIntegration:
         
         try:
             context = context or {}
+            cache_key = None
+            embedding = None
+            if self.chat_cache is not None:
+                project_id = context.get("projectId") or context.get("project_id")
+                # The conversation so far is part of the key, so a follow-up like "why?" only
+                # matches the same question asked at the same point of the same conversation
+                cache_key = (project_id, user_id, user_tier, self._chat_history_digest(context))
+                cached, embedding = await asyncio.to_thread(self.chat_cache.lookup, cache_key, message)
+                if cached is not None:
+                    logger.debug("Semantic cache hit for user %s, project %s", user_id, project_id)
+                    return self._fresh_chat_turn(cached, user_id, context)
+            
+            conversation_key = self._chat_conversation_key(user_id, context)
+            preferred_model = self._chat_model_hint(conversation_key)
+            
             result = await self.ai_service.handle_chat_message(
                 user_id=user_id,
                 user_tier=user_tier,
                 message=message,
-                context=context
+                context=context,
+                preferred_model=preferred_model
             )
             
+            model_used = result.get("model_used") if isinstance(result, dict) else None
+            if model_used:
+                self._remember_chat_model(conversation_key, model_used)
+            
+            if cache_key is not None and self._is_cacheable_chat_result(result):
+                stored = {k: v for k, v in result.items() if k not in CHAT_TURN_FIELDS}
+                await asyncio.to_thread(self.chat_cache.put, cache_key, message, stored, embedding)
+            
             return result
             
         except Exception as e:
-            logger.error(f"Chat message handling failed: {e}")
+            logger.error("Chat message handling failed: %s", e)
             return {"error": str(e)}
     
+    @staticmethod
+    def _chat_history_digest(context: Dict) -> str:
+        """Digest of the roles and contents of context["history"] (timestamps ignored)"""
+        history = context.get("history") or []
+        turns = [
+            [turn.get("role"), turn.get("content")] if isinstance(turn, dict) else turn
+            for turn in history
+        ]
+        return hashlib.sha256(json.dumps(turns, default=str).encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def _fresh_chat_turn(cached: Dict, user_id: str, context: Dict) -> Dict:
+        """A cached reply with new per-turn fields, in the format handle_chat_message uses"""
+        now = time.time()
+        session_id = f"chat-{context.get('projectId', user_id)}-{int(now)}"
+        return {**cached, "timestamp": now, "session_id": session_id, "conversation_id": session_id}
+    
+    @staticmethod
+    def _chat_conversation_key(user_id: str, context: Dict) -> Optional[tuple]:
+        """
+        Key for the sticky model hint: the conversation id when the caller sends one, otherwise
+        the project (the chat panel and backend send projectId but no conversation id).
+        None when the request names neither.
+        """
+        conversation_id = (
+            context.get("conversationId") or context.get("conversation_id")
+            or context.get("sessionId") or context.get("session_id")
+        )
+        if conversation_id:
+            return (user_id, "conversation", str(conversation_id))
+        project_id = context.get("projectId") or context.get("project_id")
+        return (user_id, "project", str(project_id)) if project_id else None
+    
+    def _chat_model_hint(self, key: Optional[tuple]) -> Optional[str]:
+        """Model the conversation was last served by, while that hint is still live"""
+        if key is None:
+            return None
+        with self._chat_models_lock:
+            entry = self._chat_models.get(key)
+            if entry is None:
+                return None
+            model, expires = entry
+            if time.monotonic() >= expires:
+                # Let the conversation fall back to the bottom of the cascade
+                del self._chat_models[key]
+                return None
+            return model
+    
+    def _remember_chat_model(self, key: Optional[tuple], model: str) -> None:
+        """
+        Record the model a conversation was served by.
+        The TTL restarts only when the model changes, so an escalated conversation
+        returns to the cascade once the hint expires instead of staying up forever.
+        """
+        if key is None:
+            return
+        now = time.monotonic()
+        with self._chat_models_lock:
+            entry = self._chat_models.get(key)
+            if entry is not None and entry[0] == model and now < entry[1]:
+                expires = entry[1]
+            else:
+                expires = now + CHAT_MODEL_HINT_TTL
+            self._chat_models[key] = (model, expires)
+            self._chat_models.move_to_end(key)
+            if len(self._chat_models) > CHAT_MODEL_HINTS_MAX:
+                self._chat_models.popitem(last=False)
+    
     def _determine_analysis_type(self, question: str) -> str:
         """Determine the type of analysis based on the question"""
         question_lower = question.lower()
@@ -200,12 +355,19 @@ class AIServiceIntegration:
             return "general_analysis"
     
     def get_service_status(self) -> Dict:
-        """Get the current status of the AI service"""
-        return {
-            "hybrid_ai_available": self.is_hybrid_ai_available(),
-            "redis_connected": self._check_redis_connection(),
-            "service_health": "healthy" if self.ai_service else "degraded"
-        }
+        """
+        Get the current status of the AI service.
+        Cached for SERVICE_STATUS_TTL seconds so /health polling does not ping Redis on every call.
+        """
+        now = time.monotonic()
+        if self._status_cache is None or now >= self._status_expires:
+            self._status_cache = {
+                "hybrid_ai_available": self.is_hybrid_ai_available(),
+                "redis_connected": self._check_redis_connection(),
+                "service_health": "healthy" if self.ai_service else "degraded"
+            }
+            self._status_expires = now + SERVICE_STATUS_TTL
+        return dict(self._status_cache)
     
     def _check_redis_connection(self) -> bool:
         """Check if Redis connection is available"""
@@ -225,6 +387,7 @@ class AIServiceIntegration:
         upload_id: str = None
     ) -> Dict[str, Any]:
         """Automate panel layout population using browser tools based on defect data"""
+        self.invalidate_chat_cache(project_id)
         if not self.is_hybrid_ai_available():
             return {
                 "success": False,
@@ -232,7 +395,7 @@ class AIServiceIntegration:
             }
         
         try:
-            logger.info(f"Starting panel population automation for project {project_id}")
+            logger.info("Starting panel population automation for project %s", project_id)
             
             # Get defects from defect_data
             defects = defect_data.get("defects", [])
@@ -262,7 +425,7 @@ class AIServiceIntegration:
             frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
             panel_layout_url = f"{frontend_url}/dashboard/projects/{project_id}/panel-layout"
             
-            logger.info(f"Navigating to panel layout: {panel_layout_url}")
+            logger.info("Navigating to panel layout: %s", panel_layout_url)
             
             # Use browser navigation tool
             navigate_tool = browser_tools.get("browser_navigate")
@@ -273,9 +436,9 @@ class AIServiceIntegration:
                         session_id=f"mobile_{upload_id}" if upload_id else "mobile_default",
                         user_id=user_id
                     )
-                    logger.info(f"Navigation result: {navigate_result}")
+                    logger.info("Navigation result: %s", navigate_result)
                 except Exception as e:
-                    logger.warning(f"Navigation failed (may already be on page): {e}")
+                    logger.warning("Navigation failed (may already be on page): %s", e)
             
             # Extract current panels
             extract_tool = browser_tools.get("browser_extract")
@@ -295,9 +458,9 @@ class AIServiceIntegration:
                                 current_panels = extract_data["panels"]
                         except:
                             pass
-                    logger.info(f"Current panels extracted: {len(current_panels)}")
+                    logger.info("Current panels extracted: %s", len(current_panels))
                 except Exception as e:
-                    logger.warning(f"Panel extraction failed: {e}")
+                    logger.warning("Panel extraction failed: %s", e)
             
             session_id = f"mobile_{upload_id}" if upload_id else "mobile_default"
             interaction_tool = browser_tools.get("browser_interact")
@@ -329,7 +492,7 @@ class AIServiceIntegration:
                         return
                     except Exception as interaction_error:
                         last_error = interaction_error
-                        logger.debug(f"Selector {selector} click failed: {interaction_error}")
+                        logger.debug("Selector %s click failed: %s", selector, interaction_error)
                 if last_error:
                     raise last_error
             
@@ -391,9 +554,9 @@ class AIServiceIntegration:
                     await asyncio.sleep(1)
                     panels_created += 1
                     created_panel_numbers.append(panel_number)
-                    logger.info(f"✅ Created panel via browser automation for defect {defect.get('id')}")
+                    logger.info("✅ Created panel via browser automation for defect %s", defect.get('id'))
                 except Exception as defect_error:
-                    logger.error(f"Failed to create panel for defect {defect.get('id')}: {defect_error}")
+                    logger.error("Failed to create panel for defect %s: %s", defect.get('id'), defect_error)
                     continue
             
             verification_panels = current_panels
@@ -420,9 +583,9 @@ class AIServiceIntegration:
                                     if panel.get("panelNumber") in created_panel_numbers
                                 ]
                         except json.JSONDecodeError as decode_error:
-                            logger.debug(f"Panel verification JSON parse failed: {decode_error}")
+                            logger.debug("Panel verification JSON parse failed: %s", decode_error)
                 except Exception as verify_error:
-                    logger.warning(f"Post-creation extraction failed: {verify_error}")
+                    logger.warning("Post-creation extraction failed: %s", verify_error)
             
             screenshot_base64 = None
             if screenshot_tool:
@@ -435,7 +598,7 @@ class AIServiceIntegration:
                     if isinstance(screenshot_result, str) and not screenshot_result.lower().startswith("error"):
                         screenshot_base64 = screenshot_result
                 except Exception as screenshot_error:
-                    logger.warning(f"Screenshot capture failed: {screenshot_error}")
+                    logger.warning("Screenshot capture failed: %s", screenshot_error)
             
             return {
                 "success": panels_created > 0,
@@ -447,7 +610,7 @@ class AIServiceIntegration:
             }
             
         except Exception as e:
-            logger.error(f"Error automating panel population: {e}", exc_info=True)
+            logger.error("Error automating panel population: %s", e, exc_info=True)
             return {
                 "success": False,
                 "error": str(e)
@@ -462,6 +625,7 @@ class AIServiceIntegration:
         positioning: Dict[str, Any] = None
     ) -> Dict[str, Any]:
         """Automate item creation from approved form using multi-agent workflow"""
+        self.invalidate_chat_cache(project_id)
         if not self.is_hybrid_ai_available():
             return {
                 "success": False,
@@ -474,7 +638,7 @@ class AIServiceIntegration:
             with open('/Users/dtaplin21/DellSystemManager/.cursor/debug.log', 'a') as f:
                 f.write(json.dumps({"location":"integration_layer.py:472","message":"Starting workflow automation","data":{"formId":form_record.get('id'),"projectId":project_id,"userId":user_id},"timestamp":int(time.time()*1000),"sessionId":"debug-session","runId":"run1","hypothesisId":"E"})+"\n")
             # #endregion
-            logger.info(f"Starting multi-agent workflow automation for project {project_id}, form {form_record.get('id')}")
+            logger.info("Starting multi-agent workflow automation for project %s, form %s", project_id, form_record.get('id'))
             
             # Determine item type if not provided
             if not item_type:
@@ -539,7 +703,7 @@ class AIServiceIntegration:
                     if data.get('success') and data.get('cardinalDirection'):
                         cardinal_direction = data['cardinalDirection']
             except Exception as e:
-                logger.warning(f"Could not fetch cardinal direction, using default 'north': {e}")
+                logger.warning("Could not fetch cardinal direction, using default 'north': %s", e)
             
             # Extract structured location fields from form record
             mapped_data = form_record.get('mapped_data', {})
@@ -627,15 +791,15 @@ class AIServiceIntegration:
                 f.write(json.dumps({"location":"integration_layer.py:615","message":"Workflow completed","data":{"formId":form_record.get('id'),"hasReflections":"reflections" in workflow_result,"hasCorrections":"corrections" in workflow_result},"timestamp":int(time.time()*1000),"sessionId":"debug-session","runId":"run1","hypothesisId":"E"})+"\n")
             # #endregion
             
-            logger.info(f"Multi-agent workflow with reflection completed for form {form_record.get('id')}")
+            logger.info("Multi-agent workflow with reflection completed for form %s", form_record.get('id'))
             
             # Log reflection and correction results if available
             if "reflections" in workflow_result:
-                logger.info(f"Reflection results: {list(workflow_result['reflections'].keys())}")
+                logger.info("Reflection results: %s", list(workflow_result['reflections'].keys()))
             if "corrections" in workflow_result:
                 corrections = workflow_result.get("corrections", {})
                 if corrections.get("output"):
-                    logger.info(f"Corrections made: {corrections.get('output', {})}")
+                    logger.info("Corrections made: %s", corrections.get('output', {}))
             
             # Extract results from workflow output
             # workflow_result structure: {"result": {...}, "reflections": {...}, "corrections": {...}}
@@ -689,7 +853,7 @@ class AIServiceIntegration:
             }
             
         except Exception as e:
-            logger.error(f"Error in multi-agent workflow automation: {e}", exc_info=True)
+            logger.error("Error in multi-agent workflow automation: %s", e, exc_info=True)
             return {
                 "success": False,
                 "error": str(e)
@@ -702,6 +866,7 @@ class AIServiceIntegration:
         user_id: str = None
     ) -> Dict[str, Any]:
         """Automate item creation from approved form using browser tools (legacy method)"""
+        self.invalidate_chat_cache(project_id)
         if not self.is_hybrid_ai_available():
             return {
                 "success": False,
@@ -709,7 +874,7 @@ class AIServiceIntegration:
             }
         
         try:
-            logger.info(f"Starting form-based automation for project {project_id}, form {form_record.get('id')}")
+            logger.info("Starting form-based automation for project %s, form %s", project_id, form_record.get('id'))
             
             domain = form_record.get('domain')
             item_type = form_record.get('item_type')  # 'panel', 'patch', or 'destructive_test'
@@ -727,7 +892,7 @@ class AIServiceIntegration:
             frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
             panel_layout_url = f"{frontend_url}/dashboard/projects/{project_id}/panel-layout"
             
-            logger.info(f"Navigating to panel layout: {panel_layout_url}")
+            logger.info("Navigating to panel layout: %s", panel_layout_url)
             
             session_id = f"form_{form_record.get('id', 'default')}"
             
@@ -742,7 +907,7 @@ class AIServiceIntegration:
                     )
                     logger.info("Navigation successful")
                 except Exception as e:
-                    logger.warning(f"Navigation failed (may already be on page): {e}")
+                    logger.warning("Navigation failed (may already be on page): %s", e)
             
             # Determine which tab to switch to
             tab_map = {
@@ -764,9 +929,9 @@ class AIServiceIntegration:
                         session_id=session_id,
                         user_id=user_id
                     )
-                    logger.info(f"Switched to {tab_name} tab")
+                    logger.info("Switched to %s tab", tab_name)
                 except Exception as e:
-                    logger.warning(f"Tab switch failed: {e}")
+                    logger.warning("Tab switch failed: %s", e)
             
             # Extract form data for item creation
             mapped_data = form_record.get('mapped_data', {})
@@ -789,12 +954,12 @@ class AIServiceIntegration:
                                 session_id=session_id,
                                 user_id=user_id
                             )
-                            logger.info(f"Clicked Add button with selector: {selector}")
+                            logger.info("Clicked Add button with selector: %s", selector)
                             break
                         except:
                             continue
                 except Exception as e:
-                    logger.warning(f"Add button click failed: {e}")
+                    logger.warning("Add button click failed: %s", e)
             
             # Fill form fields based on item type and form data
             # Enhanced to handle all field types: text, number, date, select, textarea
@@ -1029,16 +1194,16 @@ class AIServiceIntegration:
                                             user_id=user_id
                                         )
                                     filled = True
-                                    logger.info(f"Filled field {field_name} with value {field_value}")
+                                    logger.info("Filled field %s with value %s", field_name, field_value)
                                     await asyncio.sleep(0.2)  # Small delay between fields
                                     break
                                 except Exception as e:
                                     continue
                             
                             if not filled:
-                                logger.warning(f"Could not fill field {field_name} with any selector")
+                                logger.warning("Could not fill field %s with any selector", field_name)
                         except Exception as e:
-                            logger.warning(f"Error filling field {field_name}: {e}")
+                            logger.warning("Error filling field %s: %s", field_name, e)
                             continue
                     
                     # Submit form
@@ -1062,7 +1227,7 @@ class AIServiceIntegration:
                             continue
                             
                 except Exception as e:
-                    logger.warning(f"Form filling failed: {e}")
+                    logger.warning("Form filling failed: %s", e)
             
             # Extract created item ID and validate creation
             extract_tool = browser_tools.get("browser_extract")
@@ -1098,10 +1263,10 @@ class AIServiceIntegration:
                                     existing_items=items[:-1]  # All items except the one we just created
                                 )
                         except json.JSONDecodeError as e:
-                            logger.warning(f"Failed to parse extract result: {e}")
+                            logger.warning("Failed to parse extract result: %s", e)
                             validation_result["errors"].append(f"Failed to parse extraction result: {e}")
                 except Exception as e:
-                    logger.warning(f"Item extraction failed: {e}")
+                    logger.warning("Item extraction failed: %s", e)
                     validation_result["errors"].append(f"Extraction failed: {e}")
             
             # Log validation results
@@ -1114,7 +1279,7 @@ class AIServiceIntegration:
             
             # If validation failed with critical errors, attempt rollback
             if not validation_result["valid"] and validation_result.get("critical_error"):
-                logger.warning(f"Critical validation error detected, attempting rollback for item {item_id}")
+                logger.warning("Critical validation error detected, attempting rollback for item %s", item_id)
                 rollback_result = await self._rollback_item_creation(
                     item_id=item_id,
                     item_type=item_type,
@@ -1124,9 +1289,9 @@ class AIServiceIntegration:
                     browser_tools=browser_tools
                 )
                 if rollback_result.get("success"):
-                    logger.info(f"Successfully rolled back item creation for form {form_record.get('id')}")
+                    logger.info("Successfully rolled back item creation for form %s", form_record.get('id'))
                 else:
-                    logger.error(f"Failed to rollback item creation: {rollback_result.get('error')}")
+                    logger.error("Failed to rollback item creation: %s", rollback_result.get('error'))
             
             return {
                 "success": validation_result["valid"] if validation_result else True,
@@ -1138,7 +1303,7 @@ class AIServiceIntegration:
             }
             
         except Exception as e:
-            logger.error(f"Error in automate_from_approved_form: {e}", exc_info=True)
+            logger.error("Error in automate_from_approved_form: %s", e, exc_info=True)
             return {
                 "success": False,
                 "error": str(e)
@@ -1315,7 +1480,7 @@ class AIServiceIntegration:
                     validation["valid"] = False
             
         except Exception as e:
-            logger.error(f"Error validating created item: {e}", exc_info=True)
+            logger.error("Error validating created item: %s", e, exc_info=True)
             validation["errors"].append({
                 "type": "validation_error",
                 "message": f"Validation failed: {e}"
@@ -1326,54 +1491,19 @@ class AIServiceIntegration:
     
     def _check_overlaps(self, item: Dict[str, Any], existing_items: List[Dict[str, Any]], item_type: str) -> List[Dict[str, Any]]:
         """Check if item overlaps with existing items (simplified spatial check)"""
-        overlaps = []
+        if item_type not in ('panel', 'patch', 'destructive_test'):
+            return []
         
         try:
             item_x = float(item.get('x', 0))
             item_y = float(item.get('y', 0))
             
-            if item_type == 'panel':
-                item_width = float(item.get('width', 0))
-                item_height = float(item.get('height', 0))
-                item_bounds = {
-                    'left': item_x,
-                    'right': item_x + item_width,
-                    'top': item_y,
-                    'bottom': item_y + item_height
-                }
-            elif item_type == 'patch':
-                item_radius = float(item.get('radius', 1.5))
-                item_bounds = {
-                    'left': item_x - item_radius,
-                    'right': item_x + item_radius,
-                    'top': item_y - item_radius,
-                    'bottom': item_y + item_radius
-                }
-            elif item_type == 'destructive_test':
-                item_width = float(item.get('width', 0))
-                item_height = float(item.get('height', 0))
-                item_bounds = {
-                    'left': item_x,
-                    'right': item_x + item_width,
-                    'top': item_y,
-                    'bottom': item_y + item_height
-                }
-            else:
-                return overlaps
-            
-            # Check against existing items
-            for existing_item in existing_items:
-                existing_x = float(existing_item.get('x', 0))
-                existing_y = float(existing_item.get('y', 0))
-                
-                # Simple bounding box check
-                if abs(existing_x - item_x) < 50 and abs(existing_y - item_y) < 50:
-                    overlaps.append(existing_item)
+            # Simple bounding box check, vectorized over all existing items
+            return [existing_items[i] for i in find_nearby_items(item_x, item_y, existing_items, tolerance=50.0)]
         
         except Exception as e:
-            logger.warning(f"Error checking overlaps: {e}")
-        
-        return overlaps
+            logger.warning("Error checking overlaps: %s", e)
+            return []
     
     async def _rollback_item_creation(
         self,
@@ -1395,7 +1525,7 @@ class AIServiceIntegration:
             
             # Try to find and delete the item
             # This is a simplified rollback - in production, might want to use API delete endpoint
-            logger.info(f"Attempting rollback for item {item_id} of type {item_type}")
+            logger.info("Attempting rollback for item %s of type %s", item_id, item_type)
             
             # For now, log the rollback attempt
             # In a full implementation, would navigate to item, click delete, confirm
@@ -1406,27 +1536,114 @@ class AIServiceIntegration:
             }
         
         except Exception as e:
-            logger.error(f"Error in rollback: {e}", exc_info=True)
+            logger.error("Error in rollback: %s", e, exc_info=True)
             return {
                 "success": False,
                 "error": str(e)
             }
 
 
-def run_async(coro):
+class RequestCoalescer:
     """
-    Helper function to run async coroutines in Flask context.
-    Handles both cases where an event loop exists and where it doesn't.
+    Collapse concurrent identical requests into a single upstream call.
+    
+    The first caller for a key runs the work; callers arriving with the same
+    key while it is in flight wait for that result instead of issuing their
+    own model call. Only tiers listed in COALESCE_TIERS are coalesced. Keys
+    must include the requesting user so one user never receives a result
+    computed for another.
     """
-    try:
-        return asyncio.run(coro)
-    except RuntimeError:
-        # If event loop already exists, create new one
-        loop = asyncio.new_event_loop()
+    
+    def __init__(self, tiers: Optional[str] = None):
+        tiers = tiers if tiers is not None else os.getenv("COALESCE_TIERS", "paid_user")
+        self.tiers = frozenset(tier.strip() for tier in tiers.split(",") if tier.strip())
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+    
+    def run(self, key: Hashable, user_tier: str, fn: Callable[[], Any]) -> Any:
+        """Run fn() for key, sharing the result with concurrent callers of the same key"""
+        if user_tier not in self.tiers:
+            return fn()
+        
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+        
+        if not leader:
+            logger.debug("Coalesced request onto in-flight call: %r", key)
+            return future.result()
+        
         try:
-            return loop.run_until_complete(coro)
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
         finally:
-            loop.close()
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+# Shared coalescer for the document analysis/extraction endpoints
+request_coalescer = RequestCoalescer()
+
+
+# Seconds a request thread waits for a coroutine on the background loop
+RUN_ASYNC_TIMEOUT = float(os.getenv("RUN_ASYNC_TIMEOUT", "300"))
+
+# Persistent event loop shared by all request threads
+_background_loop = None
+_background_loop_lock = threading.Lock()
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Get the process-wide event loop, starting its daemon thread on first use.
+    Started lazily (not at import) so each forked worker gets its own loop.
+    """
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None or _background_loop.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="ai-service-event-loop", daemon=True)
+            thread.start()
+            _background_loop = loop
+            logger.debug("Started background event loop")
+    return _background_loop
+
+
+def submit_async(coro) -> Future:
+    """
+    Schedule a coroutine on the persistent background loop and return a
+    concurrent.futures.Future for it without waiting (e.g. for streaming responses).
+    """
+    loop = get_background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("Cannot block on the background event loop from inside it; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop)
+
+
+def run_async(coro, timeout: Optional[float] = None):
+    """
+    Helper function to run async coroutines in Flask context.
+    Schedules the coroutine on the persistent background loop instead of
+    creating a loop per request, so loop-bound resources (browser sessions,
+    async clients) survive between requests.
+    """
+    future = submit_async(coro)
+    try:
+        return future.result(timeout=timeout or RUN_ASYNC_TIMEOUT)
+    except FutureTimeoutError:
+        future.cancel()
+        raise
 
 
 # Global AI integration instance
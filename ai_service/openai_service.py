@@ -1,19 +1,66 @@
+import os
 import logging
 import json
 import asyncio
 import requests
 from typing import Dict, List, Any, Union
+import httpx
 import openai
 
+from utils import extract_json_object
+
 logger = logging.getLogger(__name__)
 
 class OpenAIService:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, max_connections: int = None, pool_timeout: float = None):
         """
-        Initialize the OpenAI service with API key
+        Initialize the OpenAI service with API key and a bounded HTTP connection pool
+        
+        Pool size and pool-wait timeout default to OPENAI_MAX_CONNS and
+        OPENAI_POOL_TIMEOUT so bursts queue for a connection instead of blocking forever.
         """
         self.api_key = api_key
         openai.api_key = api_key
+        
+        if max_connections is None:
+            max_connections = int(os.getenv("OPENAI_MAX_CONNS", "64"))
+        if pool_timeout is None:
+            pool_timeout = float(os.getenv("OPENAI_POOL_TIMEOUT", "10"))
+        
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", str(max(1, max_connections // 2))))
+            ),
+            timeout=httpx.Timeout(
+                connect=float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5")),
+                read=float(os.getenv("OPENAI_READ_TIMEOUT", "60")),
+                write=float(os.getenv("OPENAI_WRITE_TIMEOUT", "60")),
+                pool=pool_timeout
+            )
+        )
+        self._client = None
+    
+    @property
+    def client(self) -> openai.OpenAI:
+        """OpenAI client bound to the shared connection pool, created on first use"""
+        if self._client is None:
+            self._client = openai.OpenAI(api_key=self.api_key, http_client=self.http_client)
+        return self._client
+    
+    def embed_text(self, text: str, model: str = "text-embedding-3-small") -> List[float]:
+        """
+        Embed text for similarity lookups (semantic response cache)
+        
+        Args:
+            text: Text to embed
+            model: Embedding model name
+            
+        Returns:
+            Embedding vector
+        """
+        response = self.client.embeddings.create(model=model, input=text)
+        return response.data[0].embedding
     
     def analyze_document_content(self, text: str, question: str) -> str:
         """
@@ -30,11 +77,11 @@ class OpenAIService:
             # If text is too long, truncate it to fit within model limits
             max_tokens = 16000  # Safe limit for gpt-4o
             if len(text) > max_tokens * 3:  # Rough character to token conversion
-                logger.warning(f"Document text too long ({len(text)} chars), truncating...")
+                logger.warning("Document text too long (%s chars), truncating...", len(text))
                 text = text[:max_tokens * 3]
             
             # the newest OpenAI model is "gpt-4o" which was released May 13, 2024. do not change this unless explicitly requested by the user
-            response = openai.chat.completions.create(
+            response = self.client.chat.completions.create(
                 model="gpt-4o",
                 messages=[
                     {"role": "system", "content": 
@@ -55,7 +102,7 @@ class OpenAIService:
             return response.choices[0].message.content.strip()
             
         except Exception as e:
-            logger.error(f"Error in analyze_document_content: {str(e)}")
+            logger.error("Error in analyze_document_content: %s", e)
             return f"Error analyzing document: {str(e)}"
     
     def extract_structured_data(self, text: str, extraction_prompt: str) -> Dict[str, Any]:
@@ -71,7 +118,7 @@ class OpenAIService:
         """
         try:
             # the newest OpenAI model is "gpt-4o" which was released May 13, 2024. do not change this unless explicitly requested by the user
-            response = openai.chat.completions.create(
+            response = self.client.chat.completions.create(
                 model="gpt-4o",
                 messages=[
                     {"role": "system", "content": 
@@ -96,11 +143,11 @@ class OpenAIService:
                 result_json = json.loads(result_text)
                 return result_json
             except json.JSONDecodeError:
-                logger.error(f"Failed to parse JSON from OpenAI response: {result_text}")
+                logger.error("Failed to parse JSON from OpenAI response: %s", result_text)
                 return {"error": "Invalid JSON response from extraction", "text": result_text}
             
         except Exception as e:
-            logger.error(f"Error in extract_structured_data: {str(e)}")
+            logger.error("Error in extract_structured_data: %s", e)
             return {"error": f"Error extracting data: {str(e)}"}
     
     def optimize_panel_layout(self, panels: List[Dict[str, Any]], strategy: str = "balanced", site_config: Dict[str, Any] = None) -> Dict[str, Any]:
@@ -121,7 +168,7 @@ class OpenAIService:
             site_config_json = json.dumps(site_config or {}, indent=2)
             
             # the newest OpenAI model is "gpt-4o" which was released May 13, 2024. do not change this unless explicitly requested by the user
-            response = openai.chat.completions.create(
+            response = self.client.chat.completions.create(
                 model="gpt-4o",
                 messages=[
                     {"role": "system", "content": 
@@ -167,14 +214,14 @@ class OpenAIService:
                 result_json = json.loads(result_text)
                 return result_json
             except json.JSONDecodeError:
-                logger.error(f"Failed to parse JSON from OpenAI response: {result_text}")
+                logger.error("Failed to parse JSON from OpenAI response: %s", result_text)
                 return {"error": "Invalid JSON response from optimization", "text": result_text}
             
         except Exception as e:
-            logger.error(f"Error in optimize_panel_layout: {str(e)}")
+            logger.error("Error in optimize_panel_layout: %s", e)
             return {"error": f"Error optimizing panel layout: {str(e)}"}
     
-    async def analyze_image(self, image_base64: str, prompt: str) -> str:
+    async def analyze_image(self, image_base64: str, prompt: str, mime_type: str = "image/png") -> str:
         """
         Analyze a base64 encoded screenshot using a vision-capable model.
         """
@@ -183,14 +230,14 @@ class OpenAIService:
 
         def _call() -> str:
             try:
-                response = openai.chat.completions.create(
+                response = self.client.chat.completions.create(
                     model="gpt-4o-mini",
                     messages=[
                         {
                             "role": "user",
                             "content": [
                                 {"type": "text", "text": prompt},
-                                {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_base64}"}}
+                                {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{image_base64}"}}
                             ],
                         }
                     ],
@@ -199,7 +246,7 @@ class OpenAIService:
                 )
                 return response.choices[0].message.content.strip()
             except Exception as exc:  # pragma: no cover - network dependent
-                logger.error(f"Error analyzing image: {exc}")
+                logger.error("Error analyzing image: %s", exc)
                 raise
 
         return await asyncio.to_thread(_call)
@@ -216,7 +263,7 @@ class OpenAIService:
         """
         try:
             # the newest OpenAI model is "gpt-4o" which was released May 13, 2024. do not change this unless explicitly requested by the user
-            response = openai.chat.completions.create(
+            response = self.client.chat.completions.create(
                 model="gpt-4o",
                 messages=[
                     {"role": "system", "content": 
@@ -242,7 +289,7 @@ class OpenAIService:
             return response.choices[0].message.content.strip()
             
         except Exception as e:
-            logger.error(f"Error in analyze_qc_data: {str(e)}")
+            logger.error("Error in analyze_qc_data: %s", e)
             return f"Error analyzing QC data: {str(e)}"
     
     def generate_project_recommendations(self, project_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -260,7 +307,7 @@ class OpenAIService:
             project_data_json = json.dumps(project_data)
             
             # the newest OpenAI model is "gpt-4o" which was released May 13, 2024. do not change this unless explicitly requested by the user
-            response = openai.chat.completions.create(
+            response = self.client.chat.completions.create(
                 model="gpt-4o",
                 messages=[
                     {"role": "system", "content": 
@@ -294,11 +341,11 @@ class OpenAIService:
                 result_json = json.loads(result_text)
                 return result_json
             except json.JSONDecodeError:
-                logger.error(f"Failed to parse JSON from OpenAI response: {result_text}")
+                logger.error("Failed to parse JSON from OpenAI response: %s", result_text)
                 return {"error": "Invalid JSON response from recommendations", "text": result_text}
             
         except Exception as e:
-            logger.error(f"Error in generate_project_recommendations: {str(e)}")
+            logger.error("Error in generate_project_recommendations: %s", e)
             return {"error": f"Error generating recommendations: {str(e)}"}
     
     async def extract_asbuilt_form_fields(self, image_base64: str, form_type: str, project_id: str = None) -> Dict[str, Any]:
@@ -560,7 +607,7 @@ If a field is not visible or unclear, set it to null. Return valid JSON only."""
         
         def _call() -> Dict[str, Any]:
             try:
-                response = openai.chat.completions.create(
+                response = self.client.chat.completions.create(
                     model="gpt-4o",
                     messages=[
                         {
@@ -590,14 +637,15 @@ IMPORTANT ID FORMAT RULES:
                 result_text = response.choices[0].message.content.strip()
                 
                 # Log raw AI response for debugging
-                logger.info(f"[extract_asbuilt_form_fields] Raw AI response for form_type={form_type}: {result_text[:500]}")
+                logger.info("[extract_asbuilt_form_fields] Raw AI response for form_type=%s: %s", form_type, result_text[:500])
                 
                 # Parse JSON response
                 try:
                     result_json = json.loads(result_text)
                     
                     # Log parsed JSON for debugging
-                    logger.info(f"[extract_asbuilt_form_fields] Parsed JSON: {json.dumps(result_json, indent=2)}")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("[extract_asbuilt_form_fields] Parsed JSON: %s", json.dumps(result_json, indent=2))
                     
                     # Post-process: Validate and normalize ID formats
                     import re
@@ -612,9 +660,9 @@ IMPORTANT ID FORMAT RULES:
                             # Check if normalized version matches pattern
                             if re.match(r'^[Rr]-\d+$', normalized, re.IGNORECASE):
                                 result_json['repairId'] = normalized.upper()
-                                logger.info(f"Normalized repair ID: '{repair_id}' -> '{normalized.upper()}'")
+                                logger.info("Normalized repair ID: '%s' -> '%s'", repair_id, normalized.upper())
                             else:
-                                logger.warning(f"Repair ID '{repair_id}' does not match R-{{number}} format, setting to null")
+                                logger.warning("Repair ID '%s' does not match R-{number} format, setting to null", repair_id)
                                 result_json['repairId'] = None
                     
                     # Validate and normalize sample IDs (D-{number} format)
@@ -627,26 +675,19 @@ IMPORTANT ID FORMAT RULES:
                             # Check if normalized version matches pattern
                             if re.match(r'^[Dd]-\d+$', normalized, re.IGNORECASE):
                                 result_json['sampleId'] = normalized.upper()
-                                logger.info(f"Normalized sample ID: '{sample_id}' -> '{normalized.upper()}'")
+                                logger.info("Normalized sample ID: '%s' -> '%s'", sample_id, normalized.upper())
                             else:
-                                logger.warning(f"Sample ID '{sample_id}' does not match D-{{number}} format, setting to null")
+                                logger.warning("Sample ID '%s' does not match D-{number} format, setting to null", sample_id)
                                 result_json['sampleId'] = None
                     
                     return result_json
                 except json.JSONDecodeError as e:
-                    logger.error(f"JSON decode error in extract_asbuilt_form_fields: {str(e)}")
-                    logger.error(f"Response text: {result_text[:500]}")
+                    logger.error("JSON decode error in extract_asbuilt_form_fields: %s", e)
+                    logger.error("Response text: %s", result_text[:500])
                     # Try to extract JSON from text
-                    import re
-                    match = re.search(r'\{[\s\S]*\}', result_text)
-                    if match:
-                        try:
-                            return json.loads(match.group(0))
-                        except json.JSONDecodeError:
-                            pass
-                    return {}
+                    return extract_json_object(result_text) or {}
             except Exception as e:
-                logger.error(f"Error in OpenAI API call for form extraction: {str(e)}")
+                logger.error("Error in OpenAI API call for form extraction: %s", e)
                 raise
         
         return await asyncio.to_thread(_call)
@@ -681,30 +722,31 @@ IMPORTANT ID FORMAT RULES:
                 "conflicts": []
             }
         
-        try:
-            # Prepare form data summary for AI analysis
-            form_summary = []
-            for form in forms_data:
-                mapped_data = form.get('mapped_data', {})
-                if isinstance(mapped_data, str):
-                    mapped_data = json.loads(mapped_data)
+        def _call() -> Dict[str, Any]:
+            try:
+                # Prepare form data summary for AI analysis
+                form_summary = []
+                for form in forms_data:
+                    mapped_data = form.get('mapped_data', {})
+                    if isinstance(mapped_data, str):
+                        mapped_data = json.loads(mapped_data)
+                    
+                    form_summary.append({
+                        "domain": form.get('domain'),
+                        "panelNumber": mapped_data.get('panelNumber') or mapped_data.get('panelNumbers'),
+                        "date": mapped_data.get('date') or mapped_data.get('dateTime'),
+                        "location": mapped_data.get('locationNote') or mapped_data.get('location'),
+                        "repairId": mapped_data.get('repairId'),
+                        "formId": form.get('id')
+                    })
                 
-                form_summary.append({
-                    "domain": form.get('domain'),
-                    "panelNumber": mapped_data.get('panelNumber') or mapped_data.get('panelNumbers'),
-                    "date": mapped_data.get('date') or mapped_data.get('dateTime'),
-                    "location": mapped_data.get('locationNote') or mapped_data.get('location'),
-                    "repairId": mapped_data.get('repairId'),
-                    "formId": form.get('id')
-                })
-            
-            # Use GPT-4o to analyze forms and generate panel creation strategy
-            response = openai.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """You are an expert geosynthetic panel layout designer. Your role is to analyze form data and generate intelligent creation instructions for panels, patches, and destructive tests.
+                # Use GPT-4o to analyze forms and generate panel creation strategy
+                response = self.client.chat.completions.create(
+                    model="gpt-4o",
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": """You are an expert geosynthetic panel layout designer. Your role is to analyze form data and generate intelligent creation instructions for panels, patches, and destructive tests.
 
 The system has three separate types:
 1. **Panels** - Standard panels (rectangles or right-triangles) created in the Panels tab
@@ -727,10 +769,10 @@ Return a JSON object with:
 - repairs: Array of repair records to associate with panels
 - recommendations: Array of optimization recommendations
 - conflicts: Array of detected conflicts or issues"""
-                    },
-                    {
-                        "role": "user",
-                        "content": f"""Analyze these forms and generate panel creation instructions:
+                        },
+                        {
+                            "role": "user",
+                            "content": f"""Analyze these forms and generate panel creation instructions:
 
 Forms Data:
 {json.dumps(form_summary, indent=2)}
@@ -740,41 +782,41 @@ Project ID: {project_id or 'N/A'}
 Generate intelligent creation instructions that:
 1. Create panels from panel_placement forms (use Panels tab)
 2. Create patches from repairs forms if repair type indicates patch (use Patches tab, always label as "Patch")
-3. Create destructive tests from destructive forms (use Destructive Tests tab, format: D-{number})
+3. Create destructive tests from destructive forms (use Destructive Tests tab, format: D-{{number}})
 4. Associate repairs with correct panels based on panelNumbers
 5. Optimize positioning to avoid overlaps
 6. Handle duplicate panel/patch/test numbers appropriately
 7. Provide recommendations for layout improvements
 
 Return valid JSON only."""
-                    }
-                ],
-                max_tokens=4000,
-                temperature=0.3,
-                response_format={"type": "json_object"}
-            )
-            
-            result_text = response.choices[0].message.content.strip()
-            result_json = json.loads(result_text)
-            
-            logger.info(f"Generated panel creation instructions: {len(result_json.get('panels', []))} panels, {len(result_json.get('repairs', []))} repairs")
-            
-            return result_json
+                        }
+                    ],
+                    max_tokens=4000,
+                    temperature=0.3,
+                    response_format={"type": "json_object"}
+                )
+                
+                result_text = response.choices[0].message.content.strip()
+                result_json = json.loads(result_text)
+                
+                logger.info("Generated panel creation instructions: %s panels, %s repairs", len(result_json.get('panels', [])), len(result_json.get('repairs', [])))
+                
+                return result_json
+                
+            except json.JSONDecodeError as e:
+                logger.error("JSON decode error in create_panels_from_forms: %s", e)
+                logger.error("Response text: %s", result_text[:500])
+                # Return basic structure on error
+                return {
+                    "panels": [],
+                    "repairs": [],
+                    "recommendations": [],
+                    "conflicts": [{"error": "Failed to parse AI response"}]
+                }
+            except Exception as e:
+                logger.error("Error in create_panels_from_forms: %s", e)
+                raise
             
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error in create_panels_from_forms: {str(e)}")
-            logger.error(f"Response text: {result_text[:500]}")
-            # Return basic structure on error
-            return {
-                "panels": [],
-                "repairs": [],
-                "recommendations": [],
-                "conflicts": [{"error": "Failed to parse AI response"}]
-            }
-        except Exception as e:
-            logger.error(f"Error in create_panels_from_forms: {str(e)}")
-            raise
-        
         return await asyncio.to_thread(_call)
     
     async def detect_defects_in_image(self, image_base64: str, project_id: str = None) -> Dict[str, Any]:
@@ -846,7 +888,7 @@ IMPORTANT:
 
         def _call() -> Dict[str, Any]:
             try:
-                response = openai.chat.completions.create(
+                response = self.client.chat.completions.create(
                     model="gpt-4o",
                     messages=[
                         {
@@ -873,15 +915,11 @@ IMPORTANT:
                     result_json = json.loads(result_text)
                     return result_json
                 except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse JSON from defect detection: {result_text}")
+                    logger.error("Failed to parse JSON from defect detection: %s", result_text)
                     # Fallback: try to extract JSON from text if wrapped
-                    import re
-                    json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
-                    if json_match:
-                        try:
-                            return json.loads(json_match.group())
-                        except:
-                            pass
+                    json_object = extract_json_object(result_text)
+                    if json_object is not None:
+                        return json_object
                     return {
                         "error": "Invalid JSON response from defect detection",
                         "raw_response": result_text,
@@ -889,7 +927,7 @@ IMPORTANT:
                     }
                     
             except Exception as exc:
-                logger.error(f"Error detecting defects: {exc}")
+                logger.error("Error detecting defects: %s", exc)
                 raise
 
         return await asyncio.to_thread(_call)
\ No newline at end of file
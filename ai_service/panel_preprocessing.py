@@ -0,0 +1,125 @@
+"""
+Panel pre-processing helpers for the optimization endpoints.
+Validates panel geometry in bulk before it is handed to the AI layer.
+"""
+
+import math
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Column order of the structure-of-arrays panel representation
+PANEL_FIELDS = ('x', 'y', 'width', 'height')
+
+
+def _as_float(value: Any) -> float:
+    """Coerce a JSON value to float, mapping anything unusable to NaN"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _dimension(panel: Dict[str, Any], *keys: str) -> Any:
+    """Return the first of `keys` that is set on the panel, or None"""
+    for key in keys:
+        if panel.get(key) is not None:
+            return panel[key]
+    return None
+
+
+def panels_to_array(panels: List[Dict[str, Any]]) -> np.ndarray:
+    """
+    Convert a list of panel dictionaries to an (N, 4) float32 array of x, y, width, height.
+
+    Height falls back to `length`, the key the backend panel optimizer uses.
+    Missing x/y default to 0 (the optimizer assigns positions); missing or
+    non-numeric width/height become NaN.
+    """
+    coords = np.empty((len(panels), len(PANEL_FIELDS)), dtype=np.float32)
+    for i, panel in enumerate(panels):
+        if not isinstance(panel, dict):
+            coords[i] = math.nan
+            continue
+        coords[i, 0] = _as_float(panel.get('x', 0))
+        coords[i, 1] = _as_float(panel.get('y', 0))
+        coords[i, 2] = _as_float(_dimension(panel, 'width'))
+        coords[i, 3] = _as_float(_dimension(panel, 'height', 'length'))
+    return coords
+
+
+def _sized_mask(panels: List[Dict[str, Any]]) -> np.ndarray:
+    """(N, 2) bool array: whether each panel sets a width and a height (or length)"""
+    sized = np.ones((len(panels), 2), dtype=bool)
+    for i, panel in enumerate(panels):
+        if isinstance(panel, dict):
+            sized[i, 0] = _dimension(panel, 'width') is not None
+            sized[i, 1] = _dimension(panel, 'height', 'length') is not None
+    return sized
+
+
+def find_invalid_panels(panels: List[Dict[str, Any]], site_config: Optional[Dict[str, Any]] = None) -> List[int]:
+    """
+    Return the indices of panels with unusable geometry.
+
+    A panel is invalid when x or y is non-finite, a width or height it sets is
+    not a positive number, or it extends past the site `width`/`length` in
+    site_config. Panels without dimensions are left for the optimizer to size,
+    and site dimensions that are not plain numbers (e.g. "5acre") are not checked.
+    """
+    if not panels:
+        return []
+
+    coords = panels_to_array(panels)
+    x, y, width, height = coords.T
+    sized_width, sized_height = _sized_mask(panels).T
+
+    valid = np.logical_and.reduce((
+        np.isfinite(x),
+        np.isfinite(y),
+        ~sized_width | (np.isfinite(width) & (width > 0)),
+        ~sized_height | (np.isfinite(height) & (height > 0)),
+    ))
+
+    # NaN (unsized) extents compare False, so only x/y are checked for those panels
+    site_config = site_config or {}
+    site_width = _as_float(site_config.get('width'))
+    site_length = _as_float(site_config.get('length'))
+    if math.isfinite(site_width) and site_width > 0:
+        valid &= (x >= 0) & (x <= site_width) & ~((x + width) > site_width)
+    if math.isfinite(site_length) and site_length > 0:
+        valid &= (y >= 0) & (y <= site_length) & ~((y + height) > site_length)
+
+    invalid = np.flatnonzero(~valid).tolist()
+    if invalid:
+        logger.debug("Panel validation rejected %d of %d panels", len(invalid), len(panels))
+    return invalid
+
+
+def items_to_points(items: List[Dict[str, Any]]) -> np.ndarray:
+    """Convert layout items to an (N, 2) float64 array of x, y (missing -> 0, unusable -> NaN)"""
+    points = np.empty((len(items), 2), dtype=np.float64)
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            points[i] = math.nan
+            continue
+        points[i, 0] = _as_float(item.get('x', 0))
+        points[i, 1] = _as_float(item.get('y', 0))
+    return points
+
+
+def find_nearby_items(x: float, y: float, items: List[Dict[str, Any]], tolerance: float = 50.0) -> List[int]:
+    """
+    Return the indices of items whose x and y are both within `tolerance` of (x, y).
+
+    Items with non-numeric coordinates never match.
+    """
+    if not items:
+        return []
+
+    points = items_to_points(items)
+    near = (np.abs(points[:, 0] - x) < tolerance) & (np.abs(points[:, 1] - y) < tolerance)
+    return np.flatnonzero(near).tolist()
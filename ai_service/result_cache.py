@@ -0,0 +1,211 @@
+"""
+Persistent result cache for idempotent AI endpoints.
+Backed by diskcache so entries are shared across gunicorn workers and survive restarts.
+Also spools oversized response bodies to disk so they can be served with sendfile,
+and provides an embedding-keyed semantic cache for chat completions.
+"""
+
+import os
+import re
+import time
+import uuid
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    from diskcache import Cache
+except ImportError:
+    Cache = None
+    logger.warning("⚠️ diskcache not installed - extraction results will not be cached")
+
+EXTRACT_CACHE_DIR = os.getenv(
+    "EXTRACT_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "ai_service", "extract")
+)
+EXTRACT_CACHE_SIZE_LIMIT = int(os.getenv("EXTRACT_CACHE_SIZE_LIMIT", str(2 << 30)))
+
+_HASH_CHUNK_SIZE = 1 << 20
+
+# Global extraction cache instance
+_extract_cache = None
+
+def get_extract_cache():
+    """Get the global extraction cache, or None when caching is unavailable"""
+    global _extract_cache
+    if _extract_cache is None and Cache is not None and os.getenv("EXTRACT_CACHE_ENABLED", "true").lower() == "true":
+        try:
+            _extract_cache = Cache(EXTRACT_CACHE_DIR, size_limit=EXTRACT_CACHE_SIZE_LIMIT)
+        except Exception as e:
+            logger.warning("⚠️ Could not open extraction cache at %s: %s", EXTRACT_CACHE_DIR, e)
+            return None
+    return _extract_cache
+
+def file_digest(path: str) -> Optional[str]:
+    """SHA-256 of a file's contents, or None if it cannot be read"""
+    try:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    except OSError:
+        return None
+
+def extract_cache_key(document_path: str, extraction_type: str, user_tier: str, use_hybrid: bool) -> Optional[str]:
+    """Cache key for an extraction request; keyed on file contents so renamed copies still hit"""
+    digest = file_digest(document_path)
+    if digest is None:
+        return None
+    file_ext = os.path.splitext(document_path)[1].lower()
+    return f"extract:{extraction_type}:{user_tier}:{int(bool(use_hybrid))}:{file_ext}:{digest}"
+
+# Response bodies above this size are written to DOWNLOAD_DIR and returned by URL
+DOWNLOAD_DIR = os.getenv(
+    "DOWNLOAD_DIR",
+    os.path.join(tempfile.gettempdir(), "ai_service", "downloads")
+)
+DOWNLOAD_THRESHOLD = int(os.getenv("DOWNLOAD_THRESHOLD_BYTES", str(256 * 1024)))
+DOWNLOAD_TTL = int(os.getenv("DOWNLOAD_TTL_SECONDS", "3600"))
+
+def _prune_downloads(now: float):
+    """Remove spooled downloads older than DOWNLOAD_TTL"""
+    try:
+        with os.scandir(DOWNLOAD_DIR) as entries:
+            for entry in entries:
+                if entry.is_file() and now - entry.stat().st_mtime > DOWNLOAD_TTL:
+                    os.unlink(entry.path)
+    except OSError as e:
+        logger.debug("Download pruning skipped: %s", e)
+
+def spool_download(body: bytes) -> Optional[str]:
+    """
+    Write a large JSON response body to DOWNLOAD_DIR.
+    
+    Returns the generated file name, or None when the body is under the
+    threshold or could not be written (callers then send it inline).
+    """
+    if len(body) <= DOWNLOAD_THRESHOLD:
+        return None
+    try:
+        os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+        _prune_downloads(time.time())
+        name = f"{uuid.uuid4().hex}.json"
+        with open(os.path.join(DOWNLOAD_DIR, name), 'wb') as f:
+            f.write(body)
+        return name
+    except OSError as e:
+        logger.warning("⚠️ Could not spool large response to %s: %s", DOWNLOAD_DIR, e)
+        return None
+
+
+class SemanticCache:
+    """
+    Embedding-keyed response cache for near-duplicate prompts.
+    
+    Entries live in per-namespace ring buffers of unit-normalized embeddings;
+    a lookup is one matrix-vector product (equivalent to a flat inner-product
+    index) and hits when cosine similarity reaches `threshold`. Exact repeats
+    of a normalized prompt are answered without calling the embedder at all.
+    """
+    
+    _WHITESPACE = re.compile(r"\s+")
+    
+    def __init__(self, embed_fn: Callable[[str], List[float]], threshold: float = 0.92,
+                 max_entries: int = 256, ttl: float = 300.0):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._spaces: Dict[Hashable, Dict[str, Any]] = {}
+    
+    @classmethod
+    def normalize(cls, text: str) -> str:
+        """Case- and whitespace-insensitive form of a prompt"""
+        return cls._WHITESPACE.sub(" ", text).strip().lower()
+    
+    def _new_space(self, dim: int) -> Dict[str, Any]:
+        return {
+            "vectors": np.zeros((self.max_entries, dim), dtype=np.float32),
+            "expires": np.zeros(self.max_entries, dtype=np.float64),
+            "values": [None] * self.max_entries,
+            "texts": [None] * self.max_entries,
+            "exact": {},
+            "next": 0,
+        }
+    
+    def lookup(self, namespace: Hashable, text: str) -> Tuple[Optional[Any], Optional[np.ndarray]]:
+        """
+        Find a cached value for a prompt.
+        
+        Returns (value, embedding); value is None on a miss. The embedding is
+        returned so a following put() does not embed the prompt twice.
+        """
+        key = self.normalize(text)
+        now = time.time()
+        with self._lock:
+            space = self._spaces.get(namespace)
+            if space is not None:
+                slot = space["exact"].get(key)
+                if slot is not None and space["expires"][slot] > now:
+                    return space["values"][slot], None
+        
+        try:
+            vector = np.asarray(self.embed_fn(key), dtype=np.float32)
+            vector /= (np.linalg.norm(vector) or 1.0)
+        except Exception as e:
+            logger.debug("Semantic cache embedding failed, treating as miss: %s", e)
+            return None, None
+        
+        with self._lock:
+            space = self._spaces.get(namespace)
+            if space is None or space["vectors"].shape[1] != vector.shape[0]:
+                return None, vector
+            scores = space["vectors"] @ vector
+            scores[space["expires"] <= now] = -1.0
+            slot = int(np.argmax(scores))
+            if scores[slot] >= self.threshold:
+                return space["values"][slot], vector
+        return None, vector
+    
+    def put(self, namespace: Hashable, text: str, value: Any, vector: Optional[np.ndarray] = None):
+        """Store a value for a prompt, evicting the oldest entry in the namespace when full"""
+        key = self.normalize(text)
+        if vector is None:
+            try:
+                vector = np.asarray(self.embed_fn(key), dtype=np.float32)
+                vector /= (np.linalg.norm(vector) or 1.0)
+            except Exception as e:
+                logger.debug("Semantic cache embedding failed, not caching: %s", e)
+                return
+        
+        with self._lock:
+            space = self._spaces.get(namespace)
+            if space is None or space["vectors"].shape[1] != vector.shape[0]:
+                space = self._spaces[namespace] = self._new_space(vector.shape[0])
+            slot = space["next"]
+            space["next"] = (slot + 1) % self.max_entries
+            old_text = space["texts"][slot]
+            if old_text is not None and space["exact"].get(old_text) == slot:
+                del space["exact"][old_text]
+            space["vectors"][slot] = vector
+            space["expires"][slot] = time.time() + self.ttl
+            space["values"][slot] = value
+            space["texts"][slot] = key
+            space["exact"][key] = slot
+    
+    def invalidate(self, project_id: Optional[Hashable] = None):
+        """Drop every namespace for a project (namespaces are tuples starting with project_id), or everything"""
+        with self._lock:
+            if project_id is None:
+                self._spaces.clear()
+                return
+            for namespace in [ns for ns in self._spaces if isinstance(ns, tuple) and ns and ns[0] == project_id]:
+                del self._spaces[namespace]
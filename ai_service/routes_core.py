@@ -0,0 +1,259 @@
+"""
+Core document and panel endpoints shared by every AI service entry point.
+Also owns the OpenAI/document-processing service instances the app reuses.
+"""
+
+import os
+import logging
+import threading
+
+from flask import Blueprint, Response, jsonify, request, send_from_directory
+
+from integration_layer import run_async, request_coalescer
+from panel_preprocessing import find_invalid_panels
+from utils import validate_json, stream_json
+from result_cache import get_extract_cache, extract_cache_key, spool_download, DOWNLOAD_DIR
+
+logger = logging.getLogger(__name__)
+
+core_bp = Blueprint('core', __name__)
+
+# Services are created on the first request that needs them (see init_services) so
+# worker start-up and /health never pull in the OpenAI/PyMuPDF/CrewAI import chain
+openai_service = None
+document_processor = None
+ai_integration = None
+
+_services_ready = False
+_services_lock = threading.Lock()
+
+# Endpoints that must stay cheap and never trigger service initialization
+LIGHTWEIGHT_ENDPOINTS = frozenset({'health_check', 'list_routes', 'static', 'core.download_result'})
+
+def services_ready() -> bool:
+    """Whether init_services has completed in this process"""
+    return _services_ready
+
+def init_services():
+    """Initialize the OpenAI, document-processing and hybrid AI services once per process"""
+    global openai_service, document_processor, ai_integration, _services_ready
+    if _services_ready:
+        return
+    with _services_lock:
+        if _services_ready:
+            return
+        from document_processor import DocumentProcessor
+        from openai_service import OpenAIService
+        from integration_layer import get_ai_integration
+        
+        openai_service = OpenAIService(api_key=os.getenv("OPENAI_API_KEY"))
+        document_processor = DocumentProcessor(openai_service)
+        ai_integration = get_ai_integration()
+        _services_ready = True
+
+def ensure_services():
+    """before_request hook: initialize services for every endpoint except the lightweight ones"""
+    if request.endpoint not in LIGHTWEIGHT_ENDPOINTS:
+        init_services()
+
+def _hybrid_or_fallback(hybrid_coro_factory, fallback_callable, use_hybrid, label):
+    """
+    Run the hybrid AI path when requested and available, otherwise the OpenAI fallback
+    
+    Args:
+        hybrid_coro_factory: Zero-arg callable returning the hybrid coroutine
+        fallback_callable: Zero-arg callable producing the OpenAI fallback result
+        use_hybrid: Whether the caller asked for (and can use) the hybrid path
+        label: Operation name used in fallback log messages
+        
+    Returns:
+        Tuple of (result, 'hybrid_ai' | 'openai_fallback')
+    """
+    if use_hybrid and ai_integration.is_hybrid_ai_available():
+        try:
+            hybrid_result = run_async(hybrid_coro_factory())
+            
+            if 'error' not in hybrid_result:
+                return hybrid_result, 'hybrid_ai'
+            logger.warning("Hybrid AI failed, falling back to OpenAI: %s", hybrid_result['error'])
+        
+        except Exception as e:
+            logger.warning("Hybrid AI %s failed, falling back to OpenAI: %s", label, e)
+    
+    return fallback_callable(), 'openai_fallback'
+
+def _body_response(body: bytes, user_tier: str):
+    """Send a serialized JSON body inline, or spool it to disk and return its download URL when large"""
+    name = spool_download(body)
+    if name is None:
+        return Response(body, mimetype='application/json'), 200
+    return jsonify({
+        'result_url': f'/downloads/{name}',
+        'content_length': len(body),
+        'user_tier': user_tier
+    }), 200
+
+@core_bp.route('/analyze', methods=['POST'])
+@validate_json(required_keys=('documents',), error='No documents provided', defaults={
+    'question': 'Provide a comprehensive analysis of these documents',
+    'user_id': 'default',
+    'user_tier': 'paid_user',
+    'use_hybrid': True
+}, types={'documents': list, 'question': str})
+def analyze_documents(data):
+    """Analyze documents with AI - now supports hybrid AI architecture"""
+    try:
+        documents = data['documents']
+        question = data['question']
+        user_id = data['user_id']
+        user_tier = data['user_tier']
+        use_hybrid = data['use_hybrid']
+        
+        logger.info("Analyzing %s documents with question: %s", len(documents), question)
+        logger.info("User: %s, Tier: %s, Hybrid: %s", user_id, user_tier, use_hybrid)
+        
+        doc_paths = [doc['path'] for doc in documents if 'path' in doc and os.path.exists(doc['path'])]
+        
+        # Identical analyses already in flight for the same user share one upstream model call
+        result, analysis_type = request_coalescer.run(
+            ('analyze', user_id, tuple(doc_paths), question, user_tier, bool(use_hybrid)),
+            user_tier,
+            lambda: _hybrid_or_fallback(
+                lambda: ai_integration.analyze_documents_hybrid(
+                    documents=doc_paths,
+                    question=question,
+                    user_id=user_id,
+                    user_tier=user_tier
+                ),
+                lambda: document_processor.analyze_documents(doc_paths, question=question),
+                use_hybrid=use_hybrid and bool(doc_paths),
+                label='analysis'
+            )
+        )
+        
+        return stream_json({
+            'analysis_type': analysis_type,
+            'result': result,
+            'user_tier': user_tier
+        })
+    
+    except Exception as e:
+        logger.exception("Error analyzing documents: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@core_bp.route('/extract', methods=['POST'])
+@validate_json(required_keys=('document_path',), error='Document path required', defaults={
+    'extraction_type': 'qc_data',
+    'user_id': 'default',
+    'user_tier': 'paid_user',
+    'use_hybrid': True
+}, types={'document_path': str, 'extraction_type': str})
+def extract_data(data):
+    """Extract structured data from documents"""
+    try:
+        document_path = data['document_path']
+        extraction_type = data['extraction_type']
+        user_id = data['user_id']
+        user_tier = data['user_tier']
+        use_hybrid = data['use_hybrid']
+        
+        logger.info("Extracting %s from document: %s", extraction_type, document_path)
+        logger.info("User: %s, Tier: %s, Hybrid: %s", user_id, user_tier, use_hybrid)
+        
+        # Extraction is idempotent per document contents, so serve repeats from the disk cache
+        extract_cache = get_extract_cache()
+        cache_key = None
+        if extract_cache is not None:
+            cache_key = extract_cache_key(document_path, extraction_type, user_tier, use_hybrid)
+            cached = extract_cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                logger.info("Extraction cache hit for %s", document_path)
+                return _body_response(cached, user_tier)
+        
+        # Identical extractions already in flight for the same user share one upstream model call
+        result, source = request_coalescer.run(
+            ('extract', user_id, document_path, extraction_type, user_tier, bool(use_hybrid)),
+            user_tier,
+            lambda: _hybrid_or_fallback(
+                lambda: ai_integration.analyze_documents_hybrid(
+                    documents=[document_path],
+                    question=f"Extract {extraction_type} data from this document",
+                    user_id=user_id,
+                    user_tier=user_tier
+                ),
+                lambda: document_processor.extract_data(document_path, extraction_type=extraction_type),
+                use_hybrid=use_hybrid,
+                label='extraction'
+            )
+        )
+        
+        body = jsonify({
+            'extraction_type': source,
+            'result': result,
+            'user_tier': user_tier
+        }).get_data()
+        
+        if cache_key and not (isinstance(result, dict) and 'error' in result):
+            extract_cache.set(cache_key, body)
+        
+        return _body_response(body, user_tier)
+    
+    except Exception as e:
+        logger.exception("Error extracting data: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@core_bp.route('/optimize-panels', methods=['POST'])
+@validate_json(required_keys=('panels',), error='Panel data required', defaults={
+    'strategy': 'balanced',
+    'site_config': {},
+    'user_id': 'default',
+    'user_tier': 'paid_user',
+    'use_hybrid': True
+}, types={'panels': list, 'site_config': dict, 'strategy': str})
+def optimize_panels(data):
+    """Optimize panel layout using AI - now supports hybrid AI architecture"""
+    try:
+        panels = data['panels']
+        strategy = data['strategy']
+        site_config = data['site_config']
+        user_id = data['user_id']
+        user_tier = data['user_tier']
+        use_hybrid = data['use_hybrid']
+        
+        invalid_panels = find_invalid_panels(panels, site_config)
+        if invalid_panels:
+            return jsonify({
+                'error': 'Invalid panel geometry',
+                'invalid_panels': invalid_panels
+            }), 400
+        
+        logger.info("Optimizing %s panels with %s strategy", len(panels), strategy)
+        logger.info("User: %s, Tier: %s, Hybrid: %s", user_id, user_tier, use_hybrid)
+        
+        result, source = _hybrid_or_fallback(
+            lambda: ai_integration.optimize_panels_hybrid(
+                panels=panels,
+                strategy=strategy,
+                site_config=site_config,
+                user_id=user_id,
+                user_tier=user_tier
+            ),
+            lambda: openai_service.optimize_panel_layout(panels, strategy=strategy, site_config=site_config),
+            use_hybrid=use_hybrid,
+            label='optimization'
+        )
+        
+        return jsonify({
+            'optimization_type': source,
+            'result': result,
+            'user_tier': user_tier
+        }), 200
+    
+    except Exception as e:
+        logger.exception("Error optimizing panels: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@core_bp.route('/downloads/<name>', methods=['GET'])
+def download_result(name):
+    """Serve a spooled response body; send_file hands the bytes to the server's sendfile path"""
+    return send_from_directory(DOWNLOAD_DIR, name, mimetype='application/json', conditional=True)
@@ -9,27 +9,11 @@ import sys
 import logging
 from pathlib import Path
 
-# Load .env file from parent directory (project root) BEFORE reading environment variables
-try:
-    from dotenv import load_dotenv
-    # Get the parent directory (project root) where .env file is located
-    current_file = Path(__file__).resolve()
-    project_root = current_file.parent.parent  # Go up from ai_service/ to project root
-    env_path = project_root / '.env'
-    if env_path.exists():
-        load_dotenv(dotenv_path=env_path)
-        print(f"✅ Loaded .env file from {env_path}")
-    else:
-        print(f"⚠️ .env file not found at {env_path}")
-except ImportError:
-    print("⚠️ python-dotenv not installed. Install with: pip install python-dotenv")
-except Exception as e:
-    print(f"⚠️ Error loading .env file: {e}")
-
 # Add the current directory to Python path
 current_dir = Path(__file__).parent
 sys.path.insert(0, str(current_dir))
 
+import bootstrap  # noqa: F401  (loads .env and pins LiteLLM model variables)
 from config import config
 from app import app
 
@@ -157,11 +141,13 @@ def main():
         logger.info("=" * 50)
         
         # Start the Flask service
+        logger.warning("⚠️ Running the Flask development server - for production use: gunicorn -c gunicorn_conf.py wsgi:app")
         logger.info(f"🚀 Starting Flask service on {config.SERVICE_HOST}:{config.SERVICE_PORT}...")
         app.run(
             host=config.SERVICE_HOST,
             port=config.SERVICE_PORT,
-            debug=config.DEBUG_MODE
+            debug=config.DEBUG_MODE,
+            threaded=True
         )
     except KeyboardInterrupt:
         logger.info("🛑 Service stopped by user")
@@ -0,0 +1,75 @@
+import base64
+import io
+import sys
+from pathlib import Path
+
+import pytest
+
+# Ensure the ai_service module directory is importable
+SERVICE_DIR = Path(__file__).resolve().parents[1]
+if str(SERVICE_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVICE_DIR))
+
+import app as app_module  # noqa: E402
+import routes_core  # noqa: E402
+
+
+@pytest.fixture
+def analyzed(monkeypatch):
+    """Test client with the AI call replaced by a recorder of what it was given"""
+    calls = []
+
+    def analyze(image_base64, image_type, project_id):
+        calls.append((image_base64, image_type, project_id))
+        return app_module.jsonify({'success': True, 'panels': []}), 200
+
+    # Skip the OpenAI / hybrid service start-up in the before_request hook
+    monkeypatch.setattr(routes_core, '_services_ready', True)
+    monkeypatch.setattr(app_module, '_analyze_image_panels', analyze)
+    return app_module.app.test_client(), calls
+
+
+def _upload(client, data, filename='photo.png', content_type='image/png', **form):
+    return client.post('/api/ai/analyze-image-multipart', data={
+        'image': (io.BytesIO(data), filename, content_type),
+        **form,
+    }, content_type='multipart/form-data')
+
+
+def test_multipart_image_is_forwarded_as_base64(analyzed):
+    client, calls = analyzed
+
+    response = _upload(client, b'\x89PNG fake', content_type='image/jpeg', project_id='p1')
+
+    assert response.status_code == 200
+    assert calls == [(base64.b64encode(b'\x89PNG fake').decode('ascii'), 'image/jpeg', 'p1')]
+
+
+@pytest.mark.parametrize(
+    'data, content_type, error',
+    [
+        (b'', 'image/png', 'image file is empty'),
+        (b'<svg/>', 'text/html', 'image must be an image/* file'),
+        (b'data', 'application/octet-stream', 'image must be an image/* file'),
+        (b'data', 'image/png,text/html', 'image must be an image/* file'),
+    ],
+)
+def test_unusable_uploads_are_rejected(analyzed, data, content_type, error):
+    client, calls = analyzed
+
+    response = _upload(client, data, content_type=content_type)
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == error
+    assert calls == []
+
+
+def test_missing_image_part_is_rejected(analyzed):
+    client, calls = analyzed
+
+    response = client.post('/api/ai/analyze-image-multipart', data={'project_id': 'p1'},
+                           content_type='multipart/form-data')
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'image file is required'
+    assert calls == []
@@ -0,0 +1,33 @@
+import asyncio
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Ensure the ai_service module directory is importable
+SERVICE_DIR = Path(__file__).resolve().parents[1]
+if str(SERVICE_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVICE_DIR))
+
+import wsgi  # noqa: E402,F401  (the gunicorn entry point must leave run_async usable)
+from integration_layer import get_background_loop, run_async  # noqa: E402
+
+
+async def _loop_thread_id(value):
+    await asyncio.sleep(0.01)
+    return value, threading.get_ident()
+
+
+def test_run_async_runs_on_background_thread_after_importing_wsgi():
+    value, loop_thread = run_async(_loop_thread_id("ok"))
+
+    assert value == "ok"
+    assert loop_thread != threading.get_ident()
+    assert get_background_loop().is_running()
+
+
+def test_run_async_serves_concurrent_request_threads():
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda i: run_async(_loop_thread_id(i))[0], range(32)))
+
+    assert results == list(range(32))
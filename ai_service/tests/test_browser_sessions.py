@@ -0,0 +1,450 @@
+import asyncio
+import base64
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+# Ensure the ai_service module directory is importable
+SERVICE_DIR = Path(__file__).resolve().parents[1]
+if str(SERVICE_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVICE_DIR))
+
+from browser_tools.browser_config import BrowserSecurityConfig  # noqa: E402
+from browser_tools.browser_sessions import BrowserSession  # noqa: E402
+
+
+class FakeEmitter:
+    """Minimal stand-in for Playwright's Page/WebSocket event registration"""
+
+    def __init__(self, url: str = ""):
+        self.url = url
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+
+def _stored_frame_bytes(session: BrowserSession) -> int:
+    return sum(entry.get("size_bytes", 0) for entry in session.websocket_messages)
+
+
+@pytest.fixture
+def session_with_socket():
+    session = BrowserSession(security=BrowserSecurityConfig(max_websocket_messages=4, max_websocket_frame_bytes=16))
+    page = FakeEmitter()
+    asyncio.run(session._setup_realtime_listeners(page, "default"))
+
+    def open_socket() -> FakeEmitter:
+        ws = FakeEmitter("wss://allowed.com/socket")
+        page.handlers["websocket"](ws)
+        return ws
+
+    return session, open_socket
+
+
+def test_websocket_byte_total_matches_stored_frames(session_with_socket):
+    session, open_socket = session_with_socket
+
+    # Connection events share the bounded deque with frames and evict them when it is full
+    for _ in range(4):
+        ws = open_socket()
+        for _ in range(2):
+            ws.handlers["framereceived"]("0123456789")
+            assert session._ws_bytes == _stored_frame_bytes(session)
+
+    assert len(session.websocket_messages) == 4
+    assert session.websocket_messages[-1]["type"] == "websocket_message"
+
+
+def test_text_frames_are_measured_in_utf8_bytes(session_with_socket):
+    session, open_socket = session_with_socket
+    ws = open_socket()
+
+    ws.handlers["framesent"]("héllo")
+    assert session.websocket_messages[-1]["size_bytes"] == 6
+
+    # Truncation is applied to the encoded frame and never splits a character
+    ws.handlers["framesent"]("é" * 20)
+    entry = session.websocket_messages[-1]
+    assert entry["data"].startswith("é" * 8 + "...[truncated")
+    assert entry["size_bytes"] == len(entry["data"].encode("utf-8"))
+    assert session._ws_bytes == _stored_frame_bytes(session)
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.closed_on = None
+
+    def is_connected(self):
+        return self.closed_on is None
+
+    async def close(self):
+        self.closed_on = asyncio.get_running_loop()
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.browsers = []
+        self.stopped_on = None
+        self.chromium = self
+
+    async def launch(self, **_):
+        browser = FakeBrowser()
+        self.browsers.append(browser)
+        return browser
+
+    async def stop(self):
+        self.stopped_on = asyncio.get_running_loop()
+
+
+@pytest.fixture
+def fake_playwright(monkeypatch):
+    from browser_tools import browser_sessions
+
+    started = []
+
+    class Starter:
+        async def start(self):
+            playwright = FakePlaywright()
+            started.append((asyncio.get_running_loop(), playwright))
+            return playwright
+
+    monkeypatch.setattr(browser_sessions, "async_playwright", Starter)
+    return started
+
+
+def test_shutdown_closes_the_browser_of_every_loop(fake_playwright):
+    from browser_tools.browser_sessions import BrowserSessionManager
+
+    manager = BrowserSessionManager()
+    other_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        asyncio.run_coroutine_threadsafe(manager._get_browser(), other_loop).result(timeout=5)
+
+        async def use_and_shutdown():
+            first = await manager._get_browser()
+            assert await manager._get_browser() is first
+            manager._ensure_auth_state_gc()
+            await manager.shutdown()
+            return asyncio.get_running_loop()
+
+        main_loop = asyncio.run(use_and_shutdown())
+
+        assert len(fake_playwright) == 2
+        for loop, playwright in fake_playwright:
+            # Each browser is closed on the loop that launched it
+            assert playwright.browsers[0].closed_on is loop
+            assert playwright.stopped_on is loop
+        assert {loop for loop, _ in fake_playwright} == {other_loop, main_loop}
+        assert manager._browsers == {}
+    finally:
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join(timeout=5)
+        other_loop.close()
+
+
+def test_auth_state_sweep_moves_with_the_loop(fake_playwright):
+    from browser_tools.browser_sessions import BrowserSessionManager
+
+    manager = BrowserSessionManager()
+    other_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        async def start_sweep():
+            manager._ensure_auth_state_gc()
+            return manager._auth_state_gc_task
+
+        first = asyncio.run_coroutine_threadsafe(start_sweep(), other_loop).result(timeout=5)
+
+        async def restart_and_shutdown():
+            second = await start_sweep()
+            assert second is not first
+            await manager.shutdown()
+            await asyncio.wait({second}, timeout=5)
+            return second
+
+        second = asyncio.run(restart_and_shutdown())
+        asyncio.run_coroutine_threadsafe(asyncio.wait({first}, timeout=5), other_loop).result(timeout=10)
+
+        assert first.cancelled()
+        assert second.cancelled()
+    finally:
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join(timeout=5)
+        other_loop.close()
+
+
+def test_tool_calls_from_worker_threads_share_one_browser(fake_playwright):
+    from browser_tools.browser_sessions import BrowserSessionManager, run_browser_task
+    from integration_layer import get_background_loop
+
+    manager = BrowserSessionManager()
+    try:
+        # CrewAI runs each tool call on a worker thread; every call must land on the same loop
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            browsers = list(pool.map(lambda _: run_browser_task(manager._get_browser()), range(8)))
+
+        assert len(fake_playwright) == 1
+        assert fake_playwright[0][0] is get_background_loop()
+        assert all(browser is browsers[0] for browser in browsers)
+    finally:
+        run_browser_task(manager.shutdown())
+
+    assert browsers[0].closed_on is get_background_loop()
+
+
+def _event(event_type, text=""):
+    return {"type": event_type, "text": text}
+
+
+async def _finish(*tasks):
+    """Cancel waiters a failing test left behind (asyncio.run does not under nest_asyncio)"""
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_concurrent_waiters_on_different_types_each_get_their_event():
+    session = BrowserSession(security=BrowserSecurityConfig())
+
+    async def scenario():
+        console = asyncio.create_task(session.wait_for_event("console", None, timeout=5))
+        network = asyncio.create_task(session.wait_for_event(["network_request", "network_response"], None, timeout=5))
+        await asyncio.sleep(0)
+        assert session._waiter_count == 2
+
+        session._record_event(_event("network_response", "GET /api/panels"))
+        session._record_event(_event("console", "layout loaded"))
+        try:
+            return await asyncio.wait_for(asyncio.gather(console, network), timeout=5)
+        finally:
+            await _finish(console, network)
+
+    console_event, network_event = asyncio.run(scenario())
+
+    assert console_event["text"] == "layout loaded"
+    assert network_event["text"] == "GET /api/panels"
+    assert session._waiter_count == 0
+
+
+def test_pattern_matching_serializes_each_event_once():
+    session = BrowserSession(security=BrowserSecurityConfig())
+    session._record_event(_event("console", "loading"))
+    session._record_event(_event("console", "panel 4 saved"))
+    session._record_event(_event("network_request", "panel 4"))
+
+    async def scenario():
+        first = await session.wait_for_event("console", "saved", timeout=1)
+        cached = dict(session._serialized_events)
+        waiter = asyncio.create_task(session.wait_for_event(None, "panel 9", timeout=5))
+        await asyncio.sleep(0)
+        session._record_event(_event("console", "panel 9 saved"))
+        try:
+            return first, cached, await asyncio.wait_for(waiter, timeout=5)
+        finally:
+            await _finish(waiter)
+
+    first, cached, second = asyncio.run(scenario())
+
+    assert first["text"] == "panel 4 saved"
+    # Only console events up to the match were serialized
+    assert set(cached) == {0, 1}
+    assert second["text"] == "panel 9 saved"
+    # The second wait started after the delivered event, so console events 0-1 were not re-serialized
+    assert set(session._serialized_events) == {0, 1, 2, 3}
+    assert session._serialized_events[1] == cached[1]
+
+
+def test_waiter_skips_events_evicted_while_it_slept():
+    session = BrowserSession(security=BrowserSecurityConfig(max_recent_events=3))
+
+    async def scenario():
+        waiter = asyncio.create_task(session.wait_for_event("console", "ready", timeout=5))
+        await asyncio.sleep(0)
+        # Recorded in one burst before the waiter runs again: the first match falls out of the buffer
+        session._record_event(_event("console", "ready 1"))
+        for i in range(3):
+            session._record_event(_event("network_request", f"GET /{i}"))
+        session._record_event(_event("console", "ready 2"))
+        try:
+            return await asyncio.wait_for(waiter, timeout=5)
+        finally:
+            await _finish(waiter)
+
+    event = asyncio.run(scenario())
+
+    assert event["text"] == "ready 2"
+    assert len(session.recent_events) == 3
+    # Cached JSON never outlives the event it was made from
+    first_seq = session._event_seq - len(session.recent_events)
+    assert all(seq >= first_seq for seq in session._serialized_events)
+
+
+def test_wait_times_out_and_releases_its_waiter_slot():
+    session = BrowserSession(security=BrowserSecurityConfig())
+    session._record_event(_event("console", "unrelated"))
+
+    with pytest.raises(TimeoutError, match="Timed out waiting for browser event"):
+        asyncio.run(session.wait_for_event("console", "never", timeout=0.05))
+    with pytest.raises(TimeoutError):
+        asyncio.run(session.wait_for_event("dom_mutation", None, timeout=0))
+
+    assert session._waiter_count == 0
+
+
+def test_events_only_swap_the_signal_while_someone_is_waiting():
+    session = BrowserSession(security=BrowserSecurityConfig())
+    idle_signal = session._event_signal
+
+    session._record_event(_event("console", "no one is listening"))
+    assert session._event_signal is idle_signal
+    assert not idle_signal.is_set()
+
+    async def scenario():
+        waiter = asyncio.create_task(session.wait_for_event("dom_mutation", None, timeout=5))
+        await asyncio.sleep(0)
+        session._record_event(_event("dom_mutation", "added row"))
+        try:
+            return await asyncio.wait_for(waiter, timeout=5)
+        finally:
+            await _finish(waiter)
+
+    assert asyncio.run(scenario())["text"] == "added row"
+    assert idle_signal.is_set()
+    assert session._event_signal is not idle_signal
+    assert not session._event_signal.is_set()
+
+
+def _jwt(**claims):
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).rstrip(b"=").decode()
+    return f"header.{payload}.signature"
+
+
+def test_synthesized_storage_state_matches_what_supabase_js_persists():
+    from browser_tools.browser_sessions import _synthesize_storage_state
+
+    expires_at = int(time.time()) + 3600
+    token = _jwt(exp=expires_at, sub="user-1", email="qc@example.com", role="authenticated")
+
+    state = _synthesize_storage_state(
+        "http://localhost:3000/dashboard/projects?tab=1", "https://abcdref.supabase.co", token, "fallback-id"
+    )
+
+    assert state["cookies"] == []
+    [origin] = state["origins"]
+    assert origin["origin"] == "http://localhost:3000"
+    [entry] = origin["localStorage"]
+    assert entry["name"] == "sb-abcdref-auth-token"
+    session = json.loads(entry["value"])
+    assert session["access_token"] == token
+    assert session["expires_at"] == expires_at
+    assert 3590 <= session["expires_in"] <= 3600
+    assert session["user"]["id"] == "user-1"
+    assert session["user"]["email"] == "qc@example.com"
+
+    # A verified Supabase user replaces the one assembled from the claims
+    user = {"id": "user-1", "email": "verified@example.com"}
+    state = _synthesize_storage_state("https://app.example.com", "https://abcdref.supabase.co", token, "user-1", user)
+    assert json.loads(state["origins"][0]["localStorage"][0]["value"])["user"] == user
+
+    with pytest.raises(ValueError, match="project ref"):
+        _synthesize_storage_state("http://localhost:3000", "not a url", token, "user-1")
+
+
+@pytest.fixture
+def auth_state(monkeypatch, tmp_path):
+    """A manager whose auth state goes through the fast path into tmp_path, with the browser flow stubbed"""
+    from browser_tools import browser_sessions
+    from browser_tools.browser_sessions import BrowserSessionManager, SupabaseConfig
+
+    config = {"value": SupabaseConfig(url="https://abcdref.supabase.co", anon_key="anon")}
+    monkeypatch.setattr(browser_sessions, "AUTH_STATE_FAST_PATH", True)
+    monkeypatch.setattr(browser_sessions, "AUTH_STATE_DIR", tmp_path)
+    monkeypatch.setattr(browser_sessions, "_supabase_config", lambda: config["value"])
+
+    async def no_bundle():
+        return ""
+
+    monkeypatch.setattr(browser_sessions, "_get_supabase_js_bundle", no_bundle)
+
+    manager = BrowserSessionManager()
+    manager.browser_flows = 0
+
+    async def acquire_context(**_):
+        manager.browser_flows += 1
+        raise RuntimeError("no browser in tests")
+
+    manager.acquire_context = acquire_context
+    manager.fetched = []
+
+    def fetch_user(url, anon_key, token):
+        manager.fetched.append(token)
+        return {"id": "user-1", "email": "verified@example.com"}
+
+    monkeypatch.setattr(browser_sessions, "_fetch_supabase_user", fetch_user)
+    return manager, config, tmp_path
+
+
+def _stored_session(path):
+    return json.loads(json.loads(Path(path).read_text())["origins"][0]["localStorage"][0]["value"])
+
+
+def test_fast_path_writes_auth_state_without_a_browser(auth_state):
+    manager, _, state_dir = auth_state
+    token = _jwt(exp=int(time.time()) + 3600, sub="user-1")
+
+    path = asyncio.run(manager._get_or_create_auth_state("user-1", token))
+
+    assert path == str(state_dir / "auth_state_user-1.json")
+    assert _stored_session(path)["user"]["email"] == "verified@example.com"
+    assert manager.fetched == [token]
+    assert manager.browser_flows == 0
+
+
+def test_fast_path_without_anon_key_warns_about_unverified_claims(auth_state, caplog):
+    from browser_tools.browser_sessions import SupabaseConfig
+
+    manager, config, _ = auth_state
+    config["value"] = SupabaseConfig(url="https://abcdref.supabase.co", anon_key=None)
+    token = _jwt(exp=int(time.time()) + 3600, sub="user-1", email="claims@example.com")
+
+    path = asyncio.run(manager._get_or_create_auth_state("user-1", token))
+
+    assert _stored_session(path)["user"]["email"] == "claims@example.com"
+    assert manager.fetched == []
+    assert "unverified token claims" in caplog.text
+
+
+def test_fast_path_failure_falls_back_to_the_browser_flow(auth_state, monkeypatch):
+    from browser_tools import browser_sessions
+
+    manager, _, state_dir = auth_state
+
+    def rejected(url, anon_key, token):
+        raise RuntimeError("401 invalid JWT")
+
+    monkeypatch.setattr(browser_sessions, "_fetch_supabase_user", rejected)
+    token = _jwt(exp=int(time.time()) + 3600, sub="user-1")
+
+    assert asyncio.run(manager._get_or_create_auth_state("user-1", token)) is None
+    assert manager.browser_flows == 1
+    assert list(state_dir.iterdir()) == []
+
+
+def test_expired_token_skips_auth_state_entirely(auth_state):
+    manager, _, state_dir = auth_state
+    # Inside the expiry margin counts as expired
+    token = _jwt(exp=int(time.time()) + 5, sub="user-1")
+
+    assert asyncio.run(manager._get_or_create_auth_state("user-1", token)) is None
+    assert manager.fetched == []
+    assert manager.browser_flows == 0
+    assert list(state_dir.iterdir()) == []
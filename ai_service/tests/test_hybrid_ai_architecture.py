@@ -0,0 +1,118 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Ensure the ai_service module directory is importable
+SERVICE_DIR = Path(__file__).resolve().parents[1]
+if str(SERVICE_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVICE_DIR))
+
+from hybrid_ai_architecture import CostOptimizer, DellSystemAIService, TaskComplexity  # noqa: E402
+
+
+@pytest.fixture
+def optimizer() -> CostOptimizer:
+    return CostOptimizer(redis_client=None)
+
+
+def test_escalation_model_walks_up_the_cascade(optimizer):
+    assert optimizer.escalation_model("gpt-4o-mini") == "gpt-4o"
+    assert optimizer.escalation_model("gpt-4o") is None
+    assert optimizer.escalation_model("claude-3-sonnet") is None
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        "",
+        "Too short.",
+        "Error: the request failed upstream",
+        "I'm not sure which panel you mean, could you clarify?",
+        "  Unfortunately, I cannot see the layout from here.",
+        "I don't have enough information to answer that question.",
+    ],
+)
+def test_unreliable_replies_escalate(optimizer, response):
+    assert optimizer.needs_escalation(response)
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        "Panel 4 is fine; the seam is unclear in photo 2, so re-shoot that one.",
+        "The crew was unable to weld panel 7 yesterday because of rain; it is scheduled for today.",
+        "There are 42 panels in this project, covering 12,600 square feet.",
+    ],
+)
+def test_ordinary_answers_do_not_escalate(optimizer, response):
+    assert not optimizer.needs_escalation(response)
+
+
+class FakeAgent:
+    def __init__(self, response, tool_calls=0):
+        self.response = response
+        self.tool_calls = tool_calls
+        self.runs = 0
+
+    async def execute(self, query, context=None):
+        self.runs += 1
+        return self.response
+
+
+@pytest.fixture
+def service(optimizer, monkeypatch):
+    # Skip __init__, which wires up Redis, OpenAI and every tool
+    service = DellSystemAIService.__new__(DellSystemAIService)
+    service.cost_optimizer = optimizer
+    service.created = []
+
+    def create_agent(model_name, complexity, requires_browser_tools=False, user_id=None):
+        agent = FakeAgent(f"A confident and complete answer from {model_name}.")
+        service.created.append((model_name, agent))
+        return agent
+
+    monkeypatch.setattr(service, "_create_agent_for_task", create_agent)
+    return service
+
+
+def _escalate(service, agent, response, model="gpt-4o-mini", requires_browser_tools=False):
+    return asyncio.run(service._escalate_if_unreliable(
+        agent, response, model, TaskComplexity.SIMPLE, requires_browser_tools, "u1", "query", {}
+    ))
+
+
+def test_hedged_reply_is_retried_on_the_next_model(service):
+    first = FakeAgent("I'm not sure how many panels there are.")
+
+    response, model, escalated_from = _escalate(service, first, first.response)
+
+    assert (model, escalated_from) == ("gpt-4o", "gpt-4o-mini")
+    assert response == "A confident and complete answer from gpt-4o."
+    assert [name for name, _ in service.created] == ["gpt-4o"]
+
+
+def test_run_that_called_tools_is_never_repeated(service):
+    # e.g. a panel move followed by a hedged summary; re-running would move the panel again
+    first = FakeAgent("I'm not sure the move fully succeeded.", tool_calls=1)
+
+    response, model, escalated_from = _escalate(service, first, first.response)
+
+    assert (response, model, escalated_from) == (first.response, "gpt-4o-mini", None)
+    assert service.created == []
+
+
+@pytest.mark.parametrize(
+    "model, requires_browser_tools, response",
+    [
+        ("gpt-4o-mini", False, "There are 42 panels in this project."),
+        ("gpt-4o", False, "I'm not sure how many panels there are."),
+        ("gpt-4o-mini", True, "I'm not sure how many panels there are."),
+    ],
+)
+def test_no_escalation_when_not_needed_or_possible(service, model, requires_browser_tools, response):
+    result = _escalate(service, FakeAgent(response), response, model, requires_browser_tools)
+
+    assert result == (response, model, None)
+    assert service.created == []
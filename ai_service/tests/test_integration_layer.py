@@ -0,0 +1,251 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+# Ensure the ai_service module directory is importable
+SERVICE_DIR = Path(__file__).resolve().parents[1]
+if str(SERVICE_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVICE_DIR))
+
+import integration_layer  # noqa: E402
+from integration_layer import AIServiceIntegration, RequestCoalescer  # noqa: E402
+from result_cache import SemanticCache  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    fake = FakeClock()
+    monkeypatch.setattr(integration_layer.time, "monotonic", fake)
+    return fake
+
+
+@pytest.fixture
+def integration() -> AIServiceIntegration:
+    # Skip __init__, which loads the hybrid architecture and connects to Redis
+    service = AIServiceIntegration.__new__(AIServiceIntegration)
+    service._chat_models = OrderedDict()
+    service._chat_models_lock = threading.Lock()
+    service.chat_cache = None
+    return service
+
+
+def test_chat_model_hint_is_keyed_by_conversation(integration, clock):
+    first = integration._chat_conversation_key("user-1", {"conversationId": "a"})
+    second = integration._chat_conversation_key("user-1", {"session_id": "b"})
+
+    integration._remember_chat_model(first, "gpt-4o")
+
+    assert integration._chat_model_hint(first) == "gpt-4o"
+    assert integration._chat_model_hint(second) is None
+    assert integration._chat_conversation_key("user-1", {}) is None
+
+
+def test_chat_model_hint_falls_back_to_the_project(integration, clock):
+    # What the chat panel and backend actually send: a projectId and no conversation id
+    key = integration._chat_conversation_key("user-1", {"projectId": "p1", "history": []})
+    integration._remember_chat_model(key, "gpt-4o")
+
+    assert integration._chat_model_hint(integration._chat_conversation_key("user-1", {"projectId": "p1"})) == "gpt-4o"
+    assert integration._chat_model_hint(integration._chat_conversation_key("user-2", {"projectId": "p1"})) is None
+    assert integration._chat_model_hint(integration._chat_conversation_key("user-1", {"projectId": "p2"})) is None
+
+    clock.now += integration_layer.CHAT_MODEL_HINT_TTL
+    assert integration._chat_model_hint(key) is None
+
+
+def test_chat_message_passes_the_project_hint_to_the_next_turn(integration):
+    integration.ai_service = FakeChatService()
+    _chat(integration, "Summarize the QC failures")
+    _chat(integration, "And for panel 4?")
+
+    assert integration.ai_service.preferred_models == [None, "gpt-4o"]
+
+
+def test_chat_model_hint_expires_after_escalation(integration, clock):
+    key = integration._chat_conversation_key("user-1", {"conversationId": "a"})
+    integration._remember_chat_model(key, "gpt-4o")
+
+    # Further turns on the same model do not extend the hint
+    clock.now += integration_layer.CHAT_MODEL_HINT_TTL - 1
+    integration._remember_chat_model(key, "gpt-4o")
+    assert integration._chat_model_hint(key) == "gpt-4o"
+
+    clock.now += 2
+    assert integration._chat_model_hint(key) is None
+
+
+def test_chat_model_hint_follows_model_changes(integration, clock):
+    key = integration._chat_conversation_key("user-1", {"conversationId": "a"})
+    integration._remember_chat_model(key, "gpt-4o")
+    clock.now += 10
+    integration._remember_chat_model(key, "gpt-4o-mini")
+
+    assert integration._chat_model_hint(key) == "gpt-4o-mini"
+
+
+class FakeChatService:
+    def __init__(self):
+        self.calls = 0
+        self.preferred_models = []
+
+    async def handle_chat_message(self, user_id, user_tier, message, context=None, preferred_model=None):
+        self.calls += 1
+        self.preferred_models.append(preferred_model)
+        session_id = f"chat-{context.get('projectId', user_id)}-{self.calls}"
+        return {
+            "reply": f"answer {self.calls}",
+            "response": f"answer {self.calls}",
+            "success": True,
+            "timestamp": time.time(),
+            "user_id": user_id,
+            "session_id": session_id,
+            "conversation_id": session_id,
+            "model_used": "gpt-4o",
+        }
+
+
+@pytest.fixture
+def cached_integration(integration):
+    integration.ai_service = FakeChatService()
+    integration.chat_cache = SemanticCache(lambda text: [float(len(text)), 1.0])
+    return integration
+
+
+def _chat(integration, message, user_id="u1", history=()):
+    context = {"projectId": "p1", "history": [dict(turn) for turn in history]}
+    return asyncio.run(integration.chat_message_hybrid(message, context, user_id=user_id))
+
+
+def test_semantic_cache_hit_has_the_shape_of_a_fresh_reply(cached_integration):
+    fresh = _chat(cached_integration, "How many panels?")
+    hit = _chat(cached_integration, "how many panels?")
+
+    assert cached_integration.ai_service.calls == 1
+    assert hit.keys() == fresh.keys()
+    assert hit["reply"] == fresh["reply"]
+    assert isinstance(hit["timestamp"], float)
+    assert hit["session_id"] == hit["conversation_id"]
+    assert hit["session_id"].startswith("chat-p1-")
+
+    # Per-turn fields are not kept in the cache
+    stored, _ = cached_integration.chat_cache.lookup(next(iter(cached_integration.chat_cache._spaces)), "how many panels?")
+    assert not {"timestamp", "session_id", "conversation_id"} & stored.keys()
+
+    # Another user in the same project does not see the answer
+    _chat(cached_integration, "How many panels?", user_id="u2")
+    assert cached_integration.ai_service.calls == 2
+
+
+def test_semantic_cache_key_includes_conversation_history(cached_integration):
+    first = [{"role": "user", "content": "Is panel 4 installed?", "timestamp": "t1"},
+             {"role": "assistant", "content": "Yes.", "timestamp": "t2"}]
+    other = [{"role": "user", "content": "Is panel 9 installed?", "timestamp": "t1"},
+             {"role": "assistant", "content": "No.", "timestamp": "t2"}]
+
+    _chat(cached_integration, "why?", history=first)
+    _chat(cached_integration, "why?", history=other)
+    assert cached_integration.ai_service.calls == 2
+
+    # Same conversation state (message timestamps aside) hits
+    retimed = [dict(turn, timestamp="later") for turn in first]
+    assert _chat(cached_integration, "why?", history=retimed)["reply"] == "answer 1"
+    assert cached_integration.ai_service.calls == 2
+
+
+def _wait_for_followers(caplog, count):
+    """Block until `count` callers have joined an in-flight call"""
+    deadline = time.monotonic() + 5
+    while sum("Coalesced request" in r.getMessage() for r in caplog.records) < count:
+        assert time.monotonic() < deadline, "followers never joined the in-flight call"
+        time.sleep(0.01)
+
+
+def test_coalescer_shares_one_call_between_concurrent_identical_requests(caplog):
+    caplog.set_level(logging.DEBUG, logger="integration_layer")
+    coalescer = RequestCoalescer(tiers="paid_user")
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(coalescer.run, ("analyze", "u1"), "paid_user", work)
+        assert started.wait(5)
+        followers = [pool.submit(coalescer.run, ("analyze", "u1"), "paid_user", work) for _ in range(3)]
+        _wait_for_followers(caplog, 3)
+        release.set()
+        results = [leader.result(5)] + [f.result(5) for f in followers]
+
+    assert results == ["result"] * 4
+    assert len(calls) == 1
+    assert coalescer._inflight == {}
+
+
+def test_coalescer_keeps_different_keys_and_uncoalesced_tiers_separate():
+    coalescer = RequestCoalescer(tiers="paid_user")
+    release = threading.Event()
+    calls = []
+
+    def work(label):
+        def run():
+            calls.append(label)
+            release.wait(5)
+            return label
+        return run
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [
+            pool.submit(coalescer.run, ("analyze", "u1"), "paid_user", work("u1")),
+            pool.submit(coalescer.run, ("analyze", "u2"), "paid_user", work("u2")),
+            pool.submit(coalescer.run, ("analyze", "u3"), "free_user", work("free-a")),
+            pool.submit(coalescer.run, ("analyze", "u3"), "free_user", work("free-b")),
+        ]
+        while len(calls) < 4:
+            time.sleep(0.01)
+        release.set()
+
+    assert [f.result(5) for f in futures] == ["u1", "u2", "free-a", "free-b"]
+
+
+def test_coalescer_propagates_errors_to_waiting_callers(caplog):
+    caplog.set_level(logging.DEBUG, logger="integration_layer")
+    coalescer = RequestCoalescer(tiers="paid_user")
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise ValueError("upstream failed")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(coalescer.run, "key", "paid_user", failing)
+        assert started.wait(5)
+        follower = pool.submit(coalescer.run, "key", "paid_user", failing)
+        _wait_for_followers(caplog, 1)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(ValueError, match="upstream failed"):
+                future.result(5)
+
+    assert coalescer._inflight == {}
@@ -0,0 +1,80 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Ensure the ai_service module directory is importable
+SERVICE_DIR = Path(__file__).resolve().parents[1]
+if str(SERVICE_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVICE_DIR))
+
+from panel_preprocessing import find_invalid_panels, find_nearby_items  # noqa: E402
+
+
+def test_well_formed_panels_are_valid():
+    panels = [
+        {"id": "P001", "width": 40, "height": 100, "x": 0, "y": 0},
+        {"id": "P002", "width": "15", "length": "100.5", "x": 40, "y": 0},
+    ]
+
+    assert find_invalid_panels(panels) == []
+    assert find_invalid_panels([]) == []
+
+
+def test_panels_without_dimensions_are_left_to_the_optimizer():
+    # The optimizer fills in default sizes and positions
+    panels = [{"id": "P001"}, {"id": "P002", "material": "HDPE 60 mil"}, {"id": "P003", "width": 15}]
+
+    assert find_invalid_panels(panels, {"width": 1000, "length": 1000}) == []
+
+
+def test_unusable_geometry_is_reported_by_index():
+    panels = [
+        {"width": 15, "length": 100},
+        {"width": 0, "length": 100},
+        {"width": 15, "height": -1},
+        {"width": "wide", "length": 100},
+        {"width": 15, "length": 100, "x": "left"},
+        {"width": float("inf"), "length": 100},
+        "P007",
+    ]
+
+    assert find_invalid_panels(panels) == [1, 2, 3, 4, 5, 6]
+
+
+@pytest.mark.parametrize(
+    "site_config, expected",
+    [
+        ({"width": 100, "length": 200}, [1, 2, 3]),
+        ({"width": 100}, [1, 3]),
+        ({"width": "5acre", "length": "5acre"}, []),
+        ({"site_width": 10, "site_height": 10}, []),
+        ({}, []),
+    ],
+)
+def test_panels_must_fit_the_site(site_config, expected):
+    panels = [
+        {"width": 15, "length": 100, "x": 85, "y": 100},
+        {"width": 15, "length": 100, "x": 90, "y": 0},
+        {"width": 15, "length": 100, "x": 0, "y": 150},
+        {"x": -5, "y": 0},
+    ]
+
+    assert find_invalid_panels(panels, site_config) == expected
+
+
+def test_nearby_items_match_within_tolerance_on_both_axes():
+    items = [
+        {"id": "a", "x": 100, "y": 100},
+        {"id": "b", "x": 149, "y": 51},
+        {"id": "c", "x": 150, "y": 100},
+        {"id": "d", "x": 100, "y": 200},
+        {"id": "e"},
+        {"id": "f", "x": "here", "y": 100},
+        None,
+    ]
+
+    assert find_nearby_items(100, 100, items) == [0, 1]
+    assert find_nearby_items(100, 100, items, tolerance=101) == [0, 1, 2, 3, 4]
+    assert find_nearby_items(0, 0, items) == [4]
+    assert find_nearby_items(100, 100, []) == []
@@ -0,0 +1,94 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Ensure the ai_service module directory is importable
+SERVICE_DIR = Path(__file__).resolve().parents[1]
+if str(SERVICE_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVICE_DIR))
+
+import result_cache  # noqa: E402
+from result_cache import SemanticCache  # noqa: E402
+
+
+def letter_counts(text):
+    """Toy embedding: letter frequencies, so rewordings with the same letters score close to 1"""
+    vector = [0.0] * 26
+    for char in text:
+        if "a" <= char <= "z":
+            vector[ord(char) - ord("a")] += 1.0
+    return vector
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        return letter_counts(text)
+
+
+@pytest.fixture
+def embedder():
+    return CountingEmbedder()
+
+
+@pytest.fixture
+def cache(embedder):
+    return SemanticCache(embedder, threshold=0.95, max_entries=2, ttl=60)
+
+
+def test_exact_repeat_hits_without_embedding(cache, embedder):
+    cache.put(("p1", "u1", "paid_user"), "How many panels?", {"reply": "42"})
+    embedder.calls = 0
+
+    value, _ = cache.lookup(("p1", "u1", "paid_user"), "  how MANY   panels? ")
+
+    assert value == {"reply": "42"}
+    assert embedder.calls == 0
+
+
+def test_near_duplicate_hits_and_unrelated_prompt_misses(cache):
+    namespace = ("p1", "u1", "paid_user")
+    cache.put(namespace, "how many panels are there", {"reply": "42"})
+
+    assert cache.lookup(namespace, "how many panels are there?!")[0] == {"reply": "42"}
+    assert cache.lookup(namespace, "summarize the qc failures")[0] is None
+
+
+def test_namespaces_are_isolated_and_invalidated_per_project(cache):
+    cache.put(("p1", "u1", "paid_user"), "how many panels", {"reply": "p1"})
+    cache.put(("p2", "u1", "paid_user"), "how many panels", {"reply": "p2"})
+
+    assert cache.lookup(("p1", "u2", "paid_user"), "how many panels")[0] is None
+
+    cache.invalidate("p1")
+    assert cache.lookup(("p1", "u1", "paid_user"), "how many panels")[0] is None
+    assert cache.lookup(("p2", "u1", "paid_user"), "how many panels")[0] == {"reply": "p2"}
+
+
+def test_entries_expire_and_oldest_is_evicted(cache, monkeypatch):
+    namespace = ("p1", "u1", "paid_user")
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "time", lambda: now[0])
+
+    cache.put(namespace, "first question", {"reply": 1})
+    cache.put(namespace, "second question", {"reply": 2})
+    cache.put(namespace, "third question", {"reply": 3})
+    assert cache.lookup(namespace, "first question")[0] is None
+    assert cache.lookup(namespace, "third question")[0] == {"reply": 3}
+
+    now[0] += 61
+    assert cache.lookup(namespace, "third question")[0] is None
+
+
+def test_embedding_failure_is_a_miss():
+    def broken(text):
+        raise RuntimeError("embedding service down")
+
+    cache = SemanticCache(broken)
+    cache.put("ns", "question", {"reply": 1})
+
+    assert cache.lookup("ns", "question") == (None, None)
@@ -0,0 +1,161 @@
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from flask import Flask, jsonify
+
+# Ensure the ai_service module directory is importable
+SERVICE_DIR = Path(__file__).resolve().parents[1]
+if str(SERVICE_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVICE_DIR))
+
+from utils import (  # noqa: E402
+    MAX_JSON_SCAN_STARTS,
+    RateLimitFilter,
+    extract_json_object,
+    make_validator,
+    validate_json,
+)
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+
+    @app.route("/analyze", methods=["POST"])
+    @validate_json(required_keys=("documents",), error="No documents provided", defaults={
+        "question": "Summarize",
+        "options": {},
+    }, types={"documents": list, "question": str, "limit": (int, float)})
+    def analyze(data):
+        data["options"]["seen"] = True
+        return jsonify(data)
+
+    return app.test_client()
+
+
+def test_valid_payload_gets_defaults(client):
+    response = client.post("/analyze", json={"documents": [{"path": "a.pdf"}]})
+
+    assert response.status_code == 200
+    assert response.get_json() == {
+        "documents": [{"path": "a.pdf"}],
+        "question": "Summarize",
+        "options": {"seen": True},
+    }
+
+
+def test_mutable_defaults_are_not_shared_between_requests(client):
+    client.post("/analyze", json={"documents": []})
+
+    assert client.post("/analyze", json={"documents": []}).get_json()["options"] == {"seen": True}
+
+
+@pytest.mark.parametrize(
+    "kwargs, status, error",
+    [
+        ({"data": b"", "content_type": "application/json"}, 400, "Request body is empty"),
+        ({"data": b"documents=1", "content_type": "application/x-www-form-urlencoded"}, 415,
+         "Content-Type must be application/json"),
+        ({"data": b"{not json", "content_type": "application/json"}, 400, "Malformed JSON body"),
+        ({"json": ["documents"]}, 400, "JSON object expected"),
+        ({"json": {"question": "Why?"}}, 400, "No documents provided"),
+        ({"json": {"documents": "a.pdf"}}, 400, "documents must be a list"),
+        ({"json": {"documents": [], "limit": "10"}}, 400, "limit must be a int or float"),
+    ],
+)
+def test_invalid_payloads_are_rejected(client, kwargs, status, error):
+    response = client.post("/analyze", **kwargs)
+
+    assert response.status_code == status
+    assert response.get_json()["error"] == error
+
+
+def test_make_validator_reports_every_missing_key():
+    check = make_validator(required=("a", "b", "c"))
+
+    assert check({"b": 1}) == ("missing", ("a", "c"))
+    assert check({"a": 1, "b": 2, "c": 3}) is None
+
+
+
+def _record(level=logging.INFO, created=1000.0):
+    record = logging.LogRecord("integration_layer", level, __file__, 1, "status polled", None, None)
+    record.created = created
+    return record
+
+
+@pytest.fixture
+def status_app():
+    app = Flask(__name__)
+
+    @app.route("/hybrid/status")
+    def hybrid_status():
+        return "ok"
+
+    @app.route("/analyze", methods=["POST"])
+    def analyze():
+        return "ok"
+
+    return app
+
+
+def test_rate_limit_caps_status_endpoint_records_per_second(status_app):
+    sampler = RateLimitFilter(rate=2)
+
+    with status_app.test_request_context("/hybrid/status"):
+        polled = [sampler.filter(_record()) for _ in range(3)]
+        assert sampler.filter(_record(logging.WARNING))
+        assert sampler.filter(_record(created=1001.0))
+
+    assert polled == [True, True, False]
+
+
+def test_rate_limit_leaves_other_requests_and_background_logs_alone(status_app):
+    sampler = RateLimitFilter(rate=1)
+
+    with status_app.test_request_context("/analyze", method="POST"):
+        assert all(sampler.filter(_record()) for _ in range(5))
+    assert all(sampler.filter(_record()) for _ in range(5))
+
+
+def test_rate_limit_window_is_shared_safely_between_threads(status_app):
+    sampler = RateLimitFilter(rate=50)
+
+    def poll(_):
+        with status_app.test_request_context("/hybrid/status"):
+            return sum(sampler.filter(_record()) for _ in range(100))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        passed = sum(pool.map(poll, range(8)))
+
+    assert passed == 50
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ('{"panels": [1, 2]}', {"panels": [1, 2]}),
+        ('Here is the layout:\n```json\n{"panels": [{"id": "P1"}]}\n```\nLet me know!', {"panels": [{"id": "P1"}]}),
+        ('Use {x, y} coordinates. Result: {"count": 3}', {"count": 3}),
+        ('{broken {"count": 3} trailing }', {"count": 3}),
+        ('[{"count": 3}]', None),
+        ('[{"count": 3}, {"count": 4}]', None),
+        ('"just a string"', None),
+        ("No JSON here.", None),
+        ("", None),
+        (None, None),
+    ],
+)
+def test_extract_json_object(text, expected):
+    assert extract_json_object(text) == expected
+
+
+def test_extract_json_object_gives_up_after_max_scan_starts():
+    def with_bad_starts(count):
+        return "{ " * count + '{"count": 3}'
+
+    assert extract_json_object(with_bad_starts(MAX_JSON_SCAN_STARTS - 1)) == {"count": 3}
+    assert extract_json_object(with_bad_starts(MAX_JSON_SCAN_STARTS)) is None
@@ -1,18 +1,91 @@
+import atexit
+import copy
+import functools
+import json
 import logging
+import logging.handlers
 import os
+import queue
 import tempfile
+import threading
+from flask import Response, current_app, has_request_context, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from werkzeug.utils import secure_filename
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Polling endpoints (by Flask endpoint name) whose INFO/DEBUG output is sampled under load
+SAMPLED_ENDPOINTS = frozenset({'hybrid_status', 'health_check'})
+
+class RateLimitFilter(logging.Filter):
+    """
+    Cap INFO/DEBUG records logged while serving `endpoints` at `rate` per second.
+    
+    Keeps high-QPS polling endpoints from flooding logs (and paying for formatting)
+    while never dropping warnings, errors, or records from any other request.
+    Shared by every request thread, so the window is updated under a lock.
+    """
+    
+    def __init__(self, rate: float = 100.0, endpoints=SAMPLED_ENDPOINTS):
+        super().__init__()
+        self.rate = rate
+        self.endpoints = frozenset(endpoints)
+        self._lock = threading.Lock()
+        self._window_start = 0.0
+        self._count = 0
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if not has_request_context() or request.endpoint not in self.endpoints:
+            return True
+        with self._lock:
+            if record.created - self._window_start >= 1.0:
+                self._window_start = record.created
+                self._count = 0
+            self._count += 1
+            return self._count <= self.rate
+
+def _build_formatter() -> logging.Formatter:
+    """Plain-text formatter by default; JSON lines when LOG_FORMAT=json and python-json-logger is installed"""
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        try:
+            from pythonjsonlogger import jsonlogger
+            return jsonlogger.JsonFormatter(LOG_FORMAT, datefmt=LOG_DATE_FORMAT)
+        except ImportError:
+            logging.getLogger(__name__).warning("⚠️ python-json-logger not installed - using text log format")
+    return logging.Formatter(LOG_FORMAT, datefmt=LOG_DATE_FORMAT)
+
 def setup_logging():
     """Set up logging configuration"""
     logging_level = os.getenv("LOG_LEVEL", "INFO")
     numeric_level = getattr(logging, logging_level.upper(), logging.INFO)
     
-    logging.basicConfig(
-        level=numeric_level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    handler = logging.StreamHandler()
+    handler.setFormatter(_build_formatter())
+    
+    # Hand records to a background listener so request threads never block on stream writes
+    if os.getenv("LOG_QUEUE", "true").lower() == "true":
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        handler = logging.handlers.QueueHandler(log_queue)
+        # QueueHandler pre-renders message + traceback; the listener's handler applies LOG_FORMAT
+        handler.setFormatter(logging.Formatter('%(message)s'))
+    
+    logging.basicConfig(level=numeric_level, handlers=[handler])
+    
+    # On the handler, which filters in the request thread, so records from any module are sampled
+    sample_rate = float(os.getenv("LOG_SAMPLE_RATE", "100"))
+    if sample_rate > 0:
+        handler.addFilter(RateLimitFilter(sample_rate))
 
 def save_temp_file(file):
     """Save a file upload to a temporary location"""
@@ -26,4 +99,188 @@ def save_temp_file(file):
     # Save the file to the temporary path
     file.save(temp_path)
     
-    return temp_path
\ No newline at end of file
+    return temp_path
+
+def make_validator(required=(), defaults=None, types=None):
+    """
+    Generate a specialized payload checker for one endpoint schema.
+    
+    The returned function fills in missing `defaults` and returns None when
+    the payload is valid, otherwise `('missing', keys)` for absent `required`
+    keys or `('invalid', {key: expected})` for present keys whose value is not
+    an instance of the type(s) given in `types`. Its body is generated once
+    with the key names as literals, so each call is a straight run of dict
+    lookups and isinstance checks with no loops over the schema.
+    """
+    defaults = defaults or {}
+    types = types or {}
+    namespace = {'_copy': copy.copy}
+    body = ["def _validate(data):"]
+    for i, key in enumerate(defaults):
+        value = defaults[key]
+        namespace[f"_default_{i}"] = value
+        # Mutable defaults are copied so one request can never leak into the next
+        fill = f"_copy(_default_{i})" if isinstance(value, (dict, list, set)) else f"_default_{i}"
+        body.append(f"    if {key!r} not in data: data[{key!r}] = {fill}")
+    if required:
+        present = " and ".join(f"{key!r} in data" for key in required)
+        body.append(f"    if not ({present}):")
+        body.append(f"        return ('missing', tuple(key for key in {tuple(required)!r} if key not in data))")
+    for i, (key, expected) in enumerate(types.items()):
+        expected = expected if isinstance(expected, tuple) else (expected,)
+        namespace[f"_type_{i}"] = expected
+        namespace[f"_type_name_{i}"] = " or ".join(t.__name__ for t in expected)
+        body.append(f"    if {key!r} in data and not isinstance(data[{key!r}], _type_{i}):")
+        body.append(f"        return ('invalid', {{{key!r}: _type_name_{i}}})")
+    body.append("    return None")
+    exec(compile("\n".join(body), "<validator>", "exec"), namespace)
+    return namespace["_validate"]
+
+def loads_json(data):
+    """Parse a JSON document from bytes or str, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+if orjson is not None:
+    # Keep Flask's formatting for dates, accept int keys like the stdlib, and handle NumPy results
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that serializes with orjson when it is installed.
+    
+    Falls back to the stdlib provider for anything orjson rejects (or when
+    it is missing), so jsonify() output stays valid either way.
+    """
+    
+    sort_keys = False
+    
+    def dumps(self, obj, **kwargs):
+        if orjson is None or not set(kwargs) <= {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+        option = _ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if kwargs.get('indent') else 0)
+        try:
+            return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+        except TypeError:
+            return super().dumps(obj, **kwargs)
+    
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+def validate_json(required_keys=(), error=None, defaults=None, types=None):
+    """
+    Decorator that parses the request body as a JSON object and passes it to the view.
+    
+    Empty bodies, non-JSON content types and malformed payloads are rejected
+    before any parsing work; missing required keys return `error` (or a
+    generic message listing them) and values of the wrong type (per `types`)
+    return the offending field. Keys in `defaults` are filled in when absent.
+    """
+    check_payload = make_validator(required_keys, defaults, types)
+    
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            chunked = request.headers.get('Transfer-Encoding', '').lower() == 'chunked'
+            if not request.content_length and not chunked:
+                return jsonify({'error': 'Request body is empty'}), 400
+            if not request.is_json:
+                return jsonify({'error': 'Content-Type must be application/json'}), 415
+            
+            try:
+                data = loads_json(request.get_data(cache=False))
+            except ValueError:
+                return jsonify({'error': 'Malformed JSON body'}), 400
+            
+            if not isinstance(data, dict):
+                return jsonify({'error': 'JSON object expected'}), 400
+            
+            problem = check_payload(data)
+            if problem is not None:
+                kind, detail = problem
+                if kind == 'missing':
+                    return jsonify({'error': error or f"Missing required fields: {', '.join(detail)}"}), 400
+                field, expected = next(iter(detail.items()))
+                return jsonify({'error': f"{field} must be a {expected}", 'invalid_fields': detail}), 400
+            
+            return view(data, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def stream_json(payload, status=200):
+    """
+    Serialize `payload` incrementally and stream it as a chunked JSON response.
+    
+    Large analysis results are encoded piece by piece and flushed in ~64 KiB
+    chunks instead of being materialized into one string like jsonify does.
+    """
+    encoder = json.JSONEncoder(default=current_app.json.default, ensure_ascii=current_app.json.ensure_ascii)
+    
+    def generate():
+        buffer = []
+        size = 0
+        for part in encoder.iterencode(payload):
+            buffer.append(part)
+            size += len(part)
+            if size >= STREAM_CHUNK_SIZE:
+                yield ''.join(buffer).encode('utf-8')
+                buffer = []
+                size = 0
+        if buffer:
+            yield ''.join(buffer).encode('utf-8')
+    
+    return Response(stream_with_context(generate()), status=status, mimetype='application/json', direct_passthrough=True)
+
+_JSON_DECODER = json.JSONDecoder()
+# Upper bound on '{' positions tried when a model wraps JSON in prose
+MAX_JSON_SCAN_STARTS = 64
+
+def extract_json_object(text):
+    """
+    Parse the JSON object in a model response that may be wrapped in prose or code fences.
+    
+    Tries the whole text, then the span from the first '{' to the last '}',
+    then raw-decodes from successive '{' positions. Every step is linear, so a
+    long malformed response cannot trigger regex backtracking. Returns None
+    when no object is found or the whole text is JSON of another type.
+    """
+    if not text:
+        return None
+    try:
+        value = json.loads(text)
+        # Valid JSON that is not an object (e.g. a top-level array) has no object to extract
+        return value if isinstance(value, dict) else None
+    except json.JSONDecodeError:
+        pass
+    
+    start = text.find('{')
+    end = text.rfind('}')
+    if start == -1 or end < start:
+        return None
+    try:
+        value = json.loads(text[start:end + 1])
+        if isinstance(value, dict):
+            return value
+    except json.JSONDecodeError:
+        pass
+    
+    for _ in range(MAX_JSON_SCAN_STARTS):
+        try:
+            value, _end = _JSON_DECODER.raw_decode(text, start)
+            if isinstance(value, dict):
+                return value
+        except json.JSONDecodeError:
+            pass
+        start = text.find('{', start + 1)
+        if start == -1:
+            break
+    return None
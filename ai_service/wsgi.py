@@ -0,0 +1,9 @@
+"""
+WSGI entry point for running the AI service under gunicorn with gthread workers.
+
+    gunicorn -c gunicorn_conf.py wsgi:app
+"""
+
+from app import app
+
+application = app